@@ -0,0 +1,231 @@
+from collections import defaultdict
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from . import changefeed
+from . import models
+from . import occupancy
+from . import purge
+
+WATERMARK_NAME = 'doctor_stats'
+REFRESH_BATCH_SIZE = 1000
+
+GROUP_BY_FIELDS = {
+    'doctor': ('doctor__user__username',),
+    'clinic': ('doctor__clinic_id', 'doctor__clinic__name'),
+    'specialization': ('doctor__specialization',)}
+
+BOOKED = Q(status = models.AppointmentStatus.BOOKED)
+CANCELLED = Q(status = models.AppointmentStatus.CANCELLED)
+
+def appointment_sources():
+    # archived rows still count, rollups cover the whole history
+    return (models.Appointment.objects, models.ArchivedAppointment.objects)
+
+def availability_sources():
+    return (models.DoctorAvailability.objects, models.ArchivedDoctorAvailability.objects)
+
+def raw_daily_counts(filters):
+    """
+    {(doctor, date): [booked, cancelled]} computed from raw appointment tables
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for manager in appointment_sources():
+        rows = manager.filter(filters).values('doctor_id', 'date').annotate(
+            booked = Count('pk', filter=BOOKED),
+            cancelled = Count('pk', filter=CANCELLED))
+        for row in rows.iterator(chunk_size=2000):
+            key = counts[(row['doctor_id'], row['date'])]
+            key[0] += row['booked']
+            key[1] += row['cancelled']
+    return counts
+
+def raw_hourly_counts(filters):
+    """
+    {(doctor, date, hour): [booked, cancelled]} computed from raw appointment tables
+    """
+    counts = defaultdict(lambda: [0, 0])
+    for manager in appointment_sources():
+        rows = manager.filter(filters).annotate(hour = ExtractHour('time')).values(
+            'doctor_id', 'date', 'hour').annotate(
+                booked = Count('pk', filter=BOOKED),
+                cancelled = Count('pk', filter=CANCELLED))
+        for row in rows.iterator(chunk_size=2000):
+            key = counts[(row['doctor_id'], row['date'], row['hour'])]
+            key[0] += row['booked']
+            key[1] += row['cancelled']
+    return counts
+
+def raw_available_minutes(filters):
+    minutes = defaultdict(int)
+    for manager in availability_sources():
+        slots = manager.filter(filters, is_available = True).values_list(
+            'doctor_id', 'date', 'start_time', 'end_time')
+        for doctor_id, date, start_time, end_time in slots.iterator(chunk_size=2000):
+            minutes[(doctor_id, date)] += occupancy.slot_minutes(start_time, end_time)
+    return minutes
+
+def daily_rows(keys, daily, minutes):
+    return [
+        models.DoctorDailyStats(
+            doctor_id = doctor_id,
+            date = date,
+            available_minutes = minutes.get((doctor_id, date), 0),
+            booked_count = daily[(doctor_id, date)][0] if (doctor_id, date) in daily else 0,
+            cancelled_count = daily[(doctor_id, date)][1] if (doctor_id, date) in daily else 0)
+        for doctor_id, date in keys
+        if minutes.get((doctor_id, date)) or (doctor_id, date) in daily]
+
+def hourly_rows(keys, hourly):
+    return [
+        models.DoctorHourlyStats(
+            doctor_id = doctor_id,
+            date = date,
+            hour = hour,
+            booked_count = booked,
+            cancelled_count = cancelled)
+        for (doctor_id, date, hour), (booked, cancelled) in hourly.items()
+        if (doctor_id, date) in keys]
+
+def rebuild_keys(keys):
+    """
+    method to recompute daily and hourly rollup rows of the given (doctor, date)
+    keys from raw tables. rows are replaced date by date, so the delete only
+    touches the keys being rebuilt
+    """
+    by_date = defaultdict(set)
+    for doctor_id, date in keys:
+        by_date[date].add(doctor_id)
+    if not by_date:
+        return
+
+    # superset of the keys, trimmed back to them when rows are built
+    filters = Q(doctor_id__in = {doctor_id for doctor_id, _ in keys}, date__in = list(by_date))
+    daily = raw_daily_counts(filters)
+    hourly = raw_hourly_counts(filters)
+    minutes = raw_available_minutes(filters)
+
+    with transaction.atomic():
+        for date, doctors in by_date.items():
+            models.DoctorDailyStats.objects.filter(date = date, doctor_id__in = doctors).delete()
+            models.DoctorHourlyStats.objects.filter(date = date, doctor_id__in = doctors).delete()
+        models.DoctorDailyStats.objects.bulk_create(daily_rows(keys, daily, minutes), batch_size=1000)
+        models.DoctorHourlyStats.objects.bulk_create(hourly_rows(keys, hourly), batch_size=1000)
+
+def get_watermark():
+    watermark, _ = models.RollupWatermark.objects.get_or_create(name = WATERMARK_NAME)
+    return watermark
+
+def refresh_rollups(batch_size=REFRESH_BATCH_SIZE):
+    """
+    method to bring rollups up to date with the change feed. only (doctor, date)
+    keys touched by events after the watermark are recomputed, so the cost
+    follows the number of changes and not the size of the tables.
+    returns number of events processed
+    """
+    changefeed.sequence_events()
+    watermark = get_watermark()
+    processed = 0
+    while True:
+        events, next_cursor = changefeed.get_changes(
+            watermark.position, batch_size, ['appointment', 'doctoravailability'])
+        if not events:
+            return processed
+        keys = {
+            (event['payload']['doctor_id'], datetime.strptime(event['payload']['date'], '%Y-%m-%d').date())
+            for event in events}
+        with transaction.atomic():
+            rebuild_keys(keys)
+            watermark.position = next_cursor
+            watermark.save(update_fields=['position', 'refreshed_at'])
+        processed += len(events)
+
+def rebuild_rollups():
+    """
+    method to rebuild rollups from scratch, e.g. after the change feed was purged
+    past the watermark. returns number of daily rows written
+    """
+    with transaction.atomic():
+        # events after this position, or committed but not yet sequenced, are
+        # replayed by the next refresh
+        last_position = models.ChangeEvent.objects.filter(
+            position__isnull = False).order_by('-position').values_list('position', flat=True).first()
+        daily = raw_daily_counts(Q())
+        hourly = raw_hourly_counts(Q())
+        minutes = raw_available_minutes(Q())
+        keys = set(daily) | set(minutes)
+
+        models.DoctorDailyStats.objects.all().delete()
+        models.DoctorHourlyStats.objects.all().delete()
+        rows = models.DoctorDailyStats.objects.bulk_create(daily_rows(keys, daily, minutes), batch_size=1000)
+        models.DoctorHourlyStats.objects.bulk_create(hourly_rows(keys, hourly), batch_size=1000)
+
+        watermark = get_watermark()
+        watermark.position = last_position or 0
+        watermark.save(update_fields=['position', 'refreshed_at'])
+    return len(rows)
+
+def filter_stats(stats, params):
+    """
+    method to apply doctor, clinic, specialization and date range filters of
+    analytics endpoints on a rollup queryset. returns (queryset, None) or (None, error message)
+    """
+    doctor_val = params.get('doctor') # doctor username
+    clinic_val = params.get('clinic_id')
+    spec_val = params.get('specialization')
+    stats = purge.exclude_deleted_profiles(stats, patient=None)
+    if doctor_val:
+        stats = stats.filter(doctor__user__username = doctor_val)
+    if clinic_val:
+        if not clinic_val.isdigit():
+            return None, 'clinic_id must be a number'
+        stats = stats.filter(doctor__clinic_id = int(clinic_val))
+    if spec_val:
+        stats = stats.filter(doctor__specialization = spec_val)
+    for name, lookup in (('min_date', 'date__gte'), ('max_date', 'date__lte')):
+        value = params.get(name)
+        if value:
+            try:
+                stats = stats.filter(**{lookup: datetime.strptime(value, '%d-%m-%Y').date()})
+            except ValueError:
+                return None, 'Unable to parse min_date/max_date. Please provide the dates in proper format'
+    return stats, None
+
+def ratio(part, whole):
+    return round(part / whole, 4) if whole else None
+
+def utilization(stats, group_by):
+    """
+    utilization and cancellation rate per group, read from daily rollups only
+    """
+    fields = GROUP_BY_FIELDS[group_by]
+    rows = stats.values(*fields).annotate(
+        available_minutes = Sum('available_minutes'),
+        booked_count = Sum('booked_count'),
+        cancelled_count = Sum('cancelled_count')).order_by(*fields)
+    return [{
+        group_by: row[fields[0]] if len(fields) == 1 else dict(zip(('id', 'name'), (row[f] for f in fields))),
+        'available_minutes': row['available_minutes'],
+        'booked_count': row['booked_count'],
+        'cancelled_count': row['cancelled_count'],
+        'utilization': ratio(
+            row['booked_count'] * occupancy.APPOINTMENT_SLOT_MINUTES, row['available_minutes']),
+        'cancellation_rate': ratio(
+            row['cancelled_count'], row['booked_count'] + row['cancelled_count'])}
+        for row in rows]
+
+def heatmap(stats):
+    """
+    booked and cancelled appointments per iso weekday (1 = monday) and hour,
+    read from hourly rollups only
+    """
+    rows = stats.annotate(weekday = ExtractIsoWeekDay('date')).values('weekday', 'hour').annotate(
+        booked = Sum('booked_count'),
+        cancelled = Sum('cancelled_count')).order_by('weekday', 'hour')
+    return [{
+        'weekday': row['weekday'],
+        'hour': row['hour'],
+        'booked_count': row['booked'],
+        'cancelled_count': row['cancelled']}
+        for row in rows]
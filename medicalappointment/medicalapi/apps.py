@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class MedicalapiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medicalapi'
+
+    def ready(self):
+        from . import signals
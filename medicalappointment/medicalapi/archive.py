@@ -0,0 +1,90 @@
+from datetime import date
+from django.db import connection, transaction
+from . import conditional
+from . import models
+
+def month_cutoff(months, today=None):
+    """
+    first day of the month `months` months before the current one
+    """
+    today = today or date.today()
+    month_index = today.year * 12 + today.month - 1 - months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+def raw_delete(model, ids):
+    # plain DELETE by primary key. the orm delete would collect cascades and
+    # fire per-row signals, which would also rewrite occupancy of moved rows
+    if not ids:
+        return
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.pk.column)
+    placeholders = ', '.join(['%s'] * len(ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {table} WHERE {column} IN ({placeholders})', ids)
+
+def archive_appointment_batch(cutoff, batch_size):
+    """
+    move one batch of appointments before cutoff, and their prescriptions,
+    into the archive tables. returns number of moved appointments
+    """
+    with transaction.atomic():
+        ids = list(models.Appointment.objects.select_for_update(skip_locked=True).filter(
+            date__lt = cutoff).order_by('pk').values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return 0
+
+        models.ArchivedAppointment.objects.bulk_create([
+            models.ArchivedAppointment(**row)
+            for row in models.Appointment.objects.filter(pk__in = ids).values(
+                'appointment_id', 'doctor_id', 'patient_id', 'date', 'time', 'status', 'created_at')],
+            ignore_conflicts=True)
+        prescriptions = list(models.Prescription.objects.filter(appointment_id__in = ids).values(
+            'prescription_id', 'appointment_id', 'notes', 'medications', 'issued_at'))
+        models.ArchivedPrescription.objects.bulk_create([
+            models.ArchivedPrescription(**row) for row in prescriptions],
+            ignore_conflicts=True)
+
+        models.WaitlistEntry.objects.filter(appointment_id__in = ids).update(appointment = None)
+        raw_delete(models.Prescription, [row['prescription_id'] for row in prescriptions])
+        raw_delete(models.Appointment, ids)
+    return len(ids)
+
+def archive_availability_batch(cutoff, batch_size):
+    """
+    move one batch of availability slots before cutoff into the archive table
+    """
+    with transaction.atomic():
+        rows = list(models.DoctorAvailability.objects.select_for_update(skip_locked=True).filter(
+            date__lt = cutoff).order_by('pk').values(
+                'id', 'doctor_id', 'date', 'start_time', 'end_time', 'is_available')[:batch_size])
+        if not rows:
+            return 0
+
+        models.ArchivedDoctorAvailability.objects.bulk_create([
+            models.ArchivedDoctorAvailability(**row) for row in rows],
+            ignore_conflicts=True)
+        raw_delete(models.DoctorAvailability, [row['id'] for row in rows])
+    return len(rows)
+
+def archive_before(cutoff, batch_size=1000):
+    """
+    method to move appointments, prescriptions and availability dated before
+    cutoff out of the hot tables in short batches, returns moved row counts
+    """
+    moved = {'appointments': 0, 'availability': 0}
+    while True:
+        count = archive_appointment_batch(cutoff, batch_size)
+        moved['appointments'] += count
+        if count < batch_size:
+            break
+    while True:
+        count = archive_availability_batch(cutoff, batch_size)
+        moved['availability'] += count
+        if count < batch_size:
+            break
+
+    # summary rows of archived days are no longer backed by hot rows
+    models.DoctorDailyOccupancy.objects.filter(date__lt = cutoff).delete()
+    if moved['appointments']:
+        conditional.bump_versions('appointment', 'prescription')
+    return moved
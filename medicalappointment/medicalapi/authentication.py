@@ -0,0 +1,112 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import get_md5_hash_password
+
+SHARED_CACHE_FORMAT = 'auth_user_%s'
+
+class UserCache:
+    """
+    in-process lru cache of user rows by token user id (as str), entries live
+    for ttl seconds. with AUTH_USER_SHARED_CACHE set, misses are looked up in
+    that django cache before the database, so workers warm each other
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def ttl(self):
+        return getattr(settings, 'AUTH_USER_CACHE_TTL', 30)
+
+    @property
+    def max_size(self):
+        return getattr(settings, 'AUTH_USER_CACHE_SIZE', 1024)
+
+    @property
+    def shared(self):
+        alias = getattr(settings, 'AUTH_USER_SHARED_CACHE', None)
+        return caches[alias] if alias else None
+
+    def get(self, user_id):
+        user_id = str(user_id)
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[1] > now:
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[0]
+            self.entries.pop(user_id, None)
+            self.misses += 1
+
+        shared = self.shared
+        user = shared.get(SHARED_CACHE_FORMAT % user_id) if shared is not None else None
+        if user is not None:
+            self._store(user_id, user, now)
+        return user
+
+    def set(self, user_id, user):
+        user_id = str(user_id)
+        self._store(user_id, user, time.monotonic())
+        shared = self.shared
+        if shared is not None:
+            shared.set(SHARED_CACHE_FORMAT % user_id, user, self.ttl)
+
+    def _store(self, user_id, user, now):
+        with self.lock:
+            self.entries[user_id] = (user, now + self.ttl)
+            self.entries.move_to_end(user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_id):
+        user_id = str(user_id)
+        with self.lock:
+            self.entries.pop(user_id, None)
+        shared = self.shared
+        if shared is not None:
+            shared.delete(SHARED_CACHE_FORMAT % user_id)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+user_cache = UserCache()
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication resolving the token's user through user_cache, so a
+    request with a recently seen token does not query the user table.
+    entries are dropped when the user is saved or deleted, see signals
+    """
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(user_id, user)
+            return copy.copy(user)
+
+        # same checks JWTAuthentication runs on a freshly loaded user
+        if api_settings.CHECK_USER_IS_ACTIVE and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        if api_settings.CHECK_REVOKE_TOKEN and validated_token.get(
+                api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+            raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        # every request gets its own instance, views may change request.user
+        return copy.copy(user)
@@ -0,0 +1,130 @@
+from collections import Counter
+from django.db import connections, transaction
+from django.db.models import Q
+from . import changefeed
+from . import conditional
+from . import fastserializers
+from . import models
+from . import occupancy
+
+to_date = fastserializers.CONVERTERS['to_ddmmyyyy']
+to_time = fastserializers.CONVERTERS['to_hhmm']
+
+def _update_returning(queryset, **assignments):
+    # single UPDATE .. WHERE pk IN (queryset) RETURNING pk. the orm update()
+    # cannot report which rows it changed, and rows committed by concurrent
+    # writers after the locks were taken are still matched by the condition
+    model = queryset.model
+    connection = connections[queryset.db]
+    quote = connection.ops.quote_name
+    select_sql, select_params = queryset.values('pk').query.sql_with_params()
+    set_sql = ', '.join(
+        f'{quote(model._meta.get_field(name).column)} = %s' for name in assignments)
+    table = quote(model._meta.db_table)
+    pk_column = quote(model._meta.pk.column)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET {set_sql} WHERE {pk_column} IN ({select_sql}) RETURNING {pk_column}',
+            [*assignments.values(), *select_params])
+        return [row[0] for row in cursor.fetchall()]
+
+def blackout_filters(doctor_ids, start_date, end_date, start_time=None, end_time=None):
+    """
+    (slot condition, appointment condition) of the blackout. without a time
+    window whole days are blocked, otherwise the window on every date of the range
+    """
+    slots = Q(doctor_id__in = doctor_ids, date__gte = start_date, date__lte = end_date, is_available = True)
+    appointments = Q(
+        doctor_id__in = doctor_ids,
+        date__gte = start_date,
+        date__lte = end_date,
+        status = models.AppointmentStatus.BOOKED)
+    if start_time is not None:
+        slots &= Q(end_time__gt = start_time)
+        appointments &= Q(time__gte = start_time)
+    if end_time is not None:
+        slots &= Q(start_time__lt = end_time)
+        appointments &= Q(time__lt = end_time)
+    return slots, appointments
+
+def trim_slots(slots, start_time=None, end_time=None):
+    """
+    method to cut blocked slots down to the window. the parts of a slot before
+    and after the window are inserted as new available slots.
+    returns the inserted slots
+    """
+    trimmed = []
+    remainders = []
+    for slot in slots:
+        bounds = (slot.start_time, slot.end_time)
+        if start_time is not None and slot.start_time < start_time:
+            remainders.append(models.DoctorAvailability(
+                doctor_id = slot.doctor_id, date = slot.date, start_time = slot.start_time, end_time = start_time))
+            slot.start_time = start_time
+        if end_time is not None and slot.end_time > end_time:
+            remainders.append(models.DoctorAvailability(
+                doctor_id = slot.doctor_id, date = slot.date, start_time = end_time, end_time = slot.end_time))
+            slot.end_time = end_time
+        if (slot.start_time, slot.end_time) != bounds:
+            trimmed.append(slot)
+    models.DoctorAvailability.objects.bulk_update(trimmed, ['start_time', 'end_time'], batch_size=1000)
+    return models.DoctorAvailability.objects.bulk_create(remainders, batch_size=1000)
+
+def apply_blackout(doctor_ids, start_date, end_date, start_time=None, end_time=None):
+    """
+    method to block availability of doctors over a date range and cancel the
+    booked appointments inside it, in one transaction. locks follow the order
+    of reschedule: appointments first, then availability slots, each by p.k.
+    slots reaching out of the window are split at its edges, only the part
+    inside it is blocked. returns (number of blocked slots, list of cancelled appointments)
+    """
+    slot_filter, appointment_filter = blackout_filters(
+        doctor_ids, start_date, end_date, start_time, end_time)
+
+    with transaction.atomic():
+        list(models.Appointment.objects.select_for_update().filter(
+            appointment_filter).order_by('pk').values_list('pk', flat=True))
+        list(models.DoctorAvailability.objects.select_for_update().filter(
+            slot_filter).order_by('pk').values_list('pk', flat=True))
+
+        slot_ids = _update_returning(
+            models.DoctorAvailability.objects.filter(slot_filter), is_available = False)
+        appointment_ids = _update_returning(
+            models.Appointment.objects.filter(appointment_filter), status = models.AppointmentStatus.CANCELLED)
+
+        # the updates skip signals, keep occupancy, change feed and etags in step here
+        slots = list(models.DoctorAvailability.objects.filter(pk__in = slot_ids))
+        blocked_minutes = Counter()
+        for slot in slots:
+            blocked_minutes[(slot.doctor_id, slot.date)] += occupancy.slot_minutes(slot.start_time, slot.end_time)
+        remainders = trim_slots(slots, start_time, end_time)
+        for slot in remainders:
+            blocked_minutes[(slot.doctor_id, slot.date)] -= occupancy.slot_minutes(slot.start_time, slot.end_time)
+        for (doctor_id, date), minutes in blocked_minutes.items():
+            occupancy.adjust_occupancy(doctor_id, date, minutes=-minutes)
+        cancelled = list(models.Appointment.objects.filter(pk__in = appointment_ids).order_by(
+            'date', 'time', 'pk').values(
+                'appointment_id', 'doctor_id', 'date', 'time', 'doctor__user__username',
+                'patient__user__username', 'patient__user__email', 'patient__phone_number'))
+        for (doctor_id, date), count in Counter((row['doctor_id'], row['date']) for row in cancelled).items():
+            occupancy.adjust_occupancy(doctor_id, date, booked=-count)
+
+        changefeed.record_changes(
+            models.DoctorAvailability.objects.filter(pk__in = slot_ids), models.ChangeAction.UPDATED)
+        changefeed.record_changes(
+            models.DoctorAvailability.objects.filter(pk__in = [slot.pk for slot in remainders]),
+            models.ChangeAction.CREATED)
+        changefeed.record_changes(
+            models.Appointment.objects.filter(pk__in = appointment_ids), models.ChangeAction.CANCELLED)
+        if appointment_ids:
+            conditional.bump_versions('appointment')
+
+    return len(slot_ids), [{
+        'appointment_id': row['appointment_id'],
+        'date': to_date(row['date']),
+        'time': to_time(row['time']),
+        'doctor': row['doctor__user__username'],
+        'patient': row['patient__user__username'],
+        'email': row['patient__user__email'],
+        'phone_number': row['patient__phone_number']}
+        for row in cancelled]
@@ -0,0 +1,147 @@
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from . import models
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+# counter row in ResourceVersion holding the last handed out feed position
+POSITION_COUNTER = 'changefeed_position'
+SEQUENCE_BATCH_SIZE = 1000
+
+# models whose changes are recorded, by resource name
+FEED_MODELS = {
+    'appointment': models.Appointment,
+    'doctoravailability': models.DoctorAvailability,
+    'prescription': models.Prescription}
+
+# columns kept out of event payloads
+EXCLUDED_FIELDS = {'search_vector'}
+
+def resource_name(model):
+    return model._meta.model_name
+
+def snapshot(instance):
+    """
+    json-ready dict of the instance's columns, used as event payload
+    """
+    return {
+        field.attname: getattr(instance, field.attname)
+        for field in instance._meta.concrete_fields
+        if field.attname not in EXCLUDED_FIELDS}
+
+def change_action(previous, instance, created):
+    if created:
+        return models.ChangeAction.CREATED
+    cancelled = models.AppointmentStatus.CANCELLED
+    if (isinstance(instance, models.Appointment) and instance.status == cancelled
+            and previous is not None and previous.status != cancelled):
+        return models.ChangeAction.CANCELLED
+    return models.ChangeAction.UPDATED
+
+def record_change(instance, action, using='default'):
+    models.ChangeEvent.objects.using(using).create(
+        resource = resource_name(type(instance)),
+        resource_id = instance.pk,
+        action = action,
+        payload = snapshot(instance))
+
+def record_changes(queryset, action):
+    """
+    method to record one event per row of queryset with one INSERT. for writes
+    that skip signals, e.g. bulk_create and update(). call it in the transaction
+    that wrote the rows, after the write
+    """
+    events = [
+        models.ChangeEvent(
+            resource = resource_name(queryset.model),
+            resource_id = instance.pk,
+            action = action,
+            payload = snapshot(instance))
+        for instance in queryset]
+    models.ChangeEvent.objects.using(queryset.db).bulk_create(events, batch_size=1000)
+    return len(events)
+
+def sequence_events(batch_size=SEQUENCE_BATCH_SIZE):
+    """
+    method to give committed events without a position the next feed positions,
+    in event_id order. event_id comes from insert time, a transaction can commit
+    a lower one after higher ones were read. positions are handed out on the
+    primary under the counter's row lock and only to committed events, so an
+    event committing late is placed after everything a consumer could have read.
+    returns number of sequenced events
+    """
+    models.ResourceVersion.objects.using('default').get_or_create(name = POSITION_COUNTER)
+    sequenced = 0
+    while True:
+        with transaction.atomic(using='default'):
+            counter = models.ResourceVersion.objects.using('default').select_for_update().get(
+                name = POSITION_COUNTER)
+            ids = list(models.ChangeEvent.objects.using('default').filter(
+                position__isnull = True).order_by('event_id').values_list('event_id', flat=True)[:batch_size])
+            if not ids:
+                return sequenced
+            models.ChangeEvent.objects.using('default').bulk_update([
+                models.ChangeEvent(event_id = event_id, position = counter.version + index)
+                for index, event_id in enumerate(ids, start=1)], ['position'])
+            counter.version += len(ids)
+            counter.save(update_fields=['version'])
+        sequenced += len(ids)
+        if len(ids) < batch_size:
+            return sequenced
+
+def event_entry(row):
+    return {
+        'event_id': row['event_id'],
+        'position': row['position'],
+        'resource': row['resource'],
+        'resource_id': row['resource_id'],
+        'action': row['action'],
+        'payload': row['payload'],
+        'created_at': row['created_at']}
+
+def get_changes(since=0, limit=DEFAULT_PAGE_SIZE, resources=None):
+    """
+    method to read events after the since cursor in feed position order. only
+    reads, events are visible once sequence_events gave them a position. positions
+    commit one batch after the other, so a replica lagging behind serves a prefix
+    of the feed and never skips one. returns (entries, next cursor)
+    """
+    events = models.ChangeEvent.objects.filter(
+        position__gt = since).order_by('position')
+    if resources:
+        events = events.filter(resource__in = resources)
+    rows = list(events.values(
+        'event_id', 'position', 'resource', 'resource_id', 'action', 'payload', 'created_at')[:limit])
+    next_cursor = rows[-1]['position'] if rows else since
+    return [event_entry(row) for row in rows], next_cursor
+
+def _delete_in_batches(events, batch_size):
+    deleted = 0
+    while True:
+        ids = list(events.order_by('event_id').values_list('event_id', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += models.ChangeEvent.objects.filter(event_id__in = ids).delete()[0]
+
+def compact_events(compact_before, batch_size=1000):
+    """
+    method to drop events before compact_before superseded by a later event of
+    the same row, so a consumer starting from scratch still sees every row's
+    latest state. returns number of deleted events
+    """
+    later_event = models.ChangeEvent.objects.filter(
+        resource = OuterRef('resource'),
+        resource_id = OuterRef('resource_id'),
+        event_id__gt = OuterRef('event_id'))
+    superseded = models.ChangeEvent.objects.filter(
+        Exists(later_event),
+        created_at__lt = compact_before)
+    return _delete_in_batches(superseded, batch_size)
+
+def purge_events(purge_before, batch_size=1000):
+    """
+    method to drop every event before purge_before, returns number of deleted events
+    """
+    return _delete_in_batches(
+        models.ChangeEvent.objects.filter(created_at__lt = purge_before), batch_size)
@@ -0,0 +1,67 @@
+import contextvars
+import functools
+import random
+from django.conf import settings
+from django.core.cache import cache
+
+_use_replica = contextvars.ContextVar('use_replica', default=False)
+
+PIN_CACHE_FORMAT = 'replica_pin_%s'
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+def pin_primary(user):
+    """
+    method to send user's reads to the primary for a while after a write,
+    so the user reads their own writes even when replicas lag
+    """
+    if user is not None and user.is_authenticated:
+        cache.set(PIN_CACHE_FORMAT % user.pk, True, getattr(settings, 'REPLICA_PIN_SECONDS', 5))
+
+def is_pinned(user):
+    return user is not None and user.is_authenticated and cache.get(PIN_CACHE_FORMAT % user.pk, False)
+
+def replica_reads(view):
+    """
+    decorator for read-only views, their queries go to a replica unless the
+    user has written recently. must be placed below @api_view
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not replica_aliases() or is_pinned(request.user):
+            return view(request, *args, **kwargs)
+        token = _use_replica.set(True)
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            _use_replica.reset(token)
+    return wrapper
+
+class PrimaryReplicaRouter:
+    """
+    writes always go to 'default'. reads go to a random alias from
+    DATABASE_REPLICAS, but only inside views marked with @replica_reads and
+    only until the view writes, later reads of the request see the write
+    """
+    def db_for_read(self, model, **hints):
+        replicas = replica_aliases()
+        if replicas and _use_replica.get():
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _use_replica.set(False)
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {'default', *replica_aliases()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas receive schema changes through replication
+        if db in replica_aliases():
+            return False
+        return None
@@ -0,0 +1,167 @@
+import math
+import threading
+from array import array
+from django.conf import settings
+from django.db import router
+from . import fastserializers
+from . import models
+
+# resources whose version counters cover every column of the doctor list
+VERSION_NAMES = ('clinic', 'doctor', 'user')
+
+# sortby option of the doctor list -> lookup it orders by
+SORT_LOOKUPS = {
+    'specialization': 'specialization',
+    'start_time': 'start_time',
+    'end_time': 'end_time',
+    'first_name': 'user__first_name',
+    'last_name': 'user__last_name',
+    'created_at': 'created_at'}
+
+# text sortbys follow the database collation, which python's codepoint order
+# does not reproduce, the doctor list leaves them to the database
+COLLATED_SORTS = ('specialization', 'first_name', 'last_name')
+
+def enabled():
+    return getattr(settings, 'DOCTOR_DIRECTORY_INDEX', False)
+
+def serves(sortby):
+    return sortby not in COLLATED_SORTS
+
+def minute_of_day(value):
+    return value.hour * 60 + value.minute
+
+def seconds_of_day(value):
+    return value.hour * 3600 + value.minute * 60 + value.second + value.microsecond / 1e6
+
+class DirectoryResult:
+    """
+    lazy sequence of directory rows in result order, the paginator only
+    touches len() and the slice of the requested page
+    """
+    def __init__(self, rows, order):
+        self.rows = rows
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self.rows[position] for position in self.order[index]]
+        return self.rows[self.order[index]]
+
+class DoctorDirectory:
+    """
+    per-process snapshot of the doctor list. rows keep the projection of
+    DoctorListSerializer in primary key order, filter columns are held as
+    compact arrays - interned specialization codes and minute-of-day times -
+    and every sortby but the collated ones has a precomputed permutation of
+    row positions
+    """
+    def __init__(self, rows):
+        self.rows = rows
+        lookups = fastserializers.DoctorListSerializer.lookups
+        specialization = lookups.index('specialization')
+        start = lookups.index('start_time')
+        end = lookups.index('end_time')
+
+        # interned specialization code -> positions of its doctors
+        self.codes = {}
+        self.by_specialization = []
+        for position, row in enumerate(rows):
+            code = self.codes.setdefault(row[specialization], len(self.codes))
+            if code == len(self.by_specialization):
+                self.by_specialization.append(array('I'))
+            self.by_specialization[code].append(position)
+        self.start_minutes = array('H', (minute_of_day(row[start]) for row in rows))
+        self.end_minutes = array('H', (minute_of_day(row[end]) for row in rows))
+
+        # per sortby: ascending and descending permutations and the dense rank
+        # of every row, equal values share a rank so stable sorts keep ties in
+        # primary key order
+        self.orders = {}
+        self.ranks = {}
+        for sortby, lookup in SORT_LOOKUPS.items():
+            if not serves(sortby):
+                continue
+            column = lookups.index(lookup)
+            order = sorted(range(len(rows)), key=lambda position: rows[position][column])
+            rank = array('I', [0]) * len(rows)
+            value = 0
+            for index, position in enumerate(order):
+                if index and rows[position][column] != rows[order[index - 1]][column]:
+                    value += 1
+                rank[position] = value
+            self.orders[sortby] = (
+                array('I', order),
+                array('I', sorted(range(len(rows)), key=rank.__getitem__, reverse=True)))
+            self.ranks[sortby] = rank
+
+    def query(self, specialization=None, start_time=None, end_time=None, sortby=None, descending=False):
+        """
+        doctors with the given specialization, starting at or before start_time and
+        ending at or after end_time, ordered by sortby. same rows as the orm filters
+        of the doctor list, ties of a sortby stay in primary key order. sortbys in
+        COLLATED_SORTS are not indexed
+        """
+        positions = None
+        if specialization:
+            code = self.codes.get(specialization)
+            positions = self.by_specialization[code] if code is not None else array('I')
+        if start_time is not None or end_time is not None:
+            # stored times are whole minutes, so a query time with seconds
+            # compares against its floor for start and its ceiling for end
+            start_limit = math.floor(seconds_of_day(start_time) / 60) if start_time is not None else 24 * 60
+            end_limit = math.ceil(seconds_of_day(end_time) / 60) if end_time is not None else 0
+            starts = self.start_minutes
+            ends = self.end_minutes
+            positions = array('I', (
+                position for position in (range(len(self.rows)) if positions is None else positions)
+                if starts[position] <= start_limit and ends[position] >= end_limit))
+
+        if sortby is None:
+            order = range(len(self.rows)) if positions is None else positions
+        elif positions is None:
+            order = self.orders[sortby][descending]
+        else:
+            order = array('I', sorted(positions, key=self.ranks[sortby].__getitem__, reverse=descending))
+        return DirectoryResult(self.rows, order)
+
+def whole_minutes(rows, columns):
+    return all(
+        row[column].second == 0 and row[column].microsecond == 0
+        for row in rows for column in columns)
+
+def build_directory(alias):
+    serializer = fastserializers.DoctorListSerializer
+    rows = list(serializer.project(models.Doctor.objects.using(alias).order_by('pk')))
+    columns = (serializer.lookups.index('start_time'), serializer.lookups.index('end_time'))
+    if not whole_minutes(rows, columns):
+        # minute-of-day arrays would round these, leave the list to the database
+        return None
+    return DoctorDirectory(rows)
+
+_directory_lock = threading.Lock()
+_directory = None
+
+def get_directory():
+    """
+    current directory snapshot, rebuilt when a version counter of doctors, clinics
+    or users is ahead of the snapshot's. a replica lagging behind the snapshot
+    does not cause a rebuild. returns None when the list has to be read from the
+    database
+    """
+    global _directory
+    alias = router.db_for_read(models.Doctor)
+    # versions are read before the rows, a change made during the build bumps
+    # them past the snapshot's and the next check rebuilds again
+    versions = dict(models.ResourceVersion.objects.using(alias).filter(
+        name__in = VERSION_NAMES).values_list('name', 'version'))
+    with _directory_lock:
+        current = _directory
+        if current is None or any(
+                versions.get(name, 0) > current[0].get(name, 0) for name in VERSION_NAMES):
+            current = (versions, build_directory(alias))
+            _directory = current
+        return current[1]
@@ -0,0 +1,68 @@
+import functools
+import hashlib
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseNotModified
+from drf_yasg import openapi
+from rest_framework.permissions import AllowAny
+
+api_info = openapi.Info(
+    title = 'Medical Appointment Booking System',
+    default_version='v1',
+    description = 'API documentation of Medical Appointment Booking System',
+    contact=openapi.Contact(email='guptapiyush238@gmail.com',name='Piyush Gupta'),
+    license=openapi.License(name='BSD License'),
+)
+
+SCHEMA_CACHE_SECONDS = 60 * 60
+
+@functools.cache
+def live_schema_view():
+    # drf_yasg.views pulls in codecs and the spec validator, so it is only
+    # imported once somebody actually opens the documentation
+    from drf_yasg.views import get_schema_view
+    return get_schema_view(
+        api_info,
+        public=True,
+        permission_classes=[AllowAny],
+        authentication_classes=[])
+
+@functools.cache
+def ui_view(renderer):
+    return live_schema_view().with_ui(renderer, cache_timeout=0)
+
+def swagger_ui(request, *args, **kwargs):
+    return ui_view('swagger')(request, *args, **kwargs)
+
+def redoc_ui(request, *args, **kwargs):
+    return ui_view('redoc')(request, *args, **kwargs)
+
+@functools.cache
+def load_static_schema():
+    """
+    schema written at build time by `manage.py generate_swagger`, as (content, etag).
+    None when the file has not been generated
+    """
+    path = getattr(settings, 'API_SCHEMA_FILE', None)
+    try:
+        with open(path, 'rb') as schema_file:
+            content = schema_file.read()
+    except (OSError, TypeError):
+        return None
+    return content, f'"{hashlib.md5(content, usedforsecurity=False).hexdigest()}"'
+
+def schema_document(request, format):
+    """
+    serve prebuilt json schema with cache headers, generate it live otherwise
+    """
+    schema = load_static_schema() if format == '.json' else None
+    if schema is None:
+        return live_schema_view().without_ui(cache_timeout=0)(request, format=format)
+
+    content, etag = schema
+    if request.headers.get('If-None-Match') == etag:
+        response = HttpResponseNotModified()
+    else:
+        response = HttpResponse(content, content_type='application/json')
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = f'public, max-age={SCHEMA_CACHE_SECONDS}'
+    return response
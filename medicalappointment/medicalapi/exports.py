@@ -0,0 +1,102 @@
+import csv
+import tempfile
+from django.http import FileResponse, StreamingHttpResponse
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FILE_TYPES = ['csv', 'xlsx']
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+PATIENT_EXPORT_COLUMNS = [
+    ('patient_id', 'patient_id'),
+    ('username', 'user__username'),
+    ('first_name', 'user__first_name'),
+    ('last_name', 'user__last_name'),
+    ('email', 'user__email'),
+    ('dob', 'dob'),
+    ('gender', 'gender'),
+    ('phone_number', 'phone_number'),
+    ('created_at', 'created_at')]
+
+APPOINTMENT_EXPORT_COLUMNS = [
+    ('appointment_id', 'appointment_id'),
+    ('date', 'date'),
+    ('time', 'time'),
+    ('status', 'status'),
+    ('doctor_username', 'doctor__user__username'),
+    ('specialization', 'doctor__specialization'),
+    ('patient_username', 'patient__user__username'),
+    ('created_at', 'created_at')]
+
+# spreadsheet apps evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+class Echo:
+    """
+    file-like object that hands back whatever csv writer writes into it
+    """
+    def write(self, value):
+        return value
+
+def format_value(value):
+    # same formats as the api serializers use
+    if hasattr(value, 'hour') and hasattr(value, 'year'):
+        return value.isoformat()
+    if hasattr(value, 'year'):
+        return value.strftime('%d-%m-%Y')
+    if hasattr(value, 'hour'):
+        return value.strftime('%H:%M')
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        # user supplied text, quoted so it is shown instead of evaluated
+        return f"'{value}"
+    return value
+
+def iter_rows(queryset, columns):
+    """
+    one query over a server-side cursor, only the exported columns are fetched
+    """
+    rows = queryset.values_list(*[lookup for _, lookup in columns])
+    for row in rows.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield [format_value(value) for value in row]
+
+def stream_csv(queryset, columns, filename):
+    writer = csv.writer(Echo())
+
+    def content():
+        yield writer.writerow([header for header, _ in columns])
+        for row in iter_rows(queryset, columns):
+            yield writer.writerow(row)
+
+    response = StreamingHttpResponse(content(), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
+def write_xlsx(queryset, columns, filename):
+    """
+    xlsx is a zip whose directory is written last, so unlike csv it is not
+    streamed: the workbook is built in a temporary file before the response starts
+    """
+    import openpyxl
+    # write-only workbook keeps rows on disk, only the zip is assembled at save
+    wb = openpyxl.Workbook(write_only=True)
+    sheet = wb.create_sheet(title=filename)
+    sheet.append([header for header, _ in columns])
+    for row in iter_rows(queryset, columns):
+        sheet.append(row)
+
+    output = tempfile.TemporaryFile()
+    wb.save(output)
+    output.seek(0)
+    return FileResponse(
+        output,
+        as_attachment=True,
+        filename=f'{filename}.xlsx',
+        content_type=XLSX_CONTENT_TYPE)
+
+def export_queryset(queryset, columns, filename, file_type):
+    # rows are read after the view returns, so fix the database chosen
+    # by the router now while the view's replica routing is still active
+    queryset = queryset.using(queryset.db)
+    if file_type == 'xlsx':
+        return write_xlsx(queryset, columns, filename)
+    return stream_csv(queryset, columns, filename)
@@ -0,0 +1,111 @@
+from operator import itemgetter
+from rest_framework import serializers
+
+# shared field instances, built once instead of once per serialized row
+CONVERTERS = {
+    'to_hhmm': serializers.TimeField(format='%H:%M').to_representation,
+    'to_ddmmyyyy': serializers.DateField(format='%d-%m-%Y').to_representation,
+    'to_datetime': serializers.DateTimeField().to_representation,
+}
+
+def compose(convert, getter):
+    def value(row):
+        return convert(getter(row))
+    return value
+
+def unless_null(index, getter):
+    # None when the row's value at index is None, e.g. a missing foreign key
+    def value(row):
+        return None if row[index] is None else getter(row)
+    return value
+
+class RowSerializer:
+    """
+    read-only fast path for list endpoints. a spec of (key, lookup[, converter])
+    and (key, nested_spec[, null_lookup]) entries is compiled once into a
+    values_list() projection and a function turning each row tuple into the
+    same dict the matching DRF serializer produces
+    """
+    def __init__(self, spec):
+        self.lookups = []
+        self.render_row = self._compile(spec)
+
+    def _index(self, lookup):
+        if lookup not in self.lookups:
+            self.lookups.append(lookup)
+        return self.lookups.index(lookup)
+
+    def _compile(self, spec):
+        fields = []
+        for key, source, *extra in spec:
+            option = extra[0] if extra else None
+            if isinstance(source, list):
+                value = self._compile(source)
+                if option is not None:
+                    value = unless_null(self._index(option), value)
+            else:
+                index = self._index(source)
+                value = itemgetter(index)
+                if option is not None:
+                    value = unless_null(index, compose(CONVERTERS[option], value))
+            fields.append((key, value))
+
+        def render_row(row):
+            return {key: value(row) for key, value in fields}
+        return render_row
+
+    def project(self, queryset):
+        return queryset.values_list(*self.lookups)
+
+    def render(self, rows):
+        render_row = self.render_row
+        return [render_row(row) for row in rows]
+
+def user_spec(prefix):
+    # mirrors UserGetSerializer
+    return [
+        ('first_name', f'{prefix}first_name'),
+        ('last_name', f'{prefix}last_name'),
+        ('username', f'{prefix}username'),
+        ('email', f'{prefix}email')]
+
+def clinic_spec(prefix):
+    # mirrors ClinicSerializer
+    return [
+        ('id', f'{prefix}id'),
+        ('name', f'{prefix}name'),
+        ('address', f'{prefix}address'),
+        ('contact_number', f'{prefix}contact_number')]
+
+def doctor_spec(prefix=''):
+    # mirrors DoctorGetSerializer
+    return [
+        ('specialization', f'{prefix}specialization'),
+        ('available_days', f'{prefix}available_days'),
+        ('start_time', f'{prefix}start_time', 'to_hhmm'),
+        ('end_time', f'{prefix}end_time', 'to_hhmm'),
+        ('user', user_spec(f'{prefix}user__')),
+        ('clinic', clinic_spec(f'{prefix}clinic__'), f'{prefix}clinic__id'),
+        ('created_at', f'{prefix}created_at', 'to_datetime')]
+
+def patient_spec(prefix=''):
+    # mirrors PatientGetSerializer
+    return [
+        ('dob', f'{prefix}dob', 'to_ddmmyyyy'),
+        ('gender', f'{prefix}gender'),
+        ('phone_number', f'{prefix}phone_number'),
+        ('user', user_spec(f'{prefix}user__'))]
+
+def appointment_spec():
+    # mirrors AppointmentGetSerializer
+    return [
+        ('date', 'date', 'to_ddmmyyyy'),
+        ('time', 'time', 'to_hhmm'),
+        ('doctor', doctor_spec('doctor__')),
+        ('patient', patient_spec('patient__')),
+        ('status', 'status'),
+        ('created_at', 'created_at', 'to_datetime')]
+
+DoctorListSerializer = RowSerializer(doctor_spec())
+PatientListSerializer = RowSerializer(patient_spec())
+AppointmentListSerializer = RowSerializer(appointment_spec())
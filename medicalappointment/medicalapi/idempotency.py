@@ -0,0 +1,120 @@
+import functools
+import hashlib
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from . import models
+from . import serializers
+
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+def purge_expired_keys(batch_size=1000):
+    """
+    method to delete idempotency keys older than the ttl, returns number of deleted rows
+    """
+    cutoff = timezone.now() - key_ttl()
+    deleted = 0
+    while True:
+        ids = list(models.IdempotencyKey.objects.filter(
+            created_at__lt = cutoff).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += models.IdempotencyKey.objects.filter(pk__in = ids).delete()[0]
+
+def request_hash(request):
+    """
+    sha256 hex digest of the query string and the parsed request body, uploaded
+    files by their content. files are rewound so the view can read them again
+    """
+    digest = hashlib.sha256(request.META.get('QUERY_STRING', '').encode())
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = {name: values for name, values in data.lists() if name not in request.FILES}
+    digest.update(json.dumps(data, sort_keys=True, default=str).encode())
+    for name, files in sorted(request.FILES.lists()):
+        digest.update(name.encode())
+        for uploaded_file in files:
+            for chunk in uploaded_file.chunks():
+                digest.update(chunk)
+            uploaded_file.seek(0)
+    return digest.hexdigest()
+
+def _claim(user, key, endpoint, fingerprint):
+    """
+    stored record for the key, or None when this request now owns the key
+    """
+    records = models.IdempotencyKey.objects.filter(user = user, key = key, endpoint = endpoint)
+    records.filter(created_at__lt = timezone.now() - key_ttl()).delete()
+    try:
+        with transaction.atomic():
+            models.IdempotencyKey.objects.create(
+                user = user, key = key, endpoint = endpoint, request_hash = fingerprint)
+        return None
+    except IntegrityError:
+        return records.first()
+
+def idempotent(view):
+    """
+    decorator for POST views so that a retried request carrying the same
+    Idempotency-Key header gets the stored response back instead of running
+    validation and inserts again. reusing a key with a different body or query
+    string is rejected with 422. must be placed below @api_view
+    """
+    @functools.wraps(view)
+    def wrapper(request, *args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(request, *args, **kwargs)
+
+        url = request.get_full_path()
+        if len(key) > MAX_KEY_LENGTH:
+            err = serializers.ResponseSerializer({
+                'message':f'{IDEMPOTENCY_HEADER} header must not be longer than {MAX_KEY_LENGTH} characters',
+                'status':400,
+                'url':url})
+            return Response(err.data, status=400)
+
+        fingerprint = request_hash(request)
+        stored = _claim(request.user, key, request.path, fingerprint)
+        if stored is not None:
+            if stored.request_hash != fingerprint:
+                err = serializers.ResponseSerializer({
+                    'message':f'{IDEMPOTENCY_HEADER} was already used for a request with a different body or query string',
+                    'status':422,
+                    'url':url})
+                return Response(err.data, status=422)
+            if stored.response_status is None:
+                err = serializers.ResponseSerializer({
+                    'message':'A request with this idempotency key is still being processed',
+                    'status':409,
+                    'url':url})
+                return Response(err.data, status=409)
+            return Response(
+                stored.response_body,
+                status=stored.response_status,
+                headers={'Idempotent-Replayed': 'true'})
+
+        records = models.IdempotencyKey.objects.filter(
+            user = request.user, key = key, endpoint = request.path)
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            records.delete()
+            raise
+
+        if response.status_code >= 500:
+            # server errors are not final, let the client retry for real
+            records.delete()
+        else:
+            records.update(
+                response_status = response.status_code,
+                response_body = response.data)
+        return response
+    return wrapper
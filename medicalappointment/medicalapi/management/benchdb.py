@@ -0,0 +1,20 @@
+from contextlib import contextmanager
+from django.db import connections
+from django.test.utils import setup_databases, teardown_databases
+
+@contextmanager
+def throwaway_databases(verbosity=0):
+    """
+    context manager for benchmarks that load synthetic rows. the block runs
+    against freshly migrated test databases, replicas mirror 'default' as in
+    the test runner, and they are dropped on exit even when the block fails,
+    so the configured databases are never written
+    """
+    old_config = setup_databases(verbosity, interactive=False, serialized_aliases=set())
+    try:
+        yield
+    finally:
+        teardown_databases(old_config, verbosity)
+        # in-memory sqlite connections are not closed by the teardown and
+        # would keep serving the dropped test database
+        connections.close_all()
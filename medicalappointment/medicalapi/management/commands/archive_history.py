@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from medicalapi import archive, models
+
+class Command(BaseCommand):
+    help = 'Move appointments, prescriptions and availability of past months into archive tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--keep-months',
+            type=int,
+            default=0,
+            help='past months to keep in the hot tables besides the current one')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='only count the rows that would be moved')
+
+    def handle(self, *args, **options):
+        cutoff = archive.month_cutoff(options['keep_months'])
+
+        if options['dry_run']:
+            appointments = models.Appointment.objects.filter(date__lt = cutoff).count()
+            availability = models.DoctorAvailability.objects.filter(date__lt = cutoff).count()
+            self.stdout.write(
+                f'would archive {appointments} appointments and {availability} '
+                f'availability slots dated before {cutoff}')
+            return
+
+        moved = archive.archive_before(cutoff, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"archived {moved['appointments']} appointments and {moved['availability']} "
+            f'availability slots dated before {cutoff}'))
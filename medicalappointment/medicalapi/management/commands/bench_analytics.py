@@ -0,0 +1,103 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock, timedelta
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from medicalapi import analytics, conditional, models, occupancy
+from medicalapi.management.benchdb import throwaway_databases
+
+class Command(BaseCommand):
+    help = 'Compare analytics latency of rollup tables against GROUP BY over raw appointments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--appointments', type=int, default=100000,
+            help='appointments to create, e.g. 50000000 for the full size run')
+        parser.add_argument('--doctors', type=int, default=100)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--no-load', action='store_true',
+            help='measure the existing rows of the configured database, without it the rows are '
+                 'loaded into a throwaway test database that is dropped afterwards')
+
+    def load(self, count, doctors, days, batch_size):
+        users = User.objects.bulk_create([User(username = f'bench_doctor_{index}') for index in range(doctors)])
+        doctor_ids = [doctor.pk for doctor in models.Doctor.objects.bulk_create([
+            models.Doctor(
+                user = user,
+                specialization = 'general',
+                available_days = 'mon,tue,wed,thu,fri',
+                start_time = clock(9),
+                end_time = clock(17))
+            for user in users])]
+        patient = models.Patient.objects.create(
+            user = User.objects.create(username = 'bench_patient'), dob = date(1990, 1, 1), phone_number = '9999999999')
+
+        rng = random.Random(0)
+        start = date(2024, 1, 1)
+        for offset in range(0, count, batch_size):
+            models.Appointment.objects.bulk_create([
+                models.Appointment(
+                    doctor_id = rng.choice(doctor_ids),
+                    patient = patient,
+                    date = start + timedelta(days=rng.randrange(days)),
+                    time = clock(rng.randrange(9, 17), rng.choice((0, 15, 30, 45))),
+                    status = models.AppointmentStatus.CANCELLED if rng.random() < 0.1 else models.AppointmentStatus.BOOKED)
+                for _ in range(min(batch_size, count - offset))])
+            self.stdout.write(f'loaded {min(offset + batch_size, count)}/{count}', ending='\r')
+        self.stdout.write('')
+
+        # bulk_create skips the signals keeping occupancy, versions and rollups
+        occupancy.rebuild_occupancy()
+        conditional.bump_versions('appointment')
+        analytics.rebuild_rollups()
+
+    def timed(self, function):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(timings)
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        if options['no_load']:
+            self.measure()
+            return
+        with throwaway_databases():
+            self.load(options['appointments'], options['doctors'], options['days'], options['batch_size'])
+            self.measure()
+
+    def measure(self):
+        def raw_utilization():
+            return list(models.Appointment.objects.values('doctor__user__username').annotate(
+                booked_count = Count('pk', filter=analytics.BOOKED),
+                cancelled_count = Count('pk', filter=analytics.CANCELLED)).order_by('doctor__user__username'))
+
+        def raw_heatmap():
+            return list(models.Appointment.objects.annotate(
+                weekday = ExtractIsoWeekDay('date'), hour = ExtractHour('time')).values(
+                    'weekday', 'hour').annotate(booked_count = Count('pk', filter=analytics.BOOKED)).order_by(
+                        'weekday', 'hour'))
+
+        def rollup_utilization():
+            return analytics.utilization(models.DoctorDailyStats.objects.all(), 'doctor')
+
+        def rollup_heatmap():
+            return analytics.heatmap(models.DoctorHourlyStats.objects.all())
+
+        cases = [
+            ('utilization', raw_utilization, rollup_utilization),
+            ('heatmap', raw_heatmap, rollup_heatmap)]
+        for name, raw, rollup in cases:
+            raw_rows, raw_ms = self.timed(raw)
+            rollup_rows, rollup_ms = self.timed(rollup)
+            if [row['booked_count'] for row in raw_rows] != [row['booked_count'] for row in rollup_rows]:
+                self.stdout.write(f'{name}: rollups differ from raw tables, archived rows or pending refresh')
+            self.stdout.write(
+                f'{name:<12} raw={raw_ms:.1f}ms rollup={rollup_ms:.1f}ms '
+                f'speedup={raw_ms / max(rollup_ms, 1e-9):.1f}x')
@@ -0,0 +1,81 @@
+import random
+import statistics
+import time
+from datetime import date, time as clock
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from medicalapi import conditional, models, search
+from medicalapi.management.benchdb import throwaway_databases
+
+TERMS = [
+    'bronchitis', 'migraine', 'hypertension', 'diabetes', 'asthma', 'fracture', 'dermatitis',
+    'gastritis', 'influenza', 'anemia', 'arthritis', 'sinusitis', 'insomnia', 'allergy',
+    'cough', 'fever', 'rest', 'fluids', 'physiotherapy', 'diet', 'review', 'followup',
+    'amoxicillin', 'ibuprofen', 'metformin', 'salbutamol', 'paracetamol', 'omeprazole']
+
+QUERIES = ['cough', 'bronchitis rest', 'metformin diabetes', 'fracture physiotherapy', 'allergy']
+
+class Command(BaseCommand):
+    help = 'Load synthetic medical records and time ranked clinical search against them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--records', type=int, default=100000,
+            help='medical records to create, e.g. 10000000 for the full size run')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--no-load', action='store_true',
+            help='search the existing rows of the configured database, without it the rows are '
+                 'loaded into a throwaway test database that is dropped afterwards')
+
+    def load(self, records, batch_size):
+        doctor = models.Doctor.objects.create(
+            user = User.objects.create(username = 'bench_doctor'),
+            specialization = 'general',
+            available_days = 'mon,tue,wed,thu,fri',
+            start_time = clock(9),
+            end_time = clock(17))
+        patient = models.Patient.objects.create(
+            user = User.objects.create(username = 'bench_patient'), dob = date(1990, 1, 1), phone_number = '9999999999')
+
+        rng = random.Random(0)
+        for offset in range(0, records, batch_size):
+            models.MedicalRecord.objects.bulk_create([
+                models.MedicalRecord(
+                    patient = patient,
+                    doctor = doctor,
+                    diagnosis = ' '.join(rng.sample(TERMS[:14], 2)),
+                    treatment = ' '.join(rng.sample(TERMS[14:], 3)))
+                for _ in range(min(batch_size, records - offset))])
+            self.stdout.write(f'loaded {min(offset + batch_size, records)}/{records}', ending='\r')
+        self.stdout.write('')
+
+        # bulk_create skips the post_save signal that fills the vectors
+        search.refresh_search_vectors(models.MedicalRecord.objects.all())
+        conditional.bump_versions('medicalrecord')
+
+    def handle(self, *args, **options):
+        if options['no_load']:
+            self.measure(options['repeat'])
+            return
+        with throwaway_databases():
+            self.load(options['records'], options['batch_size'])
+            self.measure(options['repeat'])
+
+    def measure(self, repeat):
+        backend = 'tsvector + gin' if search.uses_postgres(connection.alias) else 'inverted index'
+        filters, _ = search.parse_filters({})
+        if not search.uses_postgres(connection.alias):
+            start = time.perf_counter()
+            search.get_fallback_index(connection.alias)
+            self.stdout.write(f'index build {(time.perf_counter() - start) * 1000:.1f}ms')
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results = search.search_clinical_text(query, filters, search.DEFAULT_LIMIT, connection.alias)
+                timings.append((time.perf_counter() - start) * 1000)
+            self.stdout.write(
+                f'{backend:<15} q={query!r:<26} hits={len(results):<3} '
+                f'median={statistics.median(timings):.2f}ms max={max(timings):.2f}ms')
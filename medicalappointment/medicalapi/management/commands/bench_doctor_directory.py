@@ -0,0 +1,124 @@
+import random
+import statistics
+import time
+import tracemalloc
+from datetime import time as clock
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.db import router
+from medicalapi import conditional, directory, fastserializers, models
+from medicalapi.management.benchdb import throwaway_databases
+
+SPECIALIZATIONS = [f'specialization {index}' for index in range(40)]
+
+# (name, specialization, start_time, end_time, sortby, descending, page)
+CASES = [
+    ('first page', None, None, None, None, False, 1),
+    ('specialization', SPECIALIZATIONS[3], None, None, None, False, 1),
+    ('time window', None, clock(10), clock(16), 'end_time', False, 1),
+    ('all filters', SPECIALIZATIONS[7], clock(11), clock(15), 'start_time', True, 1),
+    ('deep page', None, None, None, 'created_at', True, 2000)]
+
+class Command(BaseCommand):
+    help = 'Compare memory and latency of the in-process doctor directory against the orm doctor list'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--doctors', type=int, default=100000)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--no-load', action='store_true',
+            help='measure the existing rows of the configured database, without it the rows are '
+                 'loaded into a throwaway test database that is dropped afterwards')
+
+    def load(self, count, batch_size):
+        rng = random.Random(0)
+        first = User.objects.count()
+        for offset in range(0, count, batch_size):
+            size = min(batch_size, count - offset)
+            users = User.objects.bulk_create([
+                User(
+                    username = f'bench_doctor_{first + offset + index}',
+                    first_name = f'first {rng.randrange(5000)}',
+                    last_name = f'last {rng.randrange(20000)}')
+                for index in range(size)])
+            doctors = []
+            for user in users:
+                start = rng.randrange(14, 24) * 30
+                end = start + rng.randrange(4, 16) * 30
+                doctors.append(models.Doctor(
+                    user = user,
+                    specialization = rng.choice(SPECIALIZATIONS),
+                    available_days = 'mon,tue,wed,thu,fri',
+                    start_time = clock(start // 60, start % 60),
+                    end_time = clock(min(end // 60, 23), end % 60)))
+            models.Doctor.objects.bulk_create(doctors)
+            self.stdout.write(f'loaded {offset + size}/{count}', ending='\r')
+        self.stdout.write('')
+        # bulk_create skips the signals bumping the version counters
+        conditional.bump_versions('user', 'doctor')
+
+    def timed(self, function):
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            result = function()
+            timings.append((time.perf_counter() - start) * 1000)
+        return result, statistics.median(timings)
+
+    def orm_page(self, specialization, start_time, end_time, sortby, descending, page):
+        doctors = models.Doctor.objects.all()
+        if specialization:
+            doctors = doctors.filter(specialization = specialization)
+        if start_time is not None:
+            doctors = doctors.filter(start_time__lte = start_time)
+        if end_time is not None:
+            doctors = doctors.filter(end_time__gte = end_time)
+        if sortby:
+            lookup = directory.SORT_LOOKUPS[sortby]
+            doctors = doctors.order_by(f'-{lookup}' if descending else lookup)
+        else:
+            doctors = doctors.order_by('pk')
+        paginator = Paginator(fastserializers.DoctorListSerializer.project(doctors), 10)
+        return paginator.count, fastserializers.DoctorListSerializer.render(paginator.get_page(page))
+
+    def directory_page(self, specialization, start_time, end_time, sortby, descending, page):
+        doctor_index = directory.get_directory()
+        paginator = Paginator(doctor_index.query(specialization, start_time, end_time, sortby, descending), 10)
+        return paginator.count, fastserializers.DoctorListSerializer.render(paginator.get_page(page))
+
+    def handle(self, *args, **options):
+        self.repeat = options['repeat']
+        if options['no_load']:
+            self.measure()
+            return
+        with throwaway_databases():
+            self.load(options['doctors'], options['batch_size'])
+            self.measure()
+
+    def measure(self):
+        alias = router.db_for_read(models.Doctor)
+        start = time.perf_counter()
+        directory.build_directory(alias)
+        build_ms = (time.perf_counter() - start) * 1000
+        # tracing slows the build down, memory is measured on a second one
+        tracemalloc.start()
+        doctor_index = directory.build_directory(alias)
+        retained, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        if doctor_index is None:
+            self.stdout.write('doctor times are not whole minutes, the directory is not used')
+            return
+        self.stdout.write(
+            f'directory of {len(doctor_index.rows)} doctors: build={build_ms:.0f}ms '
+            f'retained={retained / 2**20:.1f}MiB peak={peak / 2**20:.1f}MiB')
+
+        directory.get_directory()
+        for name, *params in CASES:
+            (orm_count, _), orm_ms = self.timed(lambda: self.orm_page(*params))
+            (index_count, _), index_ms = self.timed(lambda: self.directory_page(*params))
+            if orm_count != index_count:
+                self.stdout.write(f'{name}: directory matched {index_count} doctors, orm {orm_count}')
+            self.stdout.write(
+                f'{name:<15} matches={orm_count:<7} orm={orm_ms:.2f}ms directory={index_ms:.2f}ms '
+                f'speedup={orm_ms / max(index_ms, 1e-9):.1f}x')
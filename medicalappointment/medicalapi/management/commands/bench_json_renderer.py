@@ -0,0 +1,49 @@
+import io
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from medicalapi import renderers
+
+def appointments_payload(rows):
+    doctor = {
+        'specialization': 'Cardiology', 'available_days': 'Mon,Tue,Wed',
+        'start_time': '09:00', 'end_time': '17:00',
+        'user': {'first_name': 'Asha', 'last_name': 'Rao', 'username': 'dr_asha', 'email': 'asha@example.com'},
+        'clinic': {'id': 1, 'name': 'City Clinic', 'address': 'MG Road', 'contact_number': '9876543210'},
+        'created_at': '2026-01-01T09:00:00.123456Z'}
+    return [{
+        'date': '01-01-2026', 'time': '09:30', 'doctor': doctor,
+        'patient': {
+            'dob': '01-01-1990', 'gender': 'F', 'phone_number': '9999999999',
+            'user': {'first_name': 'Pat', 'last_name': f'No{i}', 'username': f'pat{i}', 'email': f'pat{i}@example.com'}},
+        'status': 'B', 'created_at': '2026-01-01T09:00:00.123456Z'} for i in range(rows)]
+
+class Command(BaseCommand):
+    help = 'Time FastJSONRenderer/FastJSONParser against DRF defaults on a large appointments/list payload'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        stdlib_renderer, fast_renderer = JSONRenderer(), renderers.FastJSONRenderer()
+        stdlib_parser, fast_parser = JSONParser(), renderers.FastJSONParser()
+        self.stdout.write(f'orjson available: {renderers.orjson is not None}')
+
+        payload = appointments_payload(options['rows'])
+        body = stdlib_renderer.render(payload)
+        if fast_renderer.render(payload) != body:
+            raise CommandError('renderer output differs for appointments payload')
+
+        cases = [
+            ('render stdlib', lambda: stdlib_renderer.render(payload)),
+            ('render fast', lambda: fast_renderer.render(payload)),
+            ('parse stdlib', lambda: stdlib_parser.parse(io.BytesIO(body))),
+            ('parse fast', lambda: fast_parser.parse(io.BytesIO(body)))]
+        for name, func in cases:
+            start = time.perf_counter()
+            for _ in range(options['repeat']):
+                func()
+            elapsed = (time.perf_counter() - start) / options['repeat'] * 1000
+            self.stdout.write(f'{name:<14} rows={options["rows"]} bytes={len(body)} {elapsed:.2f}ms')
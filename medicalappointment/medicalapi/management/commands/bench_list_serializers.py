@@ -0,0 +1,42 @@
+import time
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+from medicalapi import fastserializers, models, serializers
+
+class Command(BaseCommand):
+    help = 'Compare DRF list serializers against the values() fast path on existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=50)
+
+    def handle(self, *args, **options):
+        rows, repeat = options['rows'], options['repeat']
+        cases = [
+            ('doctors', models.Doctor.objects.order_by('pk'),
+                serializers.DoctorGetSerializer, fastserializers.DoctorListSerializer),
+            ('patients', models.Patient.objects.order_by('pk'),
+                serializers.PatientGetSerializer, fastserializers.PatientListSerializer),
+            ('appointments', models.Appointment.objects.order_by('pk'),
+                serializers.AppointmentGetSerializer, fastserializers.AppointmentListSerializer)]
+        renderer = JSONRenderer()
+
+        for name, queryset, drf_serializer, fast_serializer in cases:
+            def drf_path():
+                return renderer.render(drf_serializer(queryset[:rows], many=True).data)
+
+            def fast_path():
+                return renderer.render(fast_serializer.render(fast_serializer.project(queryset)[:rows]))
+
+            if drf_path() != fast_path():
+                raise CommandError(f'{name}: fast path output differs from DRF serializer')
+
+            timings = []
+            for path in (drf_path, fast_path):
+                start = time.perf_counter()
+                for _ in range(repeat):
+                    path()
+                timings.append((time.perf_counter() - start) / repeat * 1000)
+            self.stdout.write(
+                f'{name:<13} rows={min(rows, queryset.count()):<5} drf={timings[0]:.2f}ms '
+                f'fast={timings[1]:.2f}ms speedup={timings[0] / max(timings[1], 1e-9):.1f}x')
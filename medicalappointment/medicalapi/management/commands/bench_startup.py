@@ -0,0 +1,60 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# runs in a fresh interpreter, so every import is paid again like on a new worker
+PROBE = '''
+import json, time
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+from django.urls import get_resolver
+get_resolver().url_patterns
+imported = time.perf_counter()
+from django.conf import settings
+from django.test import Client
+settings.ALLOWED_HOSTS = [*settings.ALLOWED_HOSTS, 'localhost']
+response = Client(HTTP_HOST='localhost').get({path!r})
+answered = time.perf_counter()
+print(json.dumps({{
+    "status": response.status_code,
+    "import_ms": (imported - start) * 1000,
+    "first_response_ms": (answered - start) * 1000}}))
+'''
+
+class Command(BaseCommand):
+    help = 'Measure import time and time-to-first-response of a cold worker'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--path',
+            default='/medical/doctors/list',
+            help='endpoint requested anonymously by the cold worker, the default is answered by '
+                 'the view\'s permission check after authentication, without a database')
+        parser.add_argument('--status', type=int, default=401,
+            help='status the endpoint must answer with, anything else fails the run')
+
+    def handle(self, *args, **options):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=os.environ.get(
+            'DJANGO_SETTINGS_MODULE', 'medicalappointment.settings'))
+        results = []
+        for _ in range(options['runs']):
+            output = subprocess.run(
+                [sys.executable, '-c', PROBE.format(path=options['path'])],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True)
+            result = json.loads(output.stdout.strip().splitlines()[-1])
+            if result['status'] != options['status']:
+                raise CommandError(
+                    f'{options["path"]} answered {result["status"]}, expected {options["status"]}')
+            results.append(result)
+
+        for key in ('import_ms', 'first_response_ms'):
+            values = [result[key] for result in results]
+            self.stdout.write(
+                f'{key:<18} median={statistics.median(values):.1f} '
+                f'min={min(values):.1f} max={max(values):.1f}')
@@ -0,0 +1,61 @@
+import time
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework.test import APIRequestFactory
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+from medicalapi.authentication import CachedJWTAuthentication, user_cache
+
+class Command(BaseCommand):
+    help = 'Compare queries and time per request of JWTAuthentication and CachedJWTAuthentication'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='user to authenticate as, defaults to the first patient, the default path lists their appointments')
+        parser.add_argument('--repeat', type=int, default=1000)
+        parser.add_argument('--path', default='/medical/appointments/list',
+            help='hot endpoint to request end to end with the configured authentication')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['username']:
+            users = users.filter(username = options['username'])
+        else:
+            users = users.filter(patient__isnull = False)
+        user = users.first()
+        if user is None:
+            raise CommandError('no user to authenticate as')
+
+        token = str(AccessToken.for_user(user))
+        header = f'Bearer {token}'
+        request = APIRequestFactory().get(options['path'], HTTP_AUTHORIZATION=header)
+        user_cache.clear()
+
+        for authenticator in (JWTAuthentication(), CachedJWTAuthentication()):
+            authenticator.authenticate(request)
+            with CaptureQueriesContext(connection) as queries:
+                start = time.perf_counter()
+                for _ in range(options['repeat']):
+                    authenticator.authenticate(request)
+                elapsed = time.perf_counter() - start
+            self.stdout.write(
+                f'{type(authenticator).__name__:<24} queries/request={len(queries) / options["repeat"]:.2f} '
+                f'{elapsed / options["repeat"] * 1e6:.1f}us/request')
+
+        # the test client's default host testserver is not an allowed host
+        client = Client(HTTP_HOST='localhost', HTTP_AUTHORIZATION=header)
+        with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'localhost']):
+            client.get(options['path'])
+            with CaptureQueriesContext(connection) as queries:
+                response = client.get(options['path'])
+        if response.status_code != 200:
+            raise CommandError(
+                f'GET {options["path"]} answered {response.status_code}, pass a --username '
+                f'and --path the user can read')
+        user_queries = [q for q in queries if 'FROM "auth_user"' in q['sql'] and '"auth_user"."id" =' in q['sql']]
+        self.stdout.write(
+            f'GET {options["path"]} status={response.status_code} queries={len(queries)} '
+            f'user lookups={len(user_queries)} cache hits={user_cache.hits} misses={user_cache.misses}')
@@ -0,0 +1,24 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from medicalapi import changefeed
+
+class Command(BaseCommand):
+    help = 'Sequence committed change events, drop superseded change events and events past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--compact-after-hours', type=int,
+            default=getattr(settings, 'CHANGE_FEED_COMPACT_AFTER_HOURS', 24))
+        parser.add_argument('--retention-days', type=int,
+            default=getattr(settings, 'CHANGE_FEED_RETENTION_DAYS', 30))
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        sequenced = changefeed.sequence_events()
+        now = timezone.now()
+        compacted = changefeed.compact_events(
+            now - timedelta(hours=options['compact_after_hours']), options['batch_size'])
+        purged = changefeed.purge_events(
+            now - timedelta(days=options['retention_days']), options['batch_size'])
+        self.stdout.write(f'sequenced {sequenced} events, compacted {compacted} superseded events, purged {purged} expired events')
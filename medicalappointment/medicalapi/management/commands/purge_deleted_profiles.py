@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from medicalapi import models, purge
+
+class Command(BaseCommand):
+    help = 'Remove soft-deleted doctors and patients with their dependents in small batches'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=purge.batch_size_setting())
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=purge.sleep_setting(),
+            help='seconds to pause between batches')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='only count the profiles that would be purged')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            doctors = models.Doctor.all_objects.filter(deleted_at__isnull = False).count()
+            patients = models.Patient.all_objects.filter(deleted_at__isnull = False).count()
+            self.stdout.write(f'would purge {doctors} doctors and {patients} patients')
+            return
+
+        profiles, rows = purge.purge_deleted_profiles(options['batch_size'], options['sleep'])
+        self.stdout.write(self.style.SUCCESS(
+            f'purged {profiles} profiles and {rows} dependent rows'))
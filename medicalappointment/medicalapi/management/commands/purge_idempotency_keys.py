@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from medicalapi import idempotency, uploads
+
+class Command(BaseCommand):
+    help = 'Delete idempotency keys and bulk upload records older than their ttl'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        deleted = idempotency.purge_expired_keys(batch_size=options['batch_size'])
+        self.stdout.write(f'deleted {deleted} expired idempotency keys')
+        deleted = uploads.purge_expired_uploads(batch_size=options['batch_size'])
+        self.stdout.write(f'deleted {deleted} expired bulk upload records')
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+from medicalapi import occupancy
+
+class Command(BaseCommand):
+    help = 'Rebuild per-doctor daily occupancy table from appointments and availability, then verify it'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify-only',
+            action='store_true',
+            help='only compare the occupancy table against raw tables, do not rebuild')
+
+    def handle(self, *args, **options):
+        if not options['verify_only']:
+            count = occupancy.rebuild_occupancy()
+            self.stdout.write(f'rebuilt {count} occupancy rows')
+
+        mismatches = occupancy.verify_occupancy()
+        for item in mismatches[:20]:
+            self.stderr.write(
+                f"doctor {item['doctor_id']} on {item['date']}: "
+                f"expected {item['expected']}, found {item['actual']}")
+        if mismatches:
+            raise CommandError(f'{len(mismatches)} occupancy rows are inconsistent')
+        self.stdout.write(self.style.SUCCESS('occupancy table is consistent'))
@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from medicalapi import analytics
+
+class Command(BaseCommand):
+    help = 'Update daily and hourly doctor rollups from the change feed since the last watermark'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='rebuild every rollup row from raw tables')
+        parser.add_argument('--batch-size', type=int, default=analytics.REFRESH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['full']:
+            rows = analytics.rebuild_rollups()
+            self.stdout.write(f'rebuilt {rows} daily rollup rows')
+            return
+        events = analytics.refresh_rollups(batch_size=options['batch_size'])
+        self.stdout.write(f'applied {events} change events to rollups')
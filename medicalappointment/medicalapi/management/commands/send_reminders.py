@@ -0,0 +1,36 @@
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from medicalapi import reminders
+
+class Command(BaseCommand):
+    help = 'Send reminders of booked appointments starting within REMINDER_LEAD_HOURS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lead-hours', type=float, default=None)
+        parser.add_argument('--batch-size', type=int, default=reminders.DEFAULT_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep running as a worker')
+        parser.add_argument('--interval', type=int, default=60, help='seconds between scans with --loop')
+
+    def handle(self, *args, **options):
+        lead_hours = options['lead_hours']
+        if lead_hours is None:
+            lead_hours = getattr(settings, 'REMINDER_LEAD_HOURS', 24)
+        lead = timedelta(hours=lead_hours)
+        backend = reminders.get_backend()
+        while True:
+            try:
+                sent = reminders.send_due_reminders(
+                    lead=lead, batch_size=options['batch_size'], backend=backend)
+                self.stderr.write(f'sent {sent} appointment reminders')
+            except Exception as exc:
+                if not options['loop']:
+                    raise
+                # the failed batch was handed back, the worker retries it on the next scan
+                self.stderr.write(f'sending reminders failed: {exc!r}')
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
@@ -0,0 +1,28 @@
+import time
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from medicalapi import changefeed
+
+class Command(BaseCommand):
+    help = 'Give committed change events their feed positions so /medical/changes serves them'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=changefeed.SEQUENCE_BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='keep running as a worker')
+        parser.add_argument('--interval', type=float, default=1, help='seconds between scans with --loop')
+
+    def handle(self, *args, **options):
+        while True:
+            try:
+                sequenced = changefeed.sequence_events(options['batch_size'])
+                if sequenced or not options['loop']:
+                    self.stderr.write(f'sequenced {sequenced} change events')
+            except Exception as exc:
+                if not options['loop']:
+                    raise
+                # positions are handed out per committed batch, the next scan continues
+                self.stderr.write(f'sequencing change events failed: {exc!r}')
+            if not options['loop']:
+                return
+            close_old_connections()
+            time.sleep(options['interval'])
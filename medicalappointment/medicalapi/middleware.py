@@ -0,0 +1,161 @@
+import threading
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.regex_helper import _lazy_re_compile
+from django.utils.text import compress_sequence, compress_string
+from . import dbrouter
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+re_accepts_gzip = _lazy_re_compile(r'\bgzip\b')
+re_accepts_br = _lazy_re_compile(r'\bbr\b')
+
+COMPRESSIBLE_TYPES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+
+def brotli_sequence(sequence):
+    compressor = brotli.Compressor()
+    for item in sequence:
+        data = compressor.process(item)
+        if data:
+            yield data
+    yield compressor.finish()
+
+class CompressionMiddleware:
+    """
+    compress responses with brotli when the brotli package is installed and
+    the client accepts it, otherwise with gzip. responses shorter than
+    COMPRESSION_MIN_SIZE and binary content types are left alone. the coding
+    is appended to a strong etag so each representation keeps its own
+    """
+    max_random_bytes = 100
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        return self.process_response(request, response)
+
+    def choose_coding(self, request):
+        accept_encoding = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        if brotli is not None and re_accepts_br.search(accept_encoding):
+            return 'br'
+        if re_accepts_gzip.search(accept_encoding):
+            return 'gzip'
+        return None
+
+    def process_response(self, request, response):
+        if response.has_header('Content-Encoding'):
+            return response
+        if not response.get('Content-Type', '').startswith(COMPRESSIBLE_TYPES):
+            return response
+        if not response.streaming and len(response.content) < self.min_size:
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+
+        coding = self.choose_coding(request)
+        if coding is None or (response.streaming and response.is_async):
+            return response
+
+        if response.streaming:
+            if coding == 'br':
+                response.streaming_content = brotli_sequence(response.streaming_content)
+            else:
+                response.streaming_content = compress_sequence(
+                    response.streaming_content,
+                    max_random_bytes=self.max_random_bytes)
+            del response.headers['Content-Length']
+        else:
+            if coding == 'br':
+                compressed_content = brotli.compress(response.content)
+            else:
+                compressed_content = compress_string(
+                    response.content,
+                    max_random_bytes=self.max_random_bytes)
+            if len(compressed_content) >= len(response.content):
+                return response
+            response.content = compressed_content
+            response.headers['Content-Length'] = str(len(response.content))
+
+        etag = response.get('ETag')
+        if etag and etag.endswith('"'):
+            response.headers['ETag'] = f'{etag[:-1]}-{coding}"'
+        response.headers['Content-Encoding'] = coding
+        return response
+
+class AdmissionStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.shed_count = 0
+
+    def enter(self):
+        with self.lock:
+            self.in_flight += 1
+
+    def leave(self):
+        with self.lock:
+            self.in_flight -= 1
+
+    def shed(self):
+        with self.lock:
+            self.shed_count += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {'in_flight': self.in_flight, 'shed': self.shed_count}
+
+admission_stats = AdmissionStats()
+
+class ConcurrencyLimitMiddleware:
+    """
+    admission control per worker process. at most MAX_CONCURRENT_REQUESTS are
+    handled at once, a request that cannot get a seat within
+    ADMISSION_QUEUE_TIMEOUT seconds is shed with 503 before it touches the database
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.limit = getattr(settings, 'MAX_CONCURRENT_REQUESTS', None)
+        self.queue_timeout = getattr(settings, 'ADMISSION_QUEUE_TIMEOUT', 0.5)
+        self.seats = threading.BoundedSemaphore(self.limit) if self.limit else None
+
+    def __call__(self, request):
+        if self.seats is None:
+            return self.get_response(request)
+
+        if not self.seats.acquire(timeout=self.queue_timeout):
+            admission_stats.shed()
+            response = JsonResponse({
+                'url': request.get_full_path(),
+                'message': 'Server is busy, please retry shortly',
+                'status': 503}, status=503)
+            response.headers['Retry-After'] = '1'
+            return response
+
+        admission_stats.enter()
+        try:
+            return self.get_response(request)
+        finally:
+            admission_stats.leave()
+            self.seats.release()
+
+class ReplicaPinMiddleware:
+    """
+    pin the user to the primary database after a successful write request
+    """
+    safe_methods = ('GET', 'HEAD', 'OPTIONS')
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if request.method not in self.safe_methods and response.status_code < 400:
+            dbrouter.pin_primary(getattr(request, 'user', None))
+        return response
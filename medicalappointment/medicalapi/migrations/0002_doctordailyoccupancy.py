@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:06
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='appointment',
+            name='status',
+            field=models.CharField(choices=[('B', 'Booked'), ('C', 'Cancelled')], db_column='appointment_status', default='B'),
+        ),
+        migrations.CreateModel(
+            name='DoctorDailyOccupancy',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('available_minutes', models.IntegerField(default=0)),
+                ('booked_count', models.IntegerField(default=0)),
+                ('remaining_capacity', models.IntegerField(default=0)),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor')),
+            ],
+            options={
+                'db_table': 'gen_doctordailyoccupancy',
+                'unique_together': {('doctor', 'date')},
+            },
+        ),
+    ]
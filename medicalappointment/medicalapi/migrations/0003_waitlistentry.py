@@ -0,0 +1,31 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:08
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0002_doctordailyoccupancy'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WaitlistEntry',
+            fields=[
+                ('date', models.DateField()),
+                ('priority', models.IntegerField(default=0)),
+                ('status', models.CharField(choices=[('W', 'Waiting'), ('P', 'Promoted'), ('C', 'Cancelled')], default='W')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('waitlist_id', models.AutoField(primary_key=True, serialize=False)),
+                ('appointment', models.OneToOneField(null=True, on_delete=django.db.models.deletion.SET_NULL, to='medicalapi.appointment')),
+                ('doctor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor')),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.patient')),
+            ],
+            options={
+                'db_table': 'gen_waitlistentry',
+                'indexes': [models.Index(fields=['doctor', 'date', 'status', '-priority', 'created_at'], name='waitlist_claim_idx')],
+            },
+        ),
+    ]
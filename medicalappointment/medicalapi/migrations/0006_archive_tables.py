@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0005_resourceversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedAppointment',
+            fields=[
+                ('date', models.DateField(db_column='appointment_date')),
+                ('time', models.TimeField(db_column='appointment_time')),
+                ('status', models.CharField(choices=[('B', 'Booked'), ('C', 'Cancelled')], db_column='appointment_status')),
+                ('created_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('appointment_id', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'gen_appointment_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedDoctorAvailability',
+            fields=[
+                ('date', models.DateField()),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('is_available', models.BooleanField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'gen_doctoravailability_archive',
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedPrescription',
+            fields=[
+                ('notes', models.TextField()),
+                ('medications', models.TextField()),
+                ('issued_at', models.DateTimeField()),
+                ('prescription_id', models.IntegerField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'gen_prescription_archive',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['doctor', 'date'], name='appointment_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['date'], name='appointment_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctoravailability',
+            index=models.Index(fields=['doctor', 'date'], name='availability_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='doctoravailability',
+            index=models.Index(fields=['date'], name='availability_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor'),
+        ),
+        migrations.AddField(
+            model_name='archivedappointment',
+            name='patient',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.patient'),
+        ),
+        migrations.AddField(
+            model_name='archiveddoctoravailability',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor'),
+        ),
+        migrations.AddField(
+            model_name='archivedprescription',
+            name='appointment',
+            field=models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.archivedappointment'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:21
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+
+
+class AddIndexOnPostgres(migrations.AddIndex):
+    # gin indexes only exist on postgresql, other backends search without them
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+def fill_search_vectors(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    alias = schema_editor.connection.alias
+    MedicalRecord = apps.get_model('medicalapi', 'MedicalRecord')
+    Prescription = apps.get_model('medicalapi', 'Prescription')
+    MedicalRecord.objects.using(alias).update(search_vector=(
+        SearchVector('diagnosis', weight='A', config='english') +
+        SearchVector('treatment', weight='B', config='english')))
+    Prescription.objects.using(alias).update(search_vector=(
+        SearchVector('medications', weight='A', config='english') +
+        SearchVector('notes', weight='B', config='english')))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0007_patient_date_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='medicalrecord',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='prescription',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_search_vectors, migrations.RunPython.noop),
+        AddIndexOnPostgres(
+            model_name='medicalrecord',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='medicalrecord_search_idx'),
+        ),
+        AddIndexOnPostgres(
+            model_name='prescription',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='prescription_search_idx'),
+        ),
+    ]
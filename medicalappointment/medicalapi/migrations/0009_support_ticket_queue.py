@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0008_clinical_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='supportticket',
+            name='assigned_to',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='assigned_tickets', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='supportticket',
+            name='claimed_at',
+            field=models.DateTimeField(null=True),
+        ),
+        migrations.AlterField(
+            model_name='supportticket',
+            name='status',
+            field=models.CharField(choices=[('O', 'Open'), ('P', 'In Progress'), ('C', 'Closed')], default='O'),
+        ),
+        migrations.AddIndex(
+            model_name='supportticket',
+            index=models.Index(condition=models.Q(('status', 'O')), fields=['created_at', 'id'], name='ticket_open_created_idx'),
+        ),
+    ]
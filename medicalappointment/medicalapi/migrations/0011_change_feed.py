@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:28
+
+import django.core.serializers.json
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0010_appointment_reminders'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChangeEvent',
+            fields=[
+                ('resource', models.CharField(max_length=50)),
+                ('resource_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('C', 'Created'), ('U', 'Updated'), ('X', 'Cancelled'), ('D', 'Deleted')], max_length=1)),
+                ('payload', models.JSONField(encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+                ('event_id', models.BigAutoField(primary_key=True, serialize=False)),
+            ],
+            options={
+                'db_table': 'gen_changeevent',
+                'indexes': [models.Index(fields=['resource', 'resource_id'], name='changeevent_resource_idx')],
+            },
+        ),
+    ]
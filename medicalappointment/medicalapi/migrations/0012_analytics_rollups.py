@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0011_change_feed'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DoctorDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('available_minutes', models.IntegerField(default=0)),
+                ('booked_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'gen_doctordailystats',
+            },
+        ),
+        migrations.CreateModel(
+            name='DoctorHourlyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('hour', models.SmallIntegerField()),
+                ('booked_count', models.IntegerField(default=0)),
+                ('cancelled_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'gen_doctorhourlystats',
+            },
+        ),
+        migrations.CreateModel(
+            name='RollupWatermark',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('event_id', models.BigIntegerField(default=0)),
+                ('refreshed_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'gen_rollupwatermark',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='archivedappointment',
+            index=models.Index(fields=['doctor', 'date'], name='archived_doctor_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='archiveddoctoravailability',
+            index=models.Index(fields=['doctor', 'date'], name='archived_avail_doctor_date_idx'),
+        ),
+        migrations.AddField(
+            model_name='doctordailystats',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor'),
+        ),
+        migrations.AddField(
+            model_name='doctorhourlystats',
+            name='doctor',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='medicalapi.doctor'),
+        ),
+        migrations.AddIndex(
+            model_name='doctordailystats',
+            index=models.Index(fields=['date'], name='dailystats_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='doctordailystats',
+            unique_together={('doctor', 'date')},
+        ),
+        migrations.AddIndex(
+            model_name='doctorhourlystats',
+            index=models.Index(fields=['date'], name='hourlystats_date_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='doctorhourlystats',
+            unique_together={('doctor', 'date', 'hour')},
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:10
+
+from django.db import migrations, models
+from django.db.models import F, Max
+
+
+def sequence_existing_events(apps, schema_editor):
+    # events written so far keep their event_id as position, cursors and the
+    # rollup watermark taken from event ids stay valid
+    ChangeEvent = apps.get_model('medicalapi', 'ChangeEvent')
+    ResourceVersion = apps.get_model('medicalapi', 'ResourceVersion')
+    ChangeEvent.objects.update(position = F('event_id'))
+    last = ChangeEvent.objects.aggregate(last = Max('event_id'))['last'] or 0
+    ResourceVersion.objects.update_or_create(name = 'changefeed_position', defaults={'version': last})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0015_idempotency_request_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='changeevent',
+            name='position',
+            field=models.BigIntegerField(null=True, unique=True),
+        ),
+        migrations.AddIndex(
+            model_name='changeevent',
+            index=models.Index(condition=models.Q(('position__isnull', True)), fields=['event_id'], name='changeevent_unsequenced_idx'),
+        ),
+        migrations.RunPython(sequence_existing_events, migrations.RunPython.noop),
+        migrations.RenameField(
+            model_name='rollupwatermark',
+            old_name='event_id',
+            new_name='position',
+        ),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:09
+
+from django.conf import settings
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('medicalapi', '0016_change_feed_positions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AlterUniqueTogether(
+            name='bulkupload',
+            unique_together={('content_hash', 'endpoint', 'mode', 'uploaded_by')},
+        ),
+    ]
@@ -1,5 +1,8 @@
-from django.db import models
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 
 class Gender(models.TextChoices):
     MALE = 'M'
@@ -11,10 +14,46 @@ class AppointmentStatus(models.TextChoices):
     BOOKED = 'B'
     CANCELLED = 'C'
 
+class WaitlistStatus(models.TextChoices):
+    WAITING = 'W'
+    PROMOTED = 'P'
+    CANCELLED = 'C'
+
 class TicketStatus(models.TextChoices):
     OPEN = 'O'
+    IN_PROGRESS = 'P'
     CLOSED = 'C'
 
+class UploadStatus(models.TextChoices):
+    PROCESSING = 'P'
+    COMPLETED = 'C'
+    FAILED = 'F'
+
+class ChangeAction(models.TextChoices):
+    CREATED = 'C'
+    UPDATED = 'U'
+    CANCELLED = 'X'
+    DELETED = 'D'
+
+class ChangeFeedMixin:
+    """
+    saves in a transaction, so the change event written by the post_save
+    signal commits or rolls back together with the row. deletes already
+    run their signals inside the delete transaction
+    """
+    def save(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+class ActiveProfileManager(models.Manager):
+    """
+    default manager of doctors and patients, hides soft-deleted profiles.
+    the purger reaches them through all_objects
+    """
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull = True)
+
 class Clinic(models.Model):
     class Meta:
         db_table = 'gen_clinic'
@@ -26,6 +65,12 @@ class Clinic(models.Model):
 class Doctor(models.Model):
     class Meta:
         db_table = 'gen_doctor'
+        indexes = [
+            # the purger only ever scans soft-deleted profiles
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='doctor_deleted_idx')]
     clinic = models.ForeignKey(Clinic, on_delete=models.SET_NULL, null=True)
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     specialization = models.CharField(max_length=100)
@@ -34,10 +79,19 @@ class Doctor(models.Model):
     end_time = models.TimeField()
     doctor_id = models.AutoField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True)
+
+    objects = ActiveProfileManager()
+    all_objects = models.Manager()
 
 class Patient(models.Model):
     class Meta:
         db_table ='gen_patient'
+        indexes = [
+            models.Index(
+                fields=['deleted_at'],
+                condition=models.Q(deleted_at__isnull=False),
+                name='patient_deleted_idx')]
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     dob = models.DateField(db_column='date_of_birth')
     gender = models.CharField(
@@ -46,10 +100,23 @@ class Patient(models.Model):
     phone_number = models.CharField(max_length=15)
     patient_id = models.AutoField(primary_key=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    deleted_at = models.DateTimeField(null=True)
 
-class Appointment(models.Model):
+    objects = ActiveProfileManager()
+    all_objects = models.Manager()
+
+class Appointment(ChangeFeedMixin, models.Model):
     class Meta:
         db_table = 'gen_appointment'
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='appointment_doctor_date_idx'),
+            models.Index(fields=['patient', 'date'], name='appointment_patient_date_idx'),
+            models.Index(fields=['date'], name='appointment_date_idx'),
+            # reminder scans only touch booked appointments still waiting for one
+            models.Index(
+                fields=['date', 'time'],
+                condition=models.Q(status='B', reminder_sent_at__isnull=True),
+                name='appointment_reminder_due_idx')]
     doctor = models.ForeignKey(
         Doctor, 
         on_delete=models.CASCADE)
@@ -64,29 +131,40 @@ class Appointment(models.Model):
         db_column='appointment_status')
     created_at = models.DateTimeField(auto_now_add=True)
     appointment_id = models.AutoField(primary_key=True)
+    reminder_sent_at = models.DateTimeField(null=True)
 
-class Prescription(models.Model):
+class Prescription(ChangeFeedMixin, models.Model):
     class Meta:
         db_table = 'gen_prescription'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='prescription_search_idx')]
     appointment = models.OneToOneField(Appointment, on_delete=models.CASCADE)
     notes = models.TextField()
     medications = models.TextField()
     issued_at = models.DateTimeField(auto_now_add=True)
     prescription_id = models.AutoField(primary_key=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
 class MedicalRecord(models.Model):
     class Meta:
         db_table = 'gen_medicalrecord'
+        indexes = [
+            models.Index(fields=['patient', 'date'], name='medicalrecord_patient_date_idx'),
+            GinIndex(fields=['search_vector'], name='medicalrecord_search_idx')]
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
     diagnosis = models.TextField()
     treatment = models.TextField()
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE, null=True)
     date = models.DateField(auto_now_add=True)
     medicalrecord_id = models.AutoField(primary_key=True)
+    search_vector = SearchVectorField(null=True, editable=False)
 
-class DoctorAvailability(models.Model):
+class DoctorAvailability(ChangeFeedMixin, models.Model):
     class Meta:
         db_table = 'gen_doctoravailability'
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='availability_doctor_date_idx'),
+            models.Index(fields=['date'], name='availability_date_idx')]
     doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
     date = models.DateField()
     start_time = models.TimeField()
@@ -96,8 +174,167 @@ class DoctorAvailability(models.Model):
 class SupportTicket(models.Model):
     class Meta:
         db_table = 'gen_supportticket'
+        indexes = [
+            # the claim queue only ever scans open tickets, oldest first
+            models.Index(
+                fields=['created_at', 'id'],
+                condition=models.Q(status='O'),
+                name='ticket_open_created_idx')]
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     subject = models.CharField(max_length=255)
     message = models.TextField()
     status = models.CharField(choices=TicketStatus, default=TicketStatus.OPEN.value)
     created_at = models.DateTimeField(auto_now_add=True)
+    assigned_to = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, related_name='assigned_tickets')
+    claimed_at = models.DateTimeField(null=True)
+
+class DoctorDailyOccupancy(models.Model):
+    class Meta:
+        db_table = 'gen_doctordailyoccupancy'
+        unique_together = ('doctor', 'date')
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    date = models.DateField()
+    available_minutes = models.IntegerField(default=0)
+    booked_count = models.IntegerField(default=0)
+    remaining_capacity = models.IntegerField(default=0)
+
+class WaitlistEntry(models.Model):
+    class Meta:
+        db_table = 'gen_waitlistentry'
+        indexes = [
+            models.Index(
+                fields=['doctor', 'date', 'status', '-priority', 'created_at'],
+                name='waitlist_claim_idx')]
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    date = models.DateField()
+    priority = models.IntegerField(default=0)
+    status = models.CharField(
+        choices=WaitlistStatus,
+        default=WaitlistStatus.WAITING)
+    appointment = models.OneToOneField(Appointment, on_delete=models.SET_NULL, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    waitlist_id = models.AutoField(primary_key=True)
+
+class IdempotencyKey(models.Model):
+    class Meta:
+        db_table = 'gen_idempotencykey'
+        unique_together = ('user', 'key', 'endpoint')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    key = models.CharField(max_length=255)
+    endpoint = models.CharField(max_length=255)
+    # sha256 of query string and body, a key is only replayed for the same request
+    request_hash = models.CharField(max_length=64, default='')
+    response_status = models.IntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+class BulkUpload(models.Model):
+    class Meta:
+        db_table = 'gen_bulkupload'
+        unique_together = ('content_hash', 'endpoint', 'mode', 'uploaded_by')
+    content_hash = models.CharField(max_length=64)
+    endpoint = models.CharField(max_length=255)
+    mode = models.CharField(max_length=20)
+    uploaded_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=1, choices=UploadStatus, default=UploadStatus.PROCESSING)
+    total_rows = models.IntegerField(default=0)
+    processed_rows = models.IntegerField(default=0)
+    response_status = models.IntegerField(null=True)
+    response_body = models.JSONField(null=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class ResourceVersion(models.Model):
+    class Meta:
+        db_table = 'gen_resourceversion'
+    name = models.CharField(max_length=50, unique=True)
+    version = models.BigIntegerField(default=0)
+
+class ArchivedAppointment(models.Model):
+    class Meta:
+        db_table = 'gen_appointment_archive'
+        indexes = [
+            models.Index(fields=['patient', 'date'], name='archived_patient_date_idx'),
+            models.Index(fields=['doctor', 'date'], name='archived_doctor_date_idx')]
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
+    date = models.DateField(db_column='appointment_date')
+    time = models.TimeField(db_column='appointment_time')
+    status = models.CharField(
+        choices=AppointmentStatus,
+        db_column='appointment_status')
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    appointment_id = models.IntegerField(primary_key=True)
+
+class ArchivedPrescription(models.Model):
+    class Meta:
+        db_table = 'gen_prescription_archive'
+    appointment = models.OneToOneField(ArchivedAppointment, on_delete=models.CASCADE)
+    notes = models.TextField()
+    medications = models.TextField()
+    issued_at = models.DateTimeField()
+    prescription_id = models.IntegerField(primary_key=True)
+
+class ArchivedDoctorAvailability(models.Model):
+    class Meta:
+        db_table = 'gen_doctoravailability_archive'
+        indexes = [
+            models.Index(fields=['doctor', 'date'], name='archived_avail_doctor_date_idx')]
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    date = models.DateField()
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    is_available = models.BooleanField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+    id = models.BigIntegerField(primary_key=True)
+
+class ChangeEvent(models.Model):
+    class Meta:
+        db_table = 'gen_changeevent'
+        indexes = [
+            models.Index(fields=['resource', 'resource_id'], name='changeevent_resource_idx'),
+            models.Index(
+                fields=['event_id'],
+                condition=models.Q(position__isnull=True),
+                name='changeevent_unsequenced_idx')]
+    resource = models.CharField(max_length=50)
+    resource_id = models.BigIntegerField()
+    action = models.CharField(max_length=1, choices=ChangeAction)
+    payload = models.JSONField(encoder=DjangoJSONEncoder)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+    event_id = models.BigAutoField(primary_key=True)
+    # feed order, assigned after the writing transaction committed
+    position = models.BigIntegerField(null=True, unique=True)
+
+class DoctorDailyStats(models.Model):
+    class Meta:
+        db_table = 'gen_doctordailystats'
+        unique_together = ('doctor', 'date')
+        indexes = [
+            models.Index(fields=['date'], name='dailystats_date_idx')]
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    date = models.DateField()
+    available_minutes = models.IntegerField(default=0)
+    booked_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+class DoctorHourlyStats(models.Model):
+    class Meta:
+        db_table = 'gen_doctorhourlystats'
+        unique_together = ('doctor', 'date', 'hour')
+        indexes = [
+            models.Index(fields=['date'], name='hourlystats_date_idx')]
+    doctor = models.ForeignKey(Doctor, on_delete=models.CASCADE)
+    date = models.DateField()
+    hour = models.SmallIntegerField()
+    booked_count = models.IntegerField(default=0)
+    cancelled_count = models.IntegerField(default=0)
+
+class RollupWatermark(models.Model):
+    class Meta:
+        db_table = 'gen_rollupwatermark'
+    name = models.CharField(max_length=50, unique=True)
+    position = models.BigIntegerField(default=0)
+    refreshed_at = models.DateTimeField(auto_now=True)
@@ -0,0 +1,119 @@
+from collections import defaultdict
+from datetime import datetime
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Greatest
+from . import models
+
+# every booked appointment occupies one slot of this length
+APPOINTMENT_SLOT_MINUTES = 15
+
+def slot_minutes(start_time, end_time):
+    """
+    method to get length of an availability slot in minutes
+    """
+    start = datetime.combine(datetime.min, start_time)
+    end = datetime.combine(datetime.min, end_time)
+    return max(int((end - start).total_seconds() // 60), 0)
+
+def capacity_for(available_minutes, booked_count):
+    return max(available_minutes // APPOINTMENT_SLOT_MINUTES - booked_count, 0)
+
+def availability_share(slot):
+    """
+    key and available minutes that a slot contributes to the occupancy table
+    """
+    minutes = slot_minutes(slot.start_time, slot.end_time) if slot.is_available else 0
+    return (slot.doctor_id, slot.date), minutes
+
+def appointment_share(appointment):
+    """
+    key and booked count that an appointment contributes to the occupancy table
+    """
+    booked = 1 if appointment.status == models.AppointmentStatus.BOOKED else 0
+    return (appointment.doctor_id, appointment.date), booked
+
+def adjust_occupancy(doctor_id, date, minutes=0, booked=0):
+    """
+    method to apply a delta on (doctor, date) row of occupancy table
+
+    the row is created on first use and updated in place with F() expressions,
+    so concurrent writers never overwrite each other's changes. a missing row
+    is never created for a negative delta, it was removed along with its doctor
+    """
+    if not minutes and not booked:
+        return
+    with transaction.atomic():
+        if minutes > 0 or booked > 0:
+            models.DoctorDailyOccupancy.objects.get_or_create(doctor_id = doctor_id, date = date)
+        new_minutes = F('available_minutes') + minutes
+        new_booked = F('booked_count') + booked
+        models.DoctorDailyOccupancy.objects.filter(
+            doctor_id = doctor_id,
+            date = date).update(
+                available_minutes = new_minutes,
+                booked_count = new_booked,
+                remaining_capacity = Greatest(
+                    new_minutes / APPOINTMENT_SLOT_MINUTES - new_booked,
+                    Value(0)))
+
+def compute_occupancy():
+    """
+    method to compute occupancy of every (doctor, date) from raw tables
+    """
+    totals = defaultdict(lambda: [0, 0])
+    slots = models.DoctorAvailability.objects.filter(is_available = True).values_list(
+        'doctor_id', 'date', 'start_time', 'end_time')
+    for doctor_id, date, start_time, end_time in slots.iterator(chunk_size=2000):
+        totals[(doctor_id, date)][0] += slot_minutes(start_time, end_time)
+
+    booked = models.Appointment.objects.filter(
+        status = models.AppointmentStatus.BOOKED).values(
+            'doctor_id', 'date').annotate(total = Count('pk'))
+    for row in booked:
+        totals[(row['doctor_id'], row['date'])][1] = row['total']
+    return totals
+
+def rebuild_occupancy():
+    """
+    method to rebuild occupancy table from scratch, returns number of rows written
+    """
+    totals = compute_occupancy()
+    rows = [
+        models.DoctorDailyOccupancy(
+            doctor_id = doctor_id,
+            date = date,
+            available_minutes = minutes,
+            booked_count = booked,
+            remaining_capacity = capacity_for(minutes, booked))
+        for (doctor_id, date), (minutes, booked) in totals.items()]
+    with transaction.atomic():
+        models.DoctorDailyOccupancy.objects.all().delete()
+        models.DoctorDailyOccupancy.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
+
+def verify_occupancy():
+    """
+    method to compare occupancy table against raw tables, returns list of mismatches
+    """
+    expected = compute_occupancy()
+    mismatches = []
+    stored = models.DoctorDailyOccupancy.objects.values_list(
+        'doctor_id', 'date', 'available_minutes', 'booked_count', 'remaining_capacity')
+    for doctor_id, date, minutes, booked, remaining in stored.iterator(chunk_size=2000):
+        exp_minutes, exp_booked = expected.pop((doctor_id, date), (0, 0))
+        actual = (minutes, booked, remaining)
+        wanted = (exp_minutes, exp_booked, capacity_for(exp_minutes, exp_booked))
+        if actual != wanted:
+            mismatches.append({
+                'doctor_id': doctor_id,
+                'date': date,
+                'expected': wanted,
+                'actual': actual})
+    for (doctor_id, date), (exp_minutes, exp_booked) in expected.items():
+        mismatches.append({
+            'doctor_id': doctor_id,
+            'date': date,
+            'expected': (exp_minutes, exp_booked, capacity_for(exp_minutes, exp_booked)),
+            'actual': None})
+    return mismatches
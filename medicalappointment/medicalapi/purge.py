@@ -0,0 +1,157 @@
+import time
+from collections import Counter
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from . import archive
+from . import changefeed
+from . import conditional
+from . import models
+from . import occupancy
+
+def batch_size_setting():
+    return getattr(settings, 'PURGE_BATCH_SIZE', 500)
+
+def sleep_setting():
+    return getattr(settings, 'PURGE_SLEEP_SECONDS', 0.1)
+
+def exclude_deleted_profiles(queryset, doctor='doctor', patient='patient'):
+    """
+    queryset without rows of soft-deleted doctors and patients, reached through
+    the given lookup paths. rows stay in the tables until the purger removes them
+    """
+    if doctor:
+        queryset = queryset.exclude(**{
+            f'{doctor}__in': models.Doctor.all_objects.filter(deleted_at__isnull = False)})
+    if patient:
+        queryset = queryset.exclude(**{
+            f'{patient}__in': models.Patient.all_objects.filter(deleted_at__isnull = False)})
+    return queryset
+
+def profile_field(profile):
+    return 'doctor' if isinstance(profile, models.Doctor) else 'patient'
+
+def soft_delete(profile):
+    """
+    method to hide a doctor or patient right away. the profile is flagged, its user
+    deactivated so tokens stop working, and waiting waitlist entries are cancelled
+    so nothing gets promoted to it. dependents are left to purge_deleted_profiles
+    """
+    with transaction.atomic():
+        profile.deleted_at = timezone.now()
+        profile.save(update_fields=['deleted_at'])
+        profile.user.is_active = False
+        profile.user.save(update_fields=['is_active'])
+        cancelled = models.WaitlistEntry.objects.filter(
+            **{profile_field(profile): profile},
+            status = models.WaitlistStatus.WAITING).update(status = models.WaitlistStatus.CANCELLED)
+        if cancelled:
+            conditional.bump_versions('waitlistentry')
+
+def delete_appointments(ids):
+    # raw deletes skip signals, keep occupancy and change feed in step here
+    appointments = models.Appointment.objects.filter(pk__in = ids)
+    prescriptions = models.Prescription.objects.filter(appointment_id__in = ids)
+    booked = Counter(appointments.filter(
+        status = models.AppointmentStatus.BOOKED).values_list('doctor_id', 'date'))
+    changefeed.record_changes(prescriptions, models.ChangeAction.DELETED)
+    changefeed.record_changes(appointments, models.ChangeAction.DELETED)
+
+    models.WaitlistEntry.objects.filter(appointment_id__in = ids).update(appointment = None)
+    archive.raw_delete(models.Prescription, list(prescriptions.values_list('pk', flat=True)))
+    archive.raw_delete(models.Appointment, ids)
+    for (doctor_id, date), count in booked.items():
+        occupancy.adjust_occupancy(doctor_id, date, booked=-count)
+
+def delete_slots(ids):
+    slots = models.DoctorAvailability.objects.filter(pk__in = ids)
+    minutes = Counter()
+    for slot in slots.filter(is_available = True):
+        minutes[(slot.doctor_id, slot.date)] += occupancy.slot_minutes(slot.start_time, slot.end_time)
+    changefeed.record_changes(slots, models.ChangeAction.DELETED)
+
+    archive.raw_delete(models.DoctorAvailability, ids)
+    for (doctor_id, date), value in minutes.items():
+        occupancy.adjust_occupancy(doctor_id, date, minutes=-value)
+
+def purge_steps(profile):
+    """
+    (queryset, delete handler, resource versions to bump) of every table holding
+    the profile's dependents. children come before their parents
+    """
+    field = profile_field(profile)
+    own = {field: profile.pk}
+    steps = [
+        (models.Appointment.objects.filter(**own), delete_appointments, ('appointment', 'prescription')),
+        (models.MedicalRecord.objects.filter(**own), None, ('medicalrecord',)),
+        (models.ArchivedPrescription.objects.filter(**{f'appointment__{field}': profile.pk}), None, ()),
+        (models.ArchivedAppointment.objects.filter(**own), None, ()),
+        (models.WaitlistEntry.objects.filter(**own), None, ('waitlistentry',))]
+    if field == 'doctor':
+        steps += [
+            (models.DoctorAvailability.objects.filter(**own), delete_slots, ()),
+            (models.ArchivedDoctorAvailability.objects.filter(**own), None, ()),
+            (models.DoctorDailyOccupancy.objects.filter(**own), None, ()),
+            (models.DoctorDailyStats.objects.filter(**own), None, ()),
+            (models.DoctorHourlyStats.objects.filter(**own), None, ())]
+    return steps
+
+def purge_step(queryset, handler, versions, batch_size, pause):
+    """
+    method to delete the rows of queryset batch by batch, each batch locked and
+    deleted in its own short transaction with a pause in between.
+    returns number of deleted rows
+    """
+    deleted = 0
+    while True:
+        with transaction.atomic():
+            ids = list(queryset.select_for_update().order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return deleted
+            if handler is None:
+                archive.raw_delete(queryset.model, ids)
+            else:
+                handler(ids)
+            if versions:
+                conditional.bump_versions(*versions)
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            return deleted
+        time.sleep(pause)
+
+def purge_profile(profile, batch_size=None, pause=None):
+    """
+    method to remove a soft-deleted doctor or patient with everything depending
+    on it. dependents go in bounded batches, so no transaction holds locks for
+    long. the user is deleted last, its cascade only finds the profile row and
+    whatever was written meanwhile. returns number of deleted dependent rows
+    """
+    batch_size = batch_size or batch_size_setting()
+    pause = sleep_setting() if pause is None else pause
+
+    deleted = 0
+    for queryset, handler, versions in purge_steps(profile):
+        deleted += purge_step(queryset, handler, versions, batch_size, pause)
+
+    with transaction.atomic():
+        remaining = type(profile).all_objects.select_for_update().filter(
+            pk = profile.pk, deleted_at__isnull = False).select_related('user').first()
+        if remaining is not None:
+            remaining.user.delete()
+    return deleted
+
+def deleted_profiles():
+    for model in (models.Doctor, models.Patient):
+        yield from model.all_objects.filter(deleted_at__isnull = False).order_by('deleted_at', 'pk')
+
+def purge_deleted_profiles(batch_size=None, pause=None):
+    """
+    method to purge every soft-deleted doctor and patient, oldest first.
+    returns (number of purged profiles, number of deleted dependent rows)
+    """
+    profiles = 0
+    rows = 0
+    for profile in deleted_profiles():
+        rows += purge_profile(profile, batch_size, pause)
+        profiles += 1
+    return profiles, rows
@@ -0,0 +1,111 @@
+import json
+import sys
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from . import fastserializers
+from . import models
+from . import purge
+
+DEFAULT_BATCH_SIZE = 500
+
+REMINDER_FIELDS = (
+    'appointment_id', 'date', 'time',
+    'patient__user__username', 'patient__user__email', 'patient__phone_number',
+    'doctor__user__first_name', 'doctor__user__last_name', 'doctor__specialization')
+
+to_date = fastserializers.CONVERTERS['to_ddmmyyyy']
+to_time = fastserializers.CONVERTERS['to_hhmm']
+
+def reminder_message(row):
+    return {
+        'appointment_id': row['appointment_id'],
+        'patient': row['patient__user__username'],
+        'email': row['patient__user__email'],
+        'phone_number': row['patient__phone_number'],
+        'text': (
+            f"Reminder: appointment with Dr. {row['doctor__user__first_name']} "
+            f"{row['doctor__user__last_name']} ({row['doctor__specialization']}) "
+            f"on {to_date(row['date'])} at {to_time(row['time'])}")}
+
+def write_json_lines(stream, messages):
+    for message in messages:
+        stream.write(json.dumps(message) + '\n')
+    stream.flush()
+
+class ConsoleReminderBackend:
+    """
+    stand in delivery backend, writes every reminder as a json line to stdout
+    """
+    def send_batch(self, messages):
+        write_json_lines(sys.stdout, messages)
+
+class FileReminderBackend:
+    """
+    stand in delivery backend, appends every reminder as a json line to REMINDER_FILE_PATH
+    """
+    def send_batch(self, messages):
+        with open(settings.REMINDER_FILE_PATH, 'a') as stream:
+            write_json_lines(stream, messages)
+
+def get_backend():
+    """
+    delivery backend named by REMINDER_BACKEND. a backend has send_batch(messages)
+    and raises when the batch could not be handed over, so it is retried later
+    """
+    path = getattr(settings, 'REMINDER_BACKEND', 'medicalapi.reminders.ConsoleReminderBackend')
+    return import_string(path)()
+
+def due_reminders(now, lead):
+    """
+    queryset of booked appointments between now and now + lead without a reminder.
+    the date range and the reminder_sent_at condition match the partial
+    appointment_reminder_due_idx, so the scan covers the window and not the table
+    """
+    start = timezone.localtime(now)
+    end = start + lead
+    appointments = purge.exclude_deleted_profiles(models.Appointment.objects.all())
+    return appointments.filter(
+        status = models.AppointmentStatus.BOOKED,
+        reminder_sent_at__isnull = True,
+        date__gte = start.date(),
+        date__lte = end.date()).exclude(
+            Q(date = start.date()) & Q(time__lt = start.time())).exclude(
+            Q(date = end.date()) & Q(time__gte = end.time()))
+
+def send_due_reminders(now=None, lead=None, batch_size=DEFAULT_BATCH_SIZE, backend=None):
+    """
+    method to send reminders of every appointment due within lead, in batches.
+    a batch is claimed by marking it sent in a short transaction that locks only
+    the appointment rows, and handed to the backend after the claim committed.
+    a failing backend hands the batch back for the next run.
+    returns number of reminders sent
+    """
+    now = now or timezone.now()
+    lead = lead or timedelta(hours=getattr(settings, 'REMINDER_LEAD_HOURS', 24))
+    backend = backend or get_backend()
+
+    sent = 0
+    while True:
+        with transaction.atomic():
+            ids = list(due_reminders(now, lead).select_for_update(skip_locked=True, of=('self',)).order_by(
+                'date', 'time', 'appointment_id').values_list('appointment_id', flat=True)[:batch_size])
+            if not ids:
+                return sent
+            rows = list(models.Appointment.objects.filter(appointment_id__in = ids).order_by(
+                'date', 'time', 'appointment_id').values(*REMINDER_FIELDS))
+            # status and slot are unchanged, so occupancy and etags are unaffected
+            models.Appointment.objects.filter(appointment_id__in = ids).update(reminder_sent_at = now)
+
+        try:
+            backend.send_batch([reminder_message(row) for row in rows])
+        except Exception:
+            models.Appointment.objects.filter(
+                appointment_id__in = ids, reminder_sent_at = now).update(reminder_sent_at = None)
+            raise
+        sent += len(ids)
+        if len(ids) < batch_size:
+            return sent
@@ -0,0 +1,80 @@
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+ORJSON_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if orjson is not None else 0)
+
+# values that cannot hold a float, skipped without further checks
+SCALAR_TYPES = {str, int, bool, type(None)}
+
+def has_inexact_floats(data):
+    """
+    whether data holds a float orjson writes differently from the stdlib: NaN
+    and infinities, which the stdlib rejects in strict mode, and floats whose
+    repr uses an exponent, i.e. below 1e-4 or from 1e16 on
+    """
+    stack = [[data]]
+    while stack:
+        values = stack.pop()
+        for value in (values.values() if isinstance(values, dict) else values):
+            if type(value) in SCALAR_TYPES:
+                continue
+            if isinstance(value, float):
+                if value != value or (value and not 1e-4 <= abs(value) < 1e16):
+                    return True
+            elif isinstance(value, (dict, list, tuple)):
+                stack.append(value)
+    return False
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer that encodes with orjson when it is installed. dates, times,
+    decimals and lazy strings are handed to DRF's encoder so output stays
+    byte-for-byte the same as the stdlib renderer. indented output, ascii-only
+    output, payloads orjson refuses and payloads with floats it formats
+    differently fall back to the stdlib renderer
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+
+        renderer_context = renderer_context or {}
+        if (orjson is None or self.ensure_ascii or not self.compact or
+                self.get_indent(accepted_media_type, renderer_context) is not None or
+                has_inexact_floats(data)):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(data, default=encoders.JSONEncoder().default, option=ORJSON_OPTIONS)
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        # same strict javascript subset escaping as JSONRenderer
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+class FastJSONParser(JSONParser):
+    """
+    JSONParser that decodes utf-8 bodies with orjson when it is installed.
+    orjson always rejects NaN and Infinity, so non-strict mode uses the stdlib
+    """
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or encoding.lower().replace('-', '') != 'utf8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -0,0 +1,232 @@
+import heapq
+import math
+import re
+import threading
+from collections import defaultdict
+from datetime import datetime
+from django.conf import settings
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F
+from . import models
+from . import purge
+from . import timeline
+from . import utils
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+# weights of the fallback index, same as postgres' default for A and B labels
+FIELD_WEIGHTS = {'A': 1.0, 'B': 0.4}
+
+TOKEN_RE = re.compile(r'\w+')
+
+def search_config():
+    return getattr(settings, 'SEARCH_CONFIG', 'english')
+
+def record_vector():
+    config = search_config()
+    return (SearchVector('diagnosis', weight='A', config=config) +
+        SearchVector('treatment', weight='B', config=config))
+
+def prescription_vector():
+    config = search_config()
+    return (SearchVector('medications', weight='A', config=config) +
+        SearchVector('notes', weight='B', config=config))
+
+# (model, id field, text fields by weight, vector) of every searchable table
+SEARCH_SOURCES = {
+    'medical_record': (
+        models.MedicalRecord, 'medicalrecord_id',
+        (('diagnosis', 'A'), ('treatment', 'B')), record_vector),
+    'prescription': (
+        models.Prescription, 'prescription_id',
+        (('medications', 'A'), ('notes', 'B')), prescription_vector)}
+
+def uses_postgres(alias):
+    return connections[alias].vendor == 'postgresql'
+
+def refresh_search_vectors(queryset):
+    """
+    method to recompute the tsvector column of every row of a record or
+    prescription queryset. done with one UPDATE so postgres builds the vectors
+    from the stored text. needed after writes that skip post_save, e.g. bulk_create
+    """
+    if not uses_postgres(queryset.db):
+        return
+    for model, id_field, _, vector in SEARCH_SOURCES.values():
+        if queryset.model is model:
+            queryset.update(search_vector = vector())
+
+def update_search_vector(instance, using):
+    refresh_search_vectors(type(instance).objects.using(using).filter(pk = instance.pk))
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+class InvertedIndex:
+    """
+    pure-python stand in for the gin indexes on backends without tsvector,
+    e.g. sqlite test runs. maps every token to the weighted term frequency of
+    each (source, id) containing it. no stemming, every query term must match
+    """
+    def __init__(self):
+        self.postings = defaultdict(dict)
+        self.documents = 0
+
+    def add(self, key, weighted_texts):
+        self.documents += 1
+        for text, weight in weighted_texts:
+            for token in tokenize(text or ''):
+                postings = self.postings[token]
+                postings[key] = postings.get(key, 0.0) + FIELD_WEIGHTS[weight]
+
+    def score(self, query):
+        """
+        {(source, id): tf-idf score} of documents containing every query term
+        """
+        terms = set(tokenize(query))
+        if not terms:
+            return {}
+        postings = [self.postings.get(term, {}) for term in terms]
+        postings.sort(key=len)
+        scores = {}
+        for key in postings[0]:
+            if all(key in other for other in postings[1:]):
+                scores[key] = 0.0
+        for matches in postings:
+            idf = math.log(1 + self.documents / len(matches)) if matches else 0.0
+            for key in scores:
+                scores[key] += matches[key] * idf
+        return scores
+
+def build_index(alias):
+    index = InvertedIndex()
+    for source, (model, id_field, fields, _) in SEARCH_SOURCES.items():
+        names = [name for name, _ in fields]
+        rows = model.objects.using(alias).values_list(id_field, *names)
+        for row in rows.iterator(chunk_size=2000):
+            index.add((source, row[0]), zip(row[1:], (weight for _, weight in fields)))
+    return index
+
+_index_lock = threading.Lock()
+_index_cache = {}
+
+def get_fallback_index(alias):
+    """
+    inverted index of the alias, rebuilt only when the version counters of
+    medical records or prescriptions moved since it was built
+    """
+    versions = tuple(models.ResourceVersion.objects.using(alias).filter(
+        name__in = ('medicalrecord', 'prescription')).order_by('name').values_list('name', 'version'))
+    with _index_lock:
+        cached = _index_cache.get(alias)
+        if cached is None or cached[0] != versions:
+            cached = (versions, build_index(alias))
+            _index_cache[alias] = cached
+        return cached[1]
+
+def parse_filters(params):
+    """
+    method to read doctor, patient and date range filters from query params.
+    returns (filters, None) or (None, error message)
+    """
+    filters = {
+        'doctor': params.get('doctor'), # doctor username
+        'patient': params.get('patient'), # patient username
+        'treating_doctor': None, # set for doctors, only their patients are searched
+        'min_date': None,
+        'max_date': None}
+    for name in ('min_date', 'max_date'):
+        value = params.get(name)
+        if value:
+            try:
+                filters[name] = datetime.strptime(value, '%d-%m-%Y').date()
+            except ValueError:
+                return None, 'Unable to parse min_date/max_date. Please provide the dates in proper format'
+    return filters, None
+
+def filtered_sources(filters, alias):
+    """
+    (source, queryset, id field, patient field, renderer) of every searchable table,
+    narrowed by filters
+    """
+    records = purge.exclude_deleted_profiles(models.MedicalRecord.objects.using(alias))
+    prescriptions = purge.exclude_deleted_profiles(
+        models.Prescription.objects.using(alias), 'appointment__doctor', 'appointment__patient')
+    if filters['doctor']:
+        records = records.filter(doctor__user__username = filters['doctor'])
+        prescriptions = prescriptions.filter(appointment__doctor__user__username = filters['doctor'])
+    if filters['patient']:
+        records = records.filter(patient__user__username = filters['patient'])
+        prescriptions = prescriptions.filter(appointment__patient__user__username = filters['patient'])
+    if filters['treating_doctor']:
+        records = records.filter(utils.treated_by(filters['treating_doctor']))
+        prescriptions = prescriptions.filter(utils.treated_by(filters['treating_doctor'], 'appointment__patient'))
+    if filters['min_date']:
+        records = records.filter(date__gte = filters['min_date'])
+        prescriptions = prescriptions.filter(appointment__date__gte = filters['min_date'])
+    if filters['max_date']:
+        records = records.filter(date__lte = filters['max_date'])
+        prescriptions = prescriptions.filter(appointment__date__lte = filters['max_date'])
+
+    return [
+        ('medical_record',
+            records.values(
+                'medicalrecord_id', 'date', 'diagnosis', 'treatment',
+                'doctor__user__username', 'patient__user__username'),
+            'medicalrecord_id', 'patient__user__username', timeline.record_entry),
+        ('prescription',
+            prescriptions.values(
+                'prescription_id', 'appointment_id', 'appointment__date', 'notes', 'medications',
+                'appointment__doctor__user__username', 'appointment__patient__user__username', 'issued_at'),
+            'prescription_id', 'appointment__patient__user__username', timeline.prescription_entry)]
+
+def search_entry(rank, render, row, patient_field):
+    entry = render(row)
+    entry['patient'] = row[patient_field]
+    entry['rank'] = round(rank, 6)
+    return entry
+
+def search_postgres(query, filters, limit, alias):
+    tsquery = SearchQuery(query, search_type='websearch', config=search_config())
+    streams = []
+    for _, queryset, id_field, patient_field, render in filtered_sources(filters, alias):
+        rows = queryset.filter(search_vector = tsquery).annotate(
+            rank = SearchRank(F('search_vector'), tsquery)).order_by('-rank', f'-{id_field}')[:limit]
+        streams.append([(row['rank'], row[id_field], render, row, patient_field) for row in rows])
+    return heapq.merge(*streams, key=lambda item: item[:2], reverse=True)
+
+def search_fallback(query, filters, limit, alias):
+    scores = get_fallback_index(alias).score(query)
+    matched = defaultdict(list)
+    for source, doc_id in scores:
+        matched[source].append(doc_id)
+
+    hits = []
+    for source, queryset, id_field, patient_field, render in filtered_sources(filters, alias):
+        if not matched[source]:
+            continue
+        # candidates are ranked first so only the best rows are fetched
+        ids = set(queryset.filter(**{f'{id_field}__in': matched[source]}).values_list(id_field, flat=True))
+        best = heapq.nlargest(limit, ids, key=lambda doc_id: (scores[(source, doc_id)], doc_id))
+        rows = queryset.filter(**{f'{id_field}__in': best})
+        hits.extend(
+            (scores[(source, row[id_field])], row[id_field], render, row, patient_field) for row in rows)
+    hits.sort(key=lambda item: item[:2], reverse=True)
+    return hits
+
+def search_clinical_text(query, filters, limit=DEFAULT_LIMIT, alias='default'):
+    """
+    method to search diagnoses, treatments, medications and prescription notes.
+    ranked with ts_rank over the gin indexed tsvector columns on postgresql,
+    and with the in-memory inverted index elsewhere. returns best matches first
+    """
+    if uses_postgres(alias):
+        hits = search_postgres(query, filters, limit, alias)
+    else:
+        hits = search_fallback(query, filters, limit, alias)
+
+    return [
+        search_entry(rank, render, row, patient_field)
+        for _, (rank, _, render, row, patient_field) in zip(range(limit), hits)]
@@ -43,6 +43,20 @@ class DoctorAvailabilitySerializer(serializers.Serializer):
     start_time = serializers.TimeField(format='%H:%M')
     end_time = serializers.TimeField(format='%H:%M')
 
+class BlackoutSerializer(serializers.Serializer):
+    doctor_ids = serializers.ListField(child=serializers.IntegerField(), allow_empty=False, max_length=100)
+    start_date = serializers.DateField(format='%d-%m-%Y', input_formats=['%d-%m-%Y'])
+    end_date = serializers.DateField(format='%d-%m-%Y', input_formats=['%d-%m-%Y'])
+    start_time = serializers.TimeField(format='%H:%M', required=False)
+    end_time = serializers.TimeField(format='%H:%M', required=False)
+
+    def validate(self, data):
+        if data['start_date'] > data['end_date']:
+            raise serializers.ValidationError('start_date must not be after end_date')
+        if 'start_time' in data and 'end_time' in data and data['start_time'] >= data['end_time']:
+            raise serializers.ValidationError('start_time must be before end_time')
+        return data
+
 class AppointmentSerializer(serializers.Serializer):
     date = serializers.DateField(
         format='%d-%m-%Y', 
@@ -55,10 +69,40 @@ class AppointmentGetSerializer(AppointmentSerializer):
     status = serializers.CharField()
     created_at = serializers.DateTimeField()
 
+class WaitlistSerializer(serializers.Serializer):
+    date = serializers.DateField(
+        format='%d-%m-%Y',
+        input_formats=['%d-%m-%Y'])
+    priority = serializers.IntegerField(required=False, default=0)
+
+class WaitlistGetSerializer(WaitlistSerializer):
+    waitlist_id = serializers.IntegerField()
+    doctor = DoctorGetSerializer()
+    status = serializers.CharField()
+    created_at = serializers.DateTimeField()
+
+class SupportTicketSerializer(serializers.Serializer):
+    subject = serializers.CharField(max_length=255)
+    message = serializers.CharField()
+
+class SupportTicketGetSerializer(SupportTicketSerializer):
+    id = serializers.IntegerField()
+    user = UserGetSerializer()
+    status = serializers.CharField()
+    assigned_to = UserGetSerializer(allow_null=True)
+    created_at = serializers.DateTimeField()
+    claimed_at = serializers.DateTimeField()
+
 class PrescriptionSerializer(serializers.Serializer):
     notes = serializers.CharField()
     medications = serializers.CharField()
 
+class PrescriptionBatchItemSerializer(PrescriptionSerializer):
+    appointment_id = serializers.IntegerField()
+
+class PrescriptionBatchSerializer(serializers.Serializer):
+    prescriptions = PrescriptionBatchItemSerializer(many=True, allow_empty=False, max_length=200)
+
 class ResponseSerializer(serializers.Serializer):
     url=serializers.CharField()
     message=serializers.CharField()
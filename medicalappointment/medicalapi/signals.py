@@ -0,0 +1,104 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.dispatch import receiver
+from . import authentication
+from . import changefeed
+from . import conditional
+from . import models
+from . import occupancy
+from . import search
+
+# models whose changes invalidate the etags of list endpoints
+VERSIONED_MODELS = (
+    User,
+    models.Clinic,
+    models.Doctor,
+    models.Patient,
+    models.Appointment,
+    models.WaitlistEntry,
+    models.MedicalRecord,
+    models.Prescription)
+
+def _remember_previous(sender, instance):
+    # keep the stored row so post_save can undo its old contribution
+    instance._occupancy_prev = None
+    if not instance._state.adding and instance.pk is not None:
+        instance._occupancy_prev = sender.objects.filter(pk = instance.pk).first()
+
+def _apply_change(previous, current, share, field):
+    if previous is not None:
+        key, value = share(previous)
+        occupancy.adjust_occupancy(*key, **{field: -value})
+    if current is not None:
+        key, value = share(current)
+        occupancy.adjust_occupancy(*key, **{field: value})
+
+@receiver(pre_save, sender=models.DoctorAvailability)
+@receiver(pre_save, sender=models.Appointment)
+def remember_previous_state(sender, instance, **kwargs):
+    if kwargs.get('raw'):
+        return
+    _remember_previous(sender, instance)
+
+@receiver(post_save, sender=models.DoctorAvailability)
+def availability_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    _apply_change(
+        getattr(instance, '_occupancy_prev', None), instance,
+        occupancy.availability_share, 'minutes')
+
+@receiver(post_delete, sender=models.DoctorAvailability)
+def availability_deleted(sender, instance, **kwargs):
+    _apply_change(instance, None, occupancy.availability_share, 'minutes')
+
+@receiver(post_save, sender=models.Appointment)
+def appointment_saved(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    _apply_change(
+        getattr(instance, '_occupancy_prev', None), instance,
+        occupancy.appointment_share, 'booked')
+
+@receiver(post_delete, sender=models.Appointment)
+def appointment_deleted(sender, instance, **kwargs):
+    _apply_change(instance, None, occupancy.appointment_share, 'booked')
+
+@receiver(post_save, sender=models.Appointment)
+@receiver(post_save, sender=models.DoctorAvailability)
+@receiver(post_save, sender=models.Prescription)
+def record_saved_change(sender, instance, created, **kwargs):
+    if kwargs.get('raw'):
+        return
+    action = changefeed.change_action(getattr(instance, '_occupancy_prev', None), instance, created)
+    changefeed.record_change(instance, action, kwargs['using'])
+
+@receiver(post_delete, sender=models.Appointment)
+@receiver(post_delete, sender=models.DoctorAvailability)
+@receiver(post_delete, sender=models.Prescription)
+def record_deleted_change(sender, instance, **kwargs):
+    changefeed.record_change(instance, models.ChangeAction.DELETED, kwargs['using'])
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    # password changes go through save too. dropped on commit, so a request
+    # running meanwhile cannot cache the row that is about to be replaced
+    user_id = instance.pk
+    transaction.on_commit(
+        lambda: authentication.user_cache.invalidate(user_id), using=kwargs['using'])
+
+@receiver(post_save, sender=models.MedicalRecord)
+@receiver(post_save, sender=models.Prescription)
+def clinical_text_saved(sender, instance, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if kwargs.get('raw') or (update_fields and update_fields <= {'search_vector'}):
+        return
+    search.update_search_vector(instance, kwargs['using'])
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_resource_version(sender, **kwargs):
+    if sender in VERSIONED_MODELS and not kwargs.get('raw'):
+        conditional.bump_versions(sender._meta.model_name)
@@ -0,0 +1,199 @@
+from collections import Counter, defaultdict
+from datetime import datetime
+from django.db import transaction
+from . import archive
+from . import changefeed
+from . import fastserializers
+from . import models
+from . import occupancy
+
+SYNC_MODES = ('append', 'sync')
+
+to_date = fastserializers.CONVERTERS['to_ddmmyyyy']
+to_time = fastserializers.CONVERTERS['to_hhmm']
+
+def slot_key(doctor_id, date_val, start_time):
+    # a doctor has at most one slot starting at a given time of a day,
+    # its end_time is the value a re-upload can change
+    return (doctor_id, date_val, start_time)
+
+def resolve_doctors(data_list):
+    """
+    {username: doctor_id} of the doctors named by parsed upload rows, with one
+    query. returns (doctors, list of errors for unknown usernames)
+    """
+    usernames = {data['doc_username'] for data in data_list}
+    doctors = dict(models.Doctor.objects.filter(user__username__in = usernames).values_list(
+        'user__username', 'doctor_id'))
+    return doctors, [f'doctor "{username}" does not exists' for username in sorted(usernames - set(doctors))]
+
+def row_date(data):
+    return data['date'].date() if isinstance(data['date'], datetime) else data['date']
+
+def sheet_slots(data_list):
+    """
+    method to resolve the parsed rows of an upload into {slot key: end_time}.
+    returns (slots, None) or (None, list of errors)
+    """
+    doctors, errors = resolve_doctors(data_list)
+
+    slots = {}
+    for data in data_list:
+        if data['doc_username'] not in doctors:
+            continue
+        date_val = row_date(data)
+        key = slot_key(doctors[data['doc_username']], date_val, data['start_time'])
+        if key in slots:
+            errors.append(
+                f"doctor \"{data['doc_username']}\" has more than one slot starting at "
+                f"{to_time(data['start_time'])} on {to_date(date_val)}")
+        slots[key] = data['end_time']
+    if errors:
+        return None, errors
+    return slots, None
+
+def covers(slots, time_val):
+    return any(start <= time_val < end for start, end in slots)
+
+def diff_slots(slots, existing, booked):
+    """
+    hash join of the sheet's {key: end_time} with existing slot rows on the slot
+    key. returns dict of inserts, updates, deletes, unchanged count and conflicts,
+    booked appointments that the synced roster would no longer cover
+    """
+    inserts = []
+    updates = []
+    deletes = []
+    unchanged = 0
+    matched = set()
+    for slot in existing:
+        key = slot_key(slot.doctor_id, slot.date, slot.start_time)
+        if key not in slots or key in matched:
+            # leftovers of earlier re-uploads repeat a key, only one row survives
+            deletes.append(slot)
+            continue
+        matched.add(key)
+        if slot.end_time != slots[key]:
+            updates.append((slot, slots[key]))
+        else:
+            unchanged += 1
+    for key, end_time in slots.items():
+        if key not in matched:
+            inserts.append((key, end_time))
+
+    # appointments covered today must stay covered, nothing cancels them here
+    before = defaultdict(list)
+    after = defaultdict(list)
+    for slot in existing:
+        before[(slot.doctor_id, slot.date)].append((slot.start_time, slot.end_time))
+    for (doctor_id, date_val, start_time), end_time in slots.items():
+        after[(doctor_id, date_val)].append((start_time, end_time))
+    conflicts = [
+        row for row in booked
+        if covers(before[(row['doctor_id'], row['date'])], row['time'])
+        and not covers(after[(row['doctor_id'], row['date'])], row['time'])]
+
+    return {
+        'inserts': inserts,
+        'updates': updates,
+        'deletes': deletes,
+        'unchanged': unchanged,
+        'conflicts': conflicts}
+
+def slot_entry(doctor_id, date_val, start_time, end_time):
+    return {
+        'doctor_id': doctor_id,
+        'date': to_date(date_val),
+        'start_time': to_time(start_time),
+        'end_time': to_time(end_time)}
+
+def diff_report(diff):
+    return {
+        'inserted': [slot_entry(*key, end_time) for key, end_time in diff['inserts']],
+        'updated': [
+            dict(slot_entry(slot.doctor_id, slot.date, slot.start_time, end_time),
+                previous_end_time = to_time(slot.end_time))
+            for slot, end_time in diff['updates']],
+        'deleted': [
+            slot_entry(slot.doctor_id, slot.date, slot.start_time, slot.end_time)
+            for slot in diff['deletes']],
+        'unchanged': diff['unchanged']}
+
+def create_slots(inserts):
+    """
+    method to insert (slot key, end_time) pairs with bulk_create. occupancy and
+    the change feed, skipped along with the signals, are kept here
+    """
+    created = models.DoctorAvailability.objects.bulk_create([
+        models.DoctorAvailability(doctor_id = doctor_id, date = date_val, start_time = start_time, end_time = end_time)
+        for (doctor_id, date_val, start_time), end_time in inserts], batch_size=1000)
+    minutes = Counter()
+    for slot in created:
+        minutes[(slot.doctor_id, slot.date)] += occupancy.slot_minutes(slot.start_time, slot.end_time)
+    for (doctor_id, date_val), value in minutes.items():
+        occupancy.adjust_occupancy(doctor_id, date_val, minutes=value)
+    changefeed.record_changes(
+        models.DoctorAvailability.objects.filter(pk__in = [slot.pk for slot in created]),
+        models.ChangeAction.CREATED)
+    return created
+
+def apply_diff(diff):
+    """
+    method to write a diff with one bulk statement per kind of change. the
+    statements skip signals, so occupancy and the change feed are kept here
+    """
+    create_slots(diff['inserts'])
+    minutes = Counter()
+
+    updated = []
+    for slot, end_time in diff['updates']:
+        if slot.is_available:
+            minutes[(slot.doctor_id, slot.date)] += (
+                occupancy.slot_minutes(slot.start_time, end_time)
+                - occupancy.slot_minutes(slot.start_time, slot.end_time))
+        slot.end_time = end_time
+        updated.append(slot)
+    models.DoctorAvailability.objects.bulk_update(updated, ['end_time'], batch_size=1000)
+
+    deleted_ids = [slot.pk for slot in diff['deletes']]
+    changefeed.record_changes(
+        models.DoctorAvailability.objects.filter(pk__in = deleted_ids), models.ChangeAction.DELETED)
+    archive.raw_delete(models.DoctorAvailability, deleted_ids)
+    for slot in diff['deletes']:
+        if slot.is_available:
+            minutes[(slot.doctor_id, slot.date)] -= occupancy.slot_minutes(slot.start_time, slot.end_time)
+
+    for (doctor_id, date_val), value in minutes.items():
+        occupancy.adjust_occupancy(doctor_id, date_val, minutes=value)
+    changefeed.record_changes(
+        models.DoctorAvailability.objects.filter(pk__in = [slot.pk for slot in updated]),
+        models.ChangeAction.UPDATED)
+
+def sync_slots(slots, dry_run=False):
+    """
+    method to make availability of the sheet's doctors over the sheet's date range
+    match the sheet. existing rows of that scope are locked and diffed against it,
+    only the differences are written. returns (report, None) or (None, conflicts)
+    """
+    doctor_ids = {doctor_id for doctor_id, _, _ in slots}
+    dates = [date_val for _, date_val, _ in slots]
+    scope = {'doctor_id__in': doctor_ids, 'date__gte': min(dates), 'date__lte': max(dates)}
+
+    with transaction.atomic():
+        # slots first: a booking holds its slot's lock until it commits, so the
+        # appointments read below include every booking inside a locked slot
+        existing = list(models.DoctorAvailability.objects.select_for_update().filter(
+            **scope).order_by('pk'))
+        booked = list(models.Appointment.objects.filter(
+            status = models.AppointmentStatus.BOOKED, **scope).values(
+                'appointment_id', 'doctor_id', 'date', 'time'))
+        diff = diff_slots(slots, existing, booked)
+        if diff['conflicts']:
+            return None, [
+                f"appointment {row['appointment_id']} on {to_date(row['date'])} at "
+                f"{to_time(row['time'])} would no longer be covered by availability"
+                for row in diff['conflicts']]
+        report = diff_report(diff)
+        if not dry_run:
+            apply_diff(diff)
+    return report, None
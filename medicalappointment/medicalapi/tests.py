@@ -1,3 +1,894 @@
-from django.test import TestCase
+import io
+import threading
+import uuid
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import DatabaseError, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIClient, APIRequestFactory, force_authenticate
+from rest_framework.views import APIView
+from unittest import mock
+from . import blackout
+from . import changefeed
+from . import dbrouter
+from . import directory
+from . import models
+from . import occupancy
+from . import purge
+from . import reminders
+from . import renderers
+from . import slotsync
+from . import throttling
+from . import tickets
+from . import uploads
+from . import utils
+from . import waitlist
 
-# Create your tests here.
+def run_concurrently(*functions):
+    """
+    runs every function on its own thread, all released at once, and returns
+    their results in order. each thread closes the connections it opened
+    """
+    barrier = threading.Barrier(len(functions))
+    results = [None] * len(functions)
+    errors = []
+
+    def target(index, function):
+        try:
+            barrier.wait()
+            results[index] = function()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=target, args=item) for item in enumerate(functions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return results
+
+def create_doctor(username='doctor'):
+    user = User.objects.create(username=username)
+    return models.Doctor.objects.create(
+        user = user,
+        specialization = 'general',
+        available_days = 'mon,tue,wed,thu,fri',
+        start_time = time(9),
+        end_time = time(17))
+
+def create_patient(username):
+    user = User.objects.create(username=username)
+    return models.Patient.objects.create(user=user, dob=date(1990, 1, 1), phone_number='9999999999')
+
+def client_for(user):
+    client = APIClient()
+    client.force_authenticate(user)
+    return client
+
+class RescheduleBookingRaceTest(TransactionTestCase):
+    """
+    a reschedule and a booking racing for the same time must not both succeed
+    """
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor()
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        self.patient = create_patient('rescheduling')
+        self.appointment = models.Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=self.day, time=time(9))
+
+    def test_no_double_booking(self):
+        body = {'date': self.day.strftime('%d-%m-%Y')}
+        for index, target in enumerate((time(10), time(10, 30), time(11), time(11, 30))):
+            body['time'] = target.strftime('%H:%M')
+            booking = create_patient(f'booking{index}')
+            reschedule_client = client_for(self.patient.user)
+            booking_client = client_for(booking.user)
+            appointment_id = self.appointment.appointment_id
+
+            rescheduled, booked = run_concurrently(
+                lambda: reschedule_client.patch(
+                    f'/medical/appointments/id/{appointment_id}/reschedule', body, format='json'),
+                lambda: booking_client.post(
+                    f'/medical/appointments?doctor_id={self.doctor.doctor_id}', body, format='json'))
+
+            self.assertEqual(
+                sorted([rescheduled.status_code, booked.status_code]), [201, 400],
+                (rescheduled.data, booked.data))
+            self.assertEqual(models.Appointment.objects.filter(
+                doctor=self.doctor, date=self.day, time=target,
+                status=models.AppointmentStatus.BOOKED).count(), 1)
+            if rescheduled.status_code == 201:
+                self.appointment = models.Appointment.objects.get(
+                    patient=self.patient, status=models.AppointmentStatus.BOOKED)
+
+        self.assertEqual(models.Appointment.objects.filter(
+            patient=self.patient, status=models.AppointmentStatus.BOOKED).count(), 1)
+
+class WaitlistPromotionTest(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.slot = models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        self.entry = models.WaitlistEntry.objects.create(
+            doctor=self.doctor, patient=create_patient('waiting'), date=self.day)
+
+    def assertWaiting(self, promoted):
+        self.assertIsNone(promoted)
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, models.WaitlistStatus.WAITING)
+
+    def test_promotes_into_free_time(self):
+        appointment = waitlist.promote_from_waitlist(self.doctor, self.day, time(10))
+        self.entry.refresh_from_db()
+        self.assertEqual(self.entry.status, models.WaitlistStatus.PROMOTED)
+        self.assertEqual(self.entry.appointment, appointment)
+
+    def test_past_time_is_not_promoted(self):
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=date(2020, 1, 6), start_time=time(9), end_time=time(12))
+        self.assertWaiting(waitlist.promote_from_waitlist(self.doctor, date(2020, 1, 6), time(10)))
+
+    def test_time_without_available_slot_is_not_promoted(self):
+        self.slot.is_available = False
+        self.slot.save()
+        self.assertWaiting(waitlist.promote_from_waitlist(self.doctor, self.day, time(10)))
+        self.assertWaiting(waitlist.promote_from_waitlist(self.doctor, self.day, time(13)))
+
+    def test_booked_time_is_not_promoted(self):
+        models.Appointment.objects.create(
+            doctor=self.doctor, patient=create_patient('booked'), date=self.day, time=time(10))
+        self.assertWaiting(waitlist.promote_from_waitlist(self.doctor, self.day, time(10)))
+
+class IdempotencyKeyTest(TestCase):
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor()
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        self.client = client_for(create_patient('patient').user)
+        self.url = f'/medical/appointments?doctor_id={self.doctor.doctor_id}'
+
+    def book(self, url, booking_time):
+        return self.client.post(
+            url, {'date': self.day.strftime('%d-%m-%Y'), 'time': booking_time},
+            format='json', HTTP_IDEMPOTENCY_KEY='booking-1')
+
+    def test_same_request_is_replayed(self):
+        self.assertEqual(self.book(self.url, '10:00').status_code, 201)
+        replayed = self.book(self.url, '10:00')
+        self.assertEqual(replayed.status_code, 201)
+        self.assertEqual(replayed.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(models.Appointment.objects.count(), 1)
+
+    def test_different_request_is_rejected(self):
+        self.assertEqual(self.book(self.url, '10:00').status_code, 201)
+        self.assertEqual(self.book(self.url, '11:00').status_code, 422)
+        self.assertEqual(self.book(f'{self.url}&note=1', '10:00').status_code, 422)
+        self.assertEqual(models.Appointment.objects.count(), 1)
+
+class ExportFormulaTest(TestCase):
+    def setUp(self):
+        patient = create_patient('exported')
+        patient.user.first_name = '=HYPERLINK("http://example.com")'
+        patient.user.last_name = '-2+3'
+        patient.user.save()
+        admin = User.objects.create(username='admin', is_staff=True)
+        self.client = client_for(admin)
+
+    def test_csv_cells_are_quoted(self):
+        response = self.client.get('/medical/patients/export?filetype=csv')
+        content = b''.join(response.streaming_content).decode()
+        self.assertIn('"\'=HYPERLINK(""http://example.com"")"', content)
+        self.assertIn("'-2+3", content)
+
+    def test_xlsx_cells_are_quoted(self):
+        import openpyxl
+        response = self.client.get('/medical/patients/export?filetype=xlsx')
+        sheet = openpyxl.load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        header, row = list(sheet.values)
+        self.assertEqual(row[header.index('first_name')], "'=HYPERLINK(\"http://example.com\")")
+        self.assertEqual(row[header.index('last_name')], "'-2+3")
+
+class RendererCompatibilityTest(SimpleTestCase):
+    """
+    FastJSONRenderer and FastJSONParser must behave exactly like DRF's defaults
+    """
+    cases = [
+        {'date': '01-01-2026', 'time': '09:30', 'status': 'B'},
+        {'raw_date': date(2026, 1, 1), 'raw_time': time(9, 30), 'raw_time_us': time(9, 30, 15, 123456)},
+        {'created_at': datetime(2026, 1, 1, 9, 30, 15, 123456, tzinfo=timezone.utc)},
+        {'amount': Decimal('10.50'), 'id': uuid.UUID(int=1), 'lazy': gettext_lazy('Patient')},
+        {'text': 'Dr. M\u00fcller \u2013 \u6771\u4eac \u2028 line \u2029 end', 'empty': '', 'none': None, 'flag': True},
+        {1: 'int key', 'nested': [[], {}, [1, 2.5, -3]], 'big': 2 ** 53},
+        [{'message': 'list payload'}, None, 0],
+        {'rate': 0.0001, 'small': 1e-7, 'smaller': -9.5e-5, 'zero': 0.0, 'negative_zero': -0.0},
+        {'large': 1e16, 'below_large': 9999999999999998.0, 'huge': -1.5e300, 'tuple': (1e-5, 2.0)},
+        [[[1e22]]],
+    ]
+
+    def test_renders_like_drf(self):
+        stdlib_renderer, fast_renderer = JSONRenderer(), renderers.FastJSONRenderer()
+        for case in self.cases:
+            with self.subTest(case=case):
+                self.assertEqual(fast_renderer.render(case), stdlib_renderer.render(case))
+
+    def test_parses_like_drf(self):
+        stdlib_renderer, stdlib_parser, fast_parser = JSONRenderer(), JSONParser(), renderers.FastJSONParser()
+        for case in self.cases:
+            body = stdlib_renderer.render(case)
+            with self.subTest(body=body):
+                self.assertEqual(
+                    fast_parser.parse(io.BytesIO(body)), stdlib_parser.parse(io.BytesIO(body)))
+
+    def test_non_finite_floats_are_rejected(self):
+        for value in (float('nan'), float('inf'), -float('inf')):
+            with self.subTest(value=value):
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render({'nested': [value]})
+                with self.assertRaises(ValueError):
+                    renderers.FastJSONRenderer().render({'nested': [value]})
+
+class BucketThrottledView(APIView):
+    permission_classes = [AllowAny]
+    throttle_classes = throttling.SCOPED_BUCKET_THROTTLES
+    throttle_scope = 'test'
+
+    def get(self, request):
+        return Response({})
+
+@mock.patch.object(throttling.TokenBucketThrottle, 'THROTTLE_RATES', {'test_user': '2/min', 'test': '5/min'})
+class BucketThrottleTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.view = BucketThrottledView.as_view()
+
+    def call(self, user):
+        request = APIRequestFactory().get('/')
+        force_authenticate(request, user)
+        return self.view(request).status_code
+
+    def test_rejected_requests_leave_shared_bucket_alone(self):
+        first, second, third = [User.objects.create(username=name) for name in ('first', 'second', 'third')]
+        self.assertEqual([self.call(first) for _ in range(10)], [200] * 2 + [429] * 8)
+        # the shared bucket of 5 only paid for the two allowed requests
+        self.assertEqual([self.call(second) for _ in range(2)], [200, 200])
+        self.assertEqual([self.call(third) for _ in range(2)], [200, 429])
+
+class ClinicalAccessTest(TestCase):
+    """
+    doctors only reach the clinical history of patients who have an appointment with them
+    """
+    def setUp(self):
+        self.treating = create_doctor('treating')
+        self.other = create_doctor('other')
+        self.patient = create_patient('patient')
+        self.unrelated = create_patient('unrelated')
+        models.Appointment.objects.create(
+            doctor=self.treating, patient=self.patient, date=date(2030, 1, 7), time=time(10))
+        for patient in (self.patient, self.unrelated):
+            models.MedicalRecord.objects.create(
+                patient=patient, doctor=self.other, diagnosis='asthma', treatment='inhaler')
+
+    def test_timeline(self):
+        url = f'/medical/patients/id/{self.patient.patient_id}/timeline'
+        self.assertEqual(client_for(self.treating.user).get(url).status_code, 200)
+        self.assertEqual(client_for(self.other.user).get(url).status_code, 404)
+        self.assertEqual(client_for(self.patient.user).get(url).status_code, 200)
+        self.assertEqual(client_for(self.unrelated.user).get(url).status_code, 404)
+
+    def test_search(self):
+        def found(user):
+            response = client_for(user).get('/medical/search/clinical?q=asthma')
+            return sorted(entry['patient'] for entry in response.data['results'])
+        self.assertEqual(found(self.treating.user), ['patient'])
+        self.assertEqual(found(self.other.user), [])
+        self.assertEqual(found(self.unrelated.user), ['unrelated'])
+
+class BulkPrescriptionRaceTest(TransactionTestCase):
+    """
+    overlapping batches issued at once must report every prescription as
+    created by exactly one of them, with one change event each
+    """
+    def test_created_holds_inserted_rows_only(self):
+        doctor = create_doctor()
+        patient = create_patient('patient')
+        ids = [
+            models.Appointment.objects.create(
+                doctor=doctor, patient=patient, date=date(2030, 1, 7), time=time(9, minute)).appointment_id
+            for minute in range(0, 60, 5)]
+        body = {'prescriptions': [
+            {'appointment_id': appointment_id, 'notes': 'rest', 'medications': 'paracetamol'}
+            for appointment_id in ids]}
+        clients = [client_for(doctor.user) for _ in range(4)]
+
+        responses = run_concurrently(*[
+            lambda client=client: client.post('/medical/prescriptions/bulk', body, format='json')
+            for client in clients])
+
+        created = [pk for response in responses for pk in response.data['created']]
+        self.assertEqual(sorted(created), ids)
+        for response in responses:
+            self.assertEqual(sorted(response.data['created'] + response.data['skipped']), ids)
+        self.assertEqual(models.ChangeEvent.objects.filter(
+            resource='prescription', action=models.ChangeAction.CREATED).count(), len(ids))
+
+class TicketClaimTest(TransactionTestCase):
+    """
+    agents claiming from the queue at once each get different tickets until it is empty
+    """
+    def test_parallel_claims(self):
+        requester = User.objects.create(username='requester')
+        agents = [User.objects.create(username=f'agent{index}', is_staff=True) for index in range(8)]
+        models.SupportTicket.objects.bulk_create([
+            models.SupportTicket(user=requester, subject=f'ticket {index}', message='help')
+            for index in range(200)])
+
+        def claim_all(agent):
+            claimed = []
+            while (ticket := tickets.claim_next_ticket(agent)) is not None:
+                claimed.append(ticket.id)
+            return claimed
+
+        claims = run_concurrently(*[lambda agent=agent: claim_all(agent) for agent in agents])
+
+        claimed = [ticket_id for agent_claims in claims for ticket_id in agent_claims]
+        self.assertEqual(len(claimed), 200)
+        self.assertEqual(len(set(claimed)), 200)
+        self.assertFalse(models.SupportTicket.objects.filter(status=models.TicketStatus.OPEN).exists())
+        for agent, agent_claims in zip(agents, claims):
+            self.assertEqual(
+                set(models.SupportTicket.objects.filter(assigned_to=agent).values_list('id', flat=True)),
+                set(agent_claims))
+
+def locked_elsewhere(queryset):
+    """
+    whether another connection finds a row of queryset locked
+    """
+    def try_lock():
+        try:
+            with transaction.atomic():
+                list(queryset.select_for_update(nowait=True))
+            return False
+        except DatabaseError:
+            return True
+    return run_concurrently(try_lock)[0]
+
+class ReminderClaimTest(TransactionTestCase):
+    now = datetime(2030, 1, 7, 8, tzinfo=timezone.utc)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.patient = create_patient('patient')
+        self.appointment = models.Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=date(2030, 1, 7), time=time(10))
+
+    def test_sends_after_claim_commits(self):
+        test = self
+        class Backend:
+            def send_batch(self, messages):
+                self.messages = messages
+                self.locked = [
+                    locked_elsewhere(queryset) for queryset in (
+                        models.Appointment.objects.filter(pk=test.appointment.pk),
+                        models.Doctor.objects.filter(pk=test.doctor.pk),
+                        models.Patient.objects.filter(pk=test.patient.pk))]
+
+        backend = Backend()
+        self.assertEqual(reminders.send_due_reminders(now=self.now, backend=backend), 1)
+        self.assertEqual([message['appointment_id'] for message in backend.messages], [self.appointment.pk])
+        self.assertEqual(backend.locked, [False, False, False])
+        self.assertEqual(reminders.send_due_reminders(now=self.now, backend=backend), 0)
+
+    def test_failed_batch_is_handed_back(self):
+        class FailingBackend:
+            def send_batch(self, messages):
+                raise RuntimeError('provider unavailable')
+
+        with self.assertRaises(RuntimeError):
+            reminders.send_due_reminders(now=self.now, backend=FailingBackend())
+        self.appointment.refresh_from_db()
+        self.assertIsNone(self.appointment.reminder_sent_at)
+
+class ChangeFeedOrderTest(TransactionTestCase):
+    """
+    an event committed after later events were read is still delivered
+    """
+    def record(self, resource_id):
+        return models.ChangeEvent.objects.create(
+            resource='appointment', resource_id=resource_id, action=models.ChangeAction.CREATED, payload={})
+
+    def test_late_commit_is_not_skipped(self):
+        written = threading.Event()
+        release = threading.Event()
+
+        def long_transaction():
+            try:
+                with transaction.atomic():
+                    self.record(1)
+                    written.set()
+                    release.wait(10)
+            finally:
+                connections.close_all()
+
+        thread = threading.Thread(target=long_transaction)
+        thread.start()
+        written.wait(10)
+        self.record(2)
+
+        changefeed.sequence_events()
+        events, cursor = changefeed.get_changes()
+        self.assertEqual([event['resource_id'] for event in events], [2])
+
+        release.set()
+        thread.join()
+        changefeed.sequence_events()
+        events, cursor = changefeed.get_changes(cursor)
+        self.assertEqual([event['resource_id'] for event in events], [1])
+        self.assertLess(events[0]['event_id'], models.ChangeEvent.objects.get(resource_id=2).event_id)
+        self.assertEqual(changefeed.get_changes(cursor), ([], cursor))
+
+    def test_reading_the_feed_writes_nothing(self):
+        self.record(1)
+        client = client_for(User.objects.create(username='admin', is_staff=True))
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = client.get('/medical/changes')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
+        self.assertFalse([query['sql'] for query in queries if not query['sql'].startswith('SELECT')])
+
+        call_command('sequence_change_feed', stderr=io.StringIO())
+        response = client.get('/medical/changes')
+        self.assertEqual([event['resource_id'] for event in response.data['results']], [1])
+
+class BlackoutTest(TestCase):
+    """
+    a blackout window inside a slot blocks only the window, appointments
+    outside it keep their booking and the rest of the slot stays bookable
+    """
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.patient = create_patient('patient')
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(17))
+
+    def book(self, hour, minute=0):
+        return models.Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=self.day, time=time(hour, minute))
+
+    def test_only_the_window_is_blocked(self):
+        morning = self.book(9, 30)
+        inside = self.book(13, 15)
+        afternoon = self.book(16)
+
+        blocked, cancelled = blackout.apply_blackout(
+            [self.doctor.pk], self.day, self.day, time(13), time(14))
+
+        self.assertEqual(blocked, 1)
+        self.assertEqual([row['appointment_id'] for row in cancelled], [inside.appointment_id])
+        self.assertEqual(
+            set(models.Appointment.objects.filter(
+                status = models.AppointmentStatus.BOOKED).values_list('pk', flat=True)),
+            {morning.pk, afternoon.pk})
+        self.assertEqual(
+            sorted(models.DoctorAvailability.objects.values_list('start_time', 'end_time', 'is_available')),
+            [(time(9), time(13), True), (time(13), time(14), False), (time(14), time(17), True)])
+        counters = models.DoctorDailyOccupancy.objects.get(doctor=self.doctor, date=self.day)
+        self.assertEqual((counters.available_minutes, counters.booked_count), (420, 2))
+        self.assertEqual(occupancy.verify_occupancy(), [])
+        self.assertEqual(
+            sorted(models.ChangeEvent.objects.filter(
+                resource = 'doctoravailability').values_list('action', flat=True)),
+            [models.ChangeAction.CREATED] * 3 + [models.ChangeAction.UPDATED])
+
+        with transaction.atomic():
+            self.assertIsNotNone(utils.lock_available_slot(self.doctor, self.day, time(12, 30)))
+            self.assertIsNone(utils.lock_available_slot(self.doctor, self.day, time(13)))
+            self.assertIsNotNone(utils.lock_available_slot(self.doctor, self.day, time(14)))
+
+class BulkUploadDeduplicationTest(TestCase):
+    """
+    a completed upload replays only for the user who sent it, sync uploads
+    diff against the current slots and are never replayed
+    """
+    def setUp(self):
+        import openpyxl
+        self.doctor = create_doctor()
+        workbook = openpyxl.Workbook()
+        workbook.active.append(['doctor_username', 'date', 'start_time', 'end_time'])
+        workbook.active.append(['doctor', '07-01-2030', '09:00', '12:00'])
+        content = io.BytesIO()
+        workbook.save(content)
+        self.content = content.getvalue()
+        self.admin = User.objects.create(username='admin', is_staff=True)
+
+    def upload(self, user, query=''):
+        return client_for(user).post(
+            f'/medical/slots/bulk-upload{query}',
+            {'upload_file': SimpleUploadedFile('slots.xlsx', self.content)},
+            format='multipart')
+
+    def test_replay_is_per_user(self):
+        self.assertEqual(self.upload(self.admin).status_code, 201)
+        self.assertEqual(self.upload(self.admin).headers.get(uploads.REPLAYED_HEADER), 'true')
+        other = User.objects.create(username='other', is_staff=True)
+        response = self.upload(other)
+        self.assertEqual(response.status_code, 201)
+        self.assertIsNone(response.headers.get(uploads.REPLAYED_HEADER))
+
+    def test_missing_mode_is_keyed_as_append(self):
+        self.assertEqual(self.upload(self.admin).status_code, 201)
+        response = self.upload(self.admin, '?mode=append')
+        self.assertEqual(response.headers.get(uploads.REPLAYED_HEADER), 'true')
+        self.assertEqual(models.DoctorAvailability.objects.filter(doctor=self.doctor).count(), 1)
+
+    def test_sync_is_not_replayed(self):
+        self.assertEqual(self.upload(self.admin, '?mode=sync').status_code, 200)
+        models.DoctorAvailability.objects.filter(doctor=self.doctor).delete()
+        response = self.upload(self.admin, '?mode=sync')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.headers.get(uploads.REPLAYED_HEADER))
+        self.assertTrue(models.DoctorAvailability.objects.filter(doctor=self.doctor).exists())
+
+@override_settings(DOCTOR_DIRECTORY_INDEX=True)
+class DoctorDirectorySortTest(TestCase):
+    """
+    text sortbys follow the database collation, the directory only orders the others
+    """
+    def setUp(self):
+        for username, last_name, hour in (('zeta', 'Émile', 9), ('alpha', 'Zola', 8), ('beta', 'adams', 10)):
+            doctor = create_doctor(username)
+            doctor.user.last_name = last_name
+            doctor.user.save()
+            doctor.start_time = time(hour)
+            doctor.save()
+        self.client = client_for(User.objects.create(username='patient'))
+
+    def list_doctors(self, sortby):
+        with mock.patch.object(directory, 'get_directory', wraps=directory.get_directory) as get_directory:
+            response = self.client.get(f'/medical/doctors/list?sortby={sortby}&sortorder=asc')
+        return [row['user']['username'] for row in response.data], get_directory.called
+
+    def test_name_is_sorted_by_database(self):
+        expected = list(models.Doctor.objects.order_by('user__last_name').values_list('user__username', flat=True))
+        self.assertEqual(self.list_doctors('last_name'), (expected, False))
+
+    def test_time_is_sorted_by_directory(self):
+        self.assertEqual(self.list_doctors('start_time'), (['alpha', 'zeta', 'beta'], True))
+
+class SoftDeletedDoctorTest(TestCase):
+    """
+    appointments with a soft-deleted doctor are hidden from the patient and
+    can neither be cancelled nor rescheduled into a slot of that doctor
+    """
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        patient = create_patient('patient')
+        self.appointment = models.Appointment.objects.create(
+            doctor=self.doctor, patient=patient, date=self.day, time=time(10))
+        purge.soft_delete(self.doctor)
+        self.client = client_for(patient.user)
+        self.url = f'/medical/appointments/id/{self.appointment.appointment_id}'
+
+    def test_appointment_is_not_listed(self):
+        self.assertEqual(self.client.get('/medical/appointments/list').data, [])
+
+    def test_appointment_is_not_found(self):
+        rescheduled = self.client.patch(
+            f'{self.url}/reschedule', {'date': self.day.strftime('%d-%m-%Y'), 'time': '11:00'}, format='json')
+        self.assertEqual(rescheduled.status_code, 404)
+        self.assertEqual(self.client.patch(f'{self.url}/cancel').status_code, 404)
+        self.assertEqual(
+            list(models.Appointment.objects.values_list('status', flat=True)), [models.AppointmentStatus.BOOKED])
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class ReplicaRoutingTest(TransactionTestCase):
+    """
+    reads of @replica_reads views go to the replica alias, writes to 'default',
+    and a write sends the reads after it to 'default'
+    """
+    day = date(2030, 1, 7)
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        # a second connection to the test database, the way the test runner sets
+        # up an alias with TEST: {'MIRROR': 'default'}. added after the class setup
+        # since the runner only creates and checks databases of configured aliases
+        connections.settings['replica'] = {**connections['default'].settings_dict, 'TEST': {'MIRROR': 'default'}}
+        cls.databases = {'default', 'replica'}
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica'].close()
+        del connections['replica']
+        del connections.settings['replica']
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.doctor = create_doctor()
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        self.patient = create_patient('patient')
+        self.client = client_for(self.patient.user)
+
+    def queries(self, request):
+        with CaptureQueriesContext(connections['default']) as primary, \
+                CaptureQueriesContext(connections['replica']) as replica:
+            response = request()
+        return response.status_code, len(primary), len(replica)
+
+    def list_appointments(self):
+        return self.queries(lambda: self.client.get('/medical/appointments/list'))
+
+    def test_reads_go_to_replica(self):
+        status, primary, replica = self.list_appointments()
+        self.assertEqual((status, primary), (200, 0))
+        self.assertGreater(replica, 0)
+
+    def test_write_pins_user_to_primary(self):
+        status, primary, replica = self.queries(lambda: self.client.post(
+            f'/medical/appointments?doctor_id={self.doctor.doctor_id}',
+            {'date': self.day.strftime('%d-%m-%Y'), 'time': '10:00'}, format='json'))
+        self.assertEqual((status, replica), (201, 0))
+        self.assertGreater(primary, 0)
+        status, primary, replica = self.list_appointments()
+        self.assertEqual((status, replica), (200, 0))
+        self.assertGreater(primary, 0)
+
+    def test_write_sends_later_reads_of_request_to_primary(self):
+        @dbrouter.replica_reads
+        def view(request):
+            aliases = [models.Clinic.objects.all().db]
+            models.Clinic.objects.create(name='clinic', address='street', contact_number='1')
+            aliases.append(models.Clinic.objects.all().db)
+            return aliases
+
+        request = APIRequestFactory().get('/')
+        request.user = self.patient.user
+        self.assertEqual(view(request), ['replica', 'default'])
+        self.assertEqual(models.Clinic.objects.all().db, 'default')
+
+class ConditionalGetTest(TestCase):
+    """
+    a repeat GET with the returned etag is answered 304 until a write bumps
+    the version counters the list depends on
+    """
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=self.day, start_time=time(9), end_time=time(12))
+        self.client = client_for(create_patient('patient').user)
+
+    def test_write_changes_etag(self):
+        first = self.client.get('/medical/appointments/list')
+        self.assertEqual(first.status_code, 200)
+        repeat = self.client.get('/medical/appointments/list', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual((repeat.status_code, repeat.content, repeat['ETag']), (304, b'', first['ETag']))
+
+        versions = models.ResourceVersion.objects.filter(name='appointment').values_list('version', flat=True)
+        version = versions.first() or 0
+        with self.captureOnCommitCallbacks(execute=True):
+            booked = self.client.post(
+                f'/medical/appointments?doctor_id={self.doctor.doctor_id}',
+                {'date': self.day.strftime('%d-%m-%Y'), 'time': '10:00'}, format='json')
+        self.assertEqual(booked.status_code, 201)
+        self.assertEqual(versions.first(), version + 1)
+
+        changed = self.client.get('/medical/appointments/list', HTTP_IF_NONE_MATCH=first['ETag'])
+        self.assertEqual(changed.status_code, 200)
+        self.assertNotEqual(changed['ETag'], first['ETag'])
+        self.assertEqual(len(changed.data), 1)
+
+class OccupancyCounterTest(TestCase):
+    """
+    booking, cancelling and rescheduling keep the occupancy counters equal to a
+    rebuild from the raw tables, rebuild_occupancy repairs writes that skip signals
+    """
+    day = date(2030, 1, 7)
+    next_day = date(2030, 1, 8)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        for day in (self.day, self.next_day):
+            models.DoctorAvailability.objects.create(
+                doctor=self.doctor, date=day, start_time=time(9), end_time=time(12))
+        self.patient = create_patient('patient')
+
+    def counters(self):
+        return sorted(models.DoctorDailyOccupancy.objects.values_list(
+            'doctor_id', 'date', 'available_minutes', 'booked_count', 'remaining_capacity'))
+
+    def book(self, username, booking_time):
+        client = client_for(create_patient(username).user)
+        response = client.post(
+            f'/medical/appointments?doctor_id={self.doctor.doctor_id}',
+            {'date': self.day.strftime('%d-%m-%Y'), 'time': booking_time}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return client, models.Appointment.objects.get(date=self.day, time=booking_time)
+
+    def test_counters_match_rebuild(self):
+        client, cancelled = self.book('cancelling', '10:00')
+        self.assertEqual(client.patch(f'/medical/appointments/id/{cancelled.pk}/cancel').status_code, 200)
+        client, moved = self.book('moving', '11:00')
+        self.assertEqual(client.patch(
+            f'/medical/appointments/id/{moved.pk}/reschedule',
+            {'date': self.next_day.strftime('%d-%m-%Y'), 'time': '10:00'}, format='json').status_code, 201)
+        self.book('staying', '09:30')
+
+        maintained = self.counters()
+        self.assertEqual([row[3] for row in maintained], [1, 1])
+        occupancy.rebuild_occupancy()
+        self.assertEqual(self.counters(), maintained)
+
+    def test_command_repairs_bulk_create_drift(self):
+        models.Appointment.objects.bulk_create([
+            models.Appointment(doctor=self.doctor, patient=self.patient, date=self.day, time=time(hour))
+            for hour in (9, 10)])
+        self.assertNotEqual(occupancy.verify_occupancy(), [])
+        with self.assertRaises(CommandError):
+            call_command('rebuild_occupancy', verify_only=True, stdout=io.StringIO(), stderr=io.StringIO())
+
+        call_command('rebuild_occupancy', stdout=io.StringIO())
+        self.assertEqual(occupancy.verify_occupancy(), [])
+        self.assertIn((self.doctor.pk, self.day, 180, 2, 10), self.counters())
+
+class SendRemindersCommandTest(SimpleTestCase):
+    def run_command(self, results, **options):
+        stderr = io.StringIO()
+        with mock.patch.object(reminders, 'send_due_reminders', side_effect=results) as send, \
+                mock.patch('medicalapi.management.commands.send_reminders.time.sleep'), \
+                mock.patch('medicalapi.management.commands.send_reminders.close_old_connections'):
+            try:
+                call_command('send_reminders', stderr=stderr, **options)
+            except KeyboardInterrupt:
+                pass
+        return send, stderr.getvalue()
+
+    def test_zero_lead_hours_is_kept(self):
+        send, _ = self.run_command([0], lead_hours=0)
+        self.assertEqual(send.call_args.kwargs['lead'], timedelta(0))
+
+    def test_loop_survives_backend_error(self):
+        send, output = self.run_command([RuntimeError('backend down'), 2, KeyboardInterrupt()], loop=True)
+        self.assertEqual(send.call_count, 3)
+        self.assertIn("sending reminders failed: RuntimeError('backend down')", output)
+        self.assertIn('sent 2 appointment reminders', output)
+
+    def test_error_without_loop_is_raised(self):
+        with self.assertRaises(RuntimeError):
+            self.run_command([RuntimeError('backend down')])
+
+class ArchiveHistoryTest(TestCase):
+    """
+    archived rows leave the hot tables and are still served by the history reads
+    """
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.patient = create_patient('patient')
+        self.old = models.Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=date(2020, 3, 2), time=time(10))
+        self.prescription = models.Prescription.objects.create(
+            appointment=self.old, notes='rest', medications='paracetamol')
+        self.slot = models.DoctorAvailability.objects.create(
+            doctor=self.doctor, date=date(2020, 3, 2), start_time=time(9), end_time=time(12))
+        self.current = models.Appointment.objects.create(
+            doctor=self.doctor, patient=self.patient, date=date(2030, 1, 7), time=time(10))
+
+    def timeline(self, user):
+        response = client_for(user).get(f'/medical/patients/id/{self.patient.pk}/timeline')
+        self.assertEqual(response.status_code, 200)
+        return [(entry['type'], entry['id']) for entry in response.data['results']]
+
+    def test_rows_move_to_archive(self):
+        call_command('archive_history', stdout=io.StringIO())
+
+        self.assertEqual(list(models.Appointment.objects.values_list('pk', flat=True)), [self.current.pk])
+        self.assertFalse(models.Prescription.objects.exists())
+        self.assertFalse(models.DoctorAvailability.objects.exists())
+        self.assertEqual(models.ArchivedAppointment.objects.get().pk, self.old.pk)
+        self.assertEqual(models.ArchivedPrescription.objects.get().appointment_id, self.old.pk)
+        self.assertEqual(models.ArchivedDoctorAvailability.objects.get().pk, self.slot.pk)
+
+    def test_history_reads_archived_rows(self):
+        before = self.timeline(self.patient.user)
+        call_command('archive_history', stdout=io.StringIO())
+
+        self.assertEqual(self.timeline(self.patient.user), before)
+        self.assertEqual(before, [
+            ('appointment', self.current.pk),
+            ('prescription', self.prescription.pk),
+            ('appointment', self.old.pk)])
+
+    def test_doctor_keeps_access_through_archived_appointment(self):
+        self.current.delete()
+        call_command('archive_history', stdout=io.StringIO())
+
+        self.assertFalse(models.Appointment.objects.exists())
+        self.assertEqual(self.timeline(self.doctor.user), [
+            ('prescription', self.prescription.pk), ('appointment', self.old.pk)])
+
+class SlotSyncTest(TestCase):
+    """
+    a sync writes only the difference with the sheet, a repeated sync writes nothing
+    """
+    day = date(2030, 1, 7)
+
+    def setUp(self):
+        self.doctor = create_doctor()
+        self.kept, self.changed, self.removed = [
+            models.DoctorAvailability.objects.create(
+                doctor=self.doctor, date=self.day, start_time=time(start), end_time=time(end))
+            for start, end in ((9, 10), (10, 11), (14, 15))]
+        self.sheet = {
+            slotsync.slot_key(self.doctor.pk, self.day, time(9)): time(10),
+            slotsync.slot_key(self.doctor.pk, self.day, time(10)): time(12),
+            slotsync.slot_key(self.doctor.pk, self.day, time(16)): time(17)}
+
+    def sync(self):
+        last_event = models.ChangeEvent.objects.order_by('-event_id').values_list('event_id', flat=True).first()
+        report, errors = slotsync.sync_slots(self.sheet)
+        self.assertIsNone(errors)
+        events = models.ChangeEvent.objects.filter(event_id__gt = last_event).order_by('event_id')
+        return report, list(events.values_list('action', 'resource_id'))
+
+    def test_only_the_diff_is_written(self):
+        report, events = self.sync()
+
+        self.assertEqual(
+            [len(report['inserted']), len(report['updated']), len(report['deleted']), report['unchanged']],
+            [1, 1, 1, 1])
+        self.assertEqual(report['updated'][0]['previous_end_time'], '11:00')
+        slots = list(models.DoctorAvailability.objects.order_by('start_time').values_list(
+            'pk', 'start_time', 'end_time'))
+        inserted = slots[2][0]
+        self.assertEqual(slots, [
+            (self.kept.pk, time(9), time(10)),
+            (self.changed.pk, time(10), time(12)),
+            (inserted, time(16), time(17))])
+        self.assertEqual(sorted(events), sorted([
+            (models.ChangeAction.CREATED, inserted),
+            (models.ChangeAction.UPDATED, self.changed.pk),
+            (models.ChangeAction.DELETED, self.removed.pk)]))
+        self.assertEqual(occupancy.verify_occupancy(), [])
+
+    def test_second_sync_is_a_no_op(self):
+        self.sync()
+        slots = list(models.DoctorAvailability.objects.order_by('pk').values())
+
+        report, events = self.sync()
+
+        self.assertEqual(report, {'inserted': [], 'updated': [], 'deleted': [], 'unchanged': 3})
+        self.assertEqual(events, [])
+        self.assertEqual(list(models.DoctorAvailability.objects.order_by('pk').values()), slots)
@@ -0,0 +1,93 @@
+import threading
+from collections import Counter
+from rest_framework.throttling import SimpleRateThrottle
+
+_bucket_lock = threading.Lock()
+_metrics_lock = threading.Lock()
+_throttled = Counter()
+
+def record_throttled(scope):
+    with _metrics_lock:
+        _throttled[scope] += 1
+
+def throttled_counts():
+    with _metrics_lock:
+        return dict(_throttled)
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """
+    token bucket over the local cache. a rate of 'N/period' allows bursts of N
+    requests and refills N tokens per period. the scope comes from the view's
+    throttle_scope plus scope_suffix, and a scope without a configured rate
+    is not throttled. buckets are keyed by client ip unless get_ident_for is
+    overridden.
+    drf runs every throttle of a view, so a bucket is only charged when the
+    bucket throttles before it allowed the request
+    """
+    scope_suffix = ''
+
+    def __init__(self):
+        # rate is resolved per view in allow_request, like ScopedRateThrottle
+        pass
+
+    def get_ident_for(self, request):
+        return self.get_ident(request)
+
+    def allow_request(self, request, view):
+        if getattr(request, 'bucket_throttled', False):
+            # already rejected, the request must not use up tokens of later buckets
+            return True
+        view_scope = getattr(view, 'throttle_scope', None)
+        if not view_scope:
+            return True
+        self.scope = f'{view_scope}{self.scope_suffix}'
+        if self.scope not in self.THROTTLE_RATES:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        if self.num_requests is None:
+            return True
+
+        self.key = self.cache_format % {'scope': self.scope, 'ident': self.get_ident_for(request)}
+        refill_per_second = self.num_requests / self.duration
+        now = self.timer()
+        with _bucket_lock:
+            tokens, last = self.cache.get(self.key, (self.num_requests, now))
+            tokens = min(self.num_requests, tokens + (now - last) * refill_per_second)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            self.cache.set(self.key, (tokens, now), self.duration)
+
+        if not allowed:
+            self.wait_seconds = (1 - tokens) / refill_per_second
+            request.bucket_throttled = True
+            record_throttled(self.scope)
+        return allowed
+
+    def wait(self):
+        return getattr(self, 'wait_seconds', None)
+
+class UserBucketThrottle(TokenBucketThrottle):
+    """
+    bucket per authenticated user, anonymous requests share a bucket per ip
+    """
+    scope_suffix = '_user'
+
+    def get_ident_for(self, request):
+        if request.user and request.user.is_authenticated:
+            return f'user{request.user.pk}'
+        return f'ip{self.get_ident(request)}'
+
+class IPBucketThrottle(TokenBucketThrottle):
+    scope_suffix = '_ip'
+
+class EndpointBucketThrottle(TokenBucketThrottle):
+    """
+    one bucket shared by every client of the endpoint
+    """
+    def get_ident_for(self, request):
+        return 'all'
+
+# per client buckets come first so a rejected client does not drain the shared one
+SCOPED_BUCKET_THROTTLES = [UserBucketThrottle, IPBucketThrottle, EndpointBucketThrottle]
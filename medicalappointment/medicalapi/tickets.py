@@ -0,0 +1,39 @@
+from django.db import transaction
+from django.utils import timezone
+from . import models
+
+# how many times a claim retries after losing a ticket to another agent
+CLAIM_ATTEMPTS = 3
+
+def open_tickets():
+    """
+    queryset of open tickets, oldest first. rows locked by another claim are
+    skipped, so concurrent agents each get a different ticket without waiting
+    """
+    return models.SupportTicket.objects.select_for_update(skip_locked=True).filter(
+        status = models.TicketStatus.OPEN).order_by('created_at', 'id')
+
+def claim_next_ticket(agent):
+    """
+    method to assign the oldest open ticket to agent, returns the claimed
+    ticket or None when the queue is empty
+    """
+    for _ in range(CLAIM_ATTEMPTS):
+        with transaction.atomic():
+            ticket = open_tickets().first()
+            if ticket is None:
+                return None
+            # status guard for backends without row locks, e.g. sqlite
+            claimed_at = timezone.now()
+            claimed = models.SupportTicket.objects.filter(
+                id = ticket.id,
+                status = models.TicketStatus.OPEN).update(
+                    status = models.TicketStatus.IN_PROGRESS,
+                    assigned_to = agent,
+                    claimed_at = claimed_at)
+            if claimed:
+                ticket.status = models.TicketStatus.IN_PROGRESS
+                ticket.assigned_to = agent
+                ticket.claimed_at = claimed_at
+                return ticket
+    return None
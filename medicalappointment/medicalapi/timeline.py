@@ -0,0 +1,120 @@
+import heapq
+from datetime import date
+from . import fastserializers
+from . import models
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# tie breaker between entries of the same day, higher comes first
+APPOINTMENT_RANK = 0
+PRESCRIPTION_RANK = 1
+RECORD_RANK = 2
+
+to_date = fastserializers.CONVERTERS['to_ddmmyyyy']
+to_time = fastserializers.CONVERTERS['to_hhmm']
+to_datetime = fastserializers.CONVERTERS['to_datetime']
+
+def encode_cursor(key):
+    entry_date, rank, entry_id = key
+    return f'{entry_date.isoformat()}_{rank}_{entry_id}'
+
+def decode_cursor(cursor):
+    """
+    (date, rank, id) key of the last entry of previous page, raises ValueError
+    """
+    entry_date, rank, entry_id = cursor.split('_')
+    return date.fromisoformat(entry_date), int(rank), int(entry_id)
+
+def before_cursor(queryset, rank, date_field, id_field, cursor):
+    """
+    keyset condition: entries sorting after cursor in (date, rank, id) descending order
+    """
+    if cursor is None:
+        return queryset
+    cursor_date, cursor_rank, cursor_id = cursor
+    if rank < cursor_rank:
+        return queryset.filter(**{f'{date_field}__lte': cursor_date})
+    if rank > cursor_rank:
+        return queryset.filter(**{f'{date_field}__lt': cursor_date})
+    return queryset.filter(**{f'{date_field}__lt': cursor_date}) | queryset.filter(**{
+        date_field: cursor_date,
+        f'{id_field}__lt': cursor_id})
+
+def appointment_entry(row):
+    return {
+        'type': 'appointment',
+        'id': row['appointment_id'],
+        'date': to_date(row['date']),
+        'time': to_time(row['time']),
+        'status': row['status'],
+        'doctor': row['doctor__user__username'],
+        'specialization': row['doctor__specialization']}
+
+def prescription_entry(row):
+    return {
+        'type': 'prescription',
+        'id': row['prescription_id'],
+        'date': to_date(row['appointment__date']),
+        'appointment_id': row['appointment_id'],
+        'notes': row['notes'],
+        'medications': row['medications'],
+        'doctor': row['appointment__doctor__user__username'],
+        'issued_at': to_datetime(row['issued_at'])}
+
+def record_entry(row):
+    return {
+        'type': 'medical_record',
+        'id': row['medicalrecord_id'],
+        'date': to_date(row['date']),
+        'diagnosis': row['diagnosis'],
+        'treatment': row['treatment'],
+        'doctor': row['doctor__user__username']}
+
+def timeline_sources(patient):
+    """
+    (rank, queryset, date field, id field, renderer) of every clinical history
+    source of the patient, archived appointments included
+    """
+    appointment_fields = (
+        'appointment_id', 'date', 'time', 'status', 'doctor__user__username', 'doctor__specialization')
+    prescription_fields = (
+        'prescription_id', 'appointment_id', 'appointment__date', 'notes', 'medications',
+        'appointment__doctor__user__username', 'issued_at')
+    return [
+        (APPOINTMENT_RANK,
+            models.Appointment.objects.filter(patient = patient).values(*appointment_fields),
+            'date', 'appointment_id', appointment_entry),
+        (APPOINTMENT_RANK,
+            models.ArchivedAppointment.objects.filter(patient = patient).values(*appointment_fields),
+            'date', 'appointment_id', appointment_entry),
+        (PRESCRIPTION_RANK,
+            models.Prescription.objects.filter(appointment__patient = patient).values(*prescription_fields),
+            'appointment__date', 'prescription_id', prescription_entry),
+        (PRESCRIPTION_RANK,
+            models.ArchivedPrescription.objects.filter(appointment__patient = patient).values(*prescription_fields),
+            'appointment__date', 'prescription_id', prescription_entry),
+        (RECORD_RANK,
+            models.MedicalRecord.objects.filter(patient = patient).values(
+                'medicalrecord_id', 'date', 'diagnosis', 'treatment', 'doctor__user__username'),
+            'date', 'medicalrecord_id', record_entry)]
+
+def get_timeline_page(patient, cursor=None, page_size=DEFAULT_PAGE_SIZE):
+    """
+    method to get one page of patient's clinical history, newest first.
+    every source is read with one keyset query of at most page_size + 1 rows,
+    so the query count does not grow with the length of the history.
+    returns (entries, next cursor or None)
+    """
+    streams = []
+    for rank, queryset, date_field, id_field, render in timeline_sources(patient):
+        queryset = before_cursor(queryset, rank, date_field, id_field, cursor).order_by(
+            f'-{date_field}', f'-{id_field}')[:page_size + 1]
+        streams.append([
+            ((row[date_field], rank, row[id_field]), render, row) for row in queryset])
+
+    merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+    page = [item for _, item in zip(range(page_size + 1), merged)]
+
+    next_cursor = encode_cursor(page[page_size - 1][0]) if len(page) > page_size else None
+    return [render(row) for _, render, row in page[:page_size]], next_cursor
@@ -0,0 +1,159 @@
+import functools
+import hashlib
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework.response import Response
+from . import models
+from . import serializers
+
+REPLAYED_HEADER = 'Upload-Replayed'
+
+def batch_size():
+    return getattr(settings, 'BULK_UPLOAD_BATCH_SIZE', 500)
+
+def stale_after():
+    return timedelta(seconds=getattr(settings, 'BULK_UPLOAD_STALE_SECONDS', 300))
+
+def result_ttl():
+    return timedelta(seconds=getattr(settings, 'BULK_UPLOAD_TTL', 24 * 60 * 60))
+
+def fingerprint(uploaded_file):
+    """
+    sha256 hex digest of the uploaded file's content, read chunk by chunk.
+    the file is rewound so it can be parsed afterwards
+    """
+    digest = hashlib.sha256()
+    for chunk in uploaded_file.chunks():
+        digest.update(chunk)
+    uploaded_file.seek(0)
+    return digest.hexdigest()
+
+def purge_expired_uploads(batch_size=1000):
+    """
+    method to delete upload records older than BULK_UPLOAD_TTL, returns number of deleted rows
+    """
+    cutoff = timezone.now() - result_ttl()
+    deleted = 0
+    while True:
+        ids = list(models.BulkUpload.objects.filter(
+            created_at__lt = cutoff).values_list('pk', flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += models.BulkUpload.objects.filter(pk__in = ids).delete()[0]
+
+def claim_upload(content_hash, endpoint, mode, user):
+    """
+    method to take ownership of processing a user's upload. returns (record, state):
+    'new' for content the user never sent, 'resume' for an upload that failed or
+    whose worker went quiet for BULK_UPLOAD_STALE_SECONDS, 'replay' when the stored
+    outcome can be returned and 'busy' while another request processes it
+    """
+    records = models.BulkUpload.objects.filter(
+        content_hash = content_hash, endpoint = endpoint, mode = mode, uploaded_by = user)
+    records.filter(created_at__lt = timezone.now() - result_ttl()).delete()
+    try:
+        with transaction.atomic():
+            return models.BulkUpload.objects.create(
+                content_hash = content_hash, endpoint = endpoint, mode = mode, uploaded_by = user), 'new'
+    except IntegrityError:
+        pass
+
+    with transaction.atomic():
+        record = records.select_for_update().first()
+        if record is None:
+            # removed since the insert failed, leave it to the client's retry
+            return None, 'busy'
+        if record.status == models.UploadStatus.COMPLETED:
+            return record, 'replay'
+        if (record.status == models.UploadStatus.PROCESSING
+                and record.updated_at > timezone.now() - stale_after()):
+            return record, 'busy'
+        record.status = models.UploadStatus.PROCESSING
+        record.save(update_fields=['status', 'updated_at'])
+    return record, 'resume'
+
+def process_in_batches(record, rows, handler, size=None):
+    """
+    method to run handler over rows in batches, starting after the rows the record
+    already processed. a batch commits together with the record's progress, so a
+    failed or interrupted upload resumes from its last committed batch.
+    without a record every row is processed
+    """
+    size = size or batch_size()
+    first = 0
+    if record is not None:
+        record.total_rows = len(rows)
+        first = record.processed_rows
+    for start in range(first, len(rows), size):
+        batch = rows[start:start + size]
+        with transaction.atomic():
+            handler(batch)
+            if record is not None:
+                record.processed_rows = start + len(batch)
+                record.save(update_fields=['total_rows', 'processed_rows', 'updated_at'])
+
+def complete_upload(record, response_status, response_body):
+    """
+    method to store the final outcome, repeats of the same content replay it
+    """
+    record.status = models.UploadStatus.COMPLETED
+    record.response_status = response_status
+    record.response_body = response_body
+    record.save(update_fields=['status', 'response_status', 'response_body', 'updated_at'])
+
+def fail_upload(record):
+    """
+    method to release an upload whose outcome depends on data that may change,
+    e.g. unknown doctors. the next upload of the content picks it up again
+    """
+    record.status = models.UploadStatus.FAILED
+    record.save(update_fields=['status', 'updated_at'])
+
+def deduplicated(file_field, always_process=(), default_mode=''):
+    """
+    decorator for upload views so that content which the user already uploaded
+    returns the stored response without parsing or inserting again. a request
+    without mode is keyed as default_mode, the mode the view falls back to. modes listed
+    in always_process, whose outcome depends on the rows at the time of the
+    upload, are never replayed. the claimed record is handed to the view as
+    request.bulk_upload (None for dry runs and those modes) to track batch
+    progress. must be placed below @api_view
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(request, *args, **kwargs):
+            uploaded_file = request.FILES.get(file_field)
+            dry_run = request.query_params.get('dry_run', 'false').lower() == 'true'
+            mode = request.query_params.get('mode', default_mode)
+            request.bulk_upload = None
+            if uploaded_file is None or dry_run or mode in always_process:
+                return view(request, *args, **kwargs)
+
+            record, state = claim_upload(fingerprint(uploaded_file), request.path, mode, request.user)
+            if state == 'replay':
+                return Response(
+                    record.response_body,
+                    status=record.response_status,
+                    headers={REPLAYED_HEADER: 'true'})
+            if state == 'busy':
+                err = serializers.ResponseSerializer({
+                    'message':'The same file is still being processed by another upload',
+                    'status':409,
+                    'url':request.get_full_path()})
+                return Response(err.data, status=409)
+
+            request.bulk_upload = record
+            try:
+                response = view(request, *args, **kwargs)
+            except Exception:
+                fail_upload(record)
+                raise
+            if response.status_code < 400:
+                complete_upload(record, response.status_code, response.data)
+            else:
+                fail_upload(record)
+            return response
+        return wrapper
+    return decorator
@@ -15,17 +15,48 @@ urlpatterns = [
     # patient's endpoint
     path('patients', views.create_patient, name='create_patient'),
     path('patients/list', views.get_patient_list, name='patient_list'),
+    path('patients/export', views.export_patients, name='export_patients'),
     path('patients/id/<int:patient_id>', views.update_patient, name='update_patient'),
     path('patients/id/<int:patient_id>', views.delete_patient, name='delete_patient'),
+    path('patients/id/<int:patient_id>/timeline', views.get_patient_timeline, name='patient_timeline'),
 
     # availability endpoint
     path('slots', views.create_doctor_availability, name = 'create_doctor_availability'),
     path('slots/bulk-upload', views.create_doctor_availability_bulk, name = 'create_slots_bulk'),
+    path('slots/blackout', views.create_doctor_blackout, name = 'create_doctor_blackout'),
 
     # appointment endpoint
     path('appointments', views.create_appointment, name='create_appointment'),
-    path('appointments/list', views.get_appointments_of_patient, name='patient_appointments')
+    path('appointments/list', views.get_appointments_of_patient, name='patient_appointments'),
+    path('appointments/export', views.export_appointments, name='export_appointments'),
+    path('appointments/id/<int:appointment_id>/cancel', views.cancel_appointment, name='cancel_appointment'),
+    path('appointments/id/<int:appointment_id>/reschedule', views.reschedule_appointment, name='reschedule_appointment'),
+
+    # waitlist endpoint
+    path('waitlist', views.join_waitlist, name='join_waitlist'),
+    path('waitlist/list', views.get_waitlist_of_patient, name='patient_waitlist'),
+    path('waitlist/id/<int:waitlist_id>/cancel', views.leave_waitlist, name='leave_waitlist'),
+
+    # support ticket endpoint
+    path('tickets', views.create_ticket, name='create_ticket'),
+    path('tickets/list', views.get_ticket_list, name='ticket_list'),
+    path('tickets/claim', views.claim_ticket, name='claim_ticket'),
+    path('tickets/id/<int:ticket_id>/close', views.close_ticket, name='close_ticket'),
+
+    # search endpoint
+    path('search/clinical', views.search_clinical_records, name='search_clinical_records'),
+
+    # change feed endpoint
+    path('changes', views.get_changes, name='get_changes'),
+
+    # analytics endpoint
+    path('analytics/utilization', views.get_utilization_analytics, name='utilization_analytics'),
+    path('analytics/heatmap', views.get_heatmap_analytics, name='heatmap_analytics'),
+
+    # metrics endpoint
+    path('metrics/throttling', views.get_throttling_metrics, name='throttling_metrics'),
 
     # prescription endpoint
-    # path('prescriptions/<int:appointment_id>')
+    path('prescriptions/bulk', views.create_prescriptions_bulk, name='create_prescriptions_bulk'),
+    path('prescriptions/<int:appointment_id>', views.create_prescription, name='create_prescription'),
 ]
\ No newline at end of file
@@ -1,8 +1,9 @@
 from django.contrib.auth.models import User
-from django.db.models import Q
+from django.db import connections
+from django.db.models import Exists, OuterRef, Q
 from . import models
+from . import purge
 import os
-import openpyxl
 from datetime import datetime, date, time
 
 ALLOWED_EXTENSIONS = ['xlsx']
@@ -48,6 +49,8 @@ def validate_file(file):
     return True, ""
 
 def process_docavailability_bulkupload(uploaded_file):
+    # openpyxl (and numpy behind it) is only needed for uploads, keep it off worker startup
+    import openpyxl
     try:
         wb = openpyxl.load_workbook(filename=uploaded_file, read_only=True)
         sheet = wb.active
@@ -152,22 +155,180 @@ def is_blank(value: str):
         return True
     return False
 
-def create_individual_slot(data: dict):
-    username = data.get('doc_username')
-    doctor = check_doctor_by_username(username)
-
-    if doctor is None:
-        return False
-    
-    models.DoctorAvailability.objects.create(
-        doctor = doctor,
-        date = data.get('date'),
-        start_time = data.get('start_time'),
-        end_time = data.get('end_time'))
-    return True
-    
 def check_doctor_by_username(username):
     return models.Doctor.objects.filter(user__username = username).first()
 
 def check_patient_by_username(username):
-    return models.Patient.objects.filter(user__username = username).first()
\ No newline at end of file
+    return models.Patient.objects.filter(user__username = username).first()
+
+def lock_available_slot(doctor, date_val, time_val):
+    """
+    method to fetch and lock doctor's availability slot covering given date and time.
+    must be called inside a transaction, concurrent bookings of the same slot wait
+    on this row lock until the holder commits
+    """
+    # a time inside a blocked slot, end excluded, is not bookable even where the
+    # inclusive end of an available slot reaches it, e.g. the part of a slot
+    # left before a blackout window
+    blocked = models.DoctorAvailability.objects.filter(
+        Q(doctor = doctor) &
+        Q(date = date_val) &
+        Q(start_time__lte = time_val) &
+        Q(end_time__gt = time_val) &
+        Q(is_available = False))
+    return models.DoctorAvailability.objects.select_for_update().filter(
+        Q(doctor = doctor) &
+        Q(date = date_val) &
+        Q(start_time__lte = time_val) &
+        Q(end_time__gte = time_val) &
+        Q(is_available = True)).exclude(Exists(blocked)).order_by('id').first()
+
+def is_time_booked(doctor, date_val, time_val, exclude_id=None):
+    """
+    method to check whether doctor already has a booked appointment at given date and time
+    """
+    appointments = models.Appointment.objects.filter(
+        Q(doctor = doctor) &
+        Q(date = date_val) &
+        Q(time = time_val) &
+        Q(status = models.AppointmentStatus.BOOKED))
+    if exclude_id is not None:
+        appointments = appointments.exclude(appointment_id = exclude_id)
+    return appointments.exists()
+
+def lock_appointment(appointment_id):
+    """
+    method to fetch and lock an appointment by p.k. appointments of soft-deleted
+    doctors and patients are not found, so nothing is cancelled or booked with them
+    """
+    return purge.exclude_deleted_profiles(models.Appointment.objects.select_for_update()).filter(
+        appointment_id = appointment_id).first()
+
+def treated_by(doctor, patient_field='patient'):
+    """
+    filter for rows whose patient has or had an appointment with doctor,
+    archived appointments included
+    """
+    return (
+        Q(**{f'{patient_field}__in': models.Appointment.objects.filter(doctor = doctor).values('patient')}) |
+        Q(**{f'{patient_field}__in': models.ArchivedAppointment.objects.filter(doctor = doctor).values('patient')}))
+
+def can_manage_appointment(user, appointment):
+    if user.is_staff:
+        return True
+    return appointment.patient.user_id == user.id
+
+def prescribable_appointments(user, appointment_ids):
+    """
+    method to fetch appointments the user can prescribe for, each annotated with
+    has_prescription. one query covers existence, ownership and the duplicate check
+    """
+    appointments = models.Appointment.objects.filter(
+        appointment_id__in = appointment_ids).annotate(
+            has_prescription = Exists(models.Prescription.objects.filter(appointment_id = OuterRef('pk'))))
+    if not user.is_staff:
+        appointments = appointments.filter(doctor__user = user)
+    return appointments
+
+def insert_ignoring_conflicts(model, objects, field_names, conflict_field, using='default'):
+    """
+    method to insert objects with one INSERT .. ON CONFLICT DO NOTHING RETURNING.
+    unlike bulk_create(ignore_conflicts=True) it reports which rows went in, rows
+    a concurrent writer inserted first are not among them.
+    returns conflict_field values of the inserted rows
+    """
+    if not objects:
+        return []
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    fields = [model._meta.get_field(name) for name in field_names]
+    conflict_column = quote(model._meta.get_field(conflict_field).column)
+    params = [
+        field.get_db_prep_save(field.pre_save(obj, True), connection)
+        for obj in objects for field in fields]
+    row_sql = '(' + ', '.join(['%s'] * len(fields)) + ')'
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'INSERT INTO {quote(model._meta.db_table)} ({", ".join(quote(field.column) for field in fields)}) '
+            f'VALUES {", ".join([row_sql] * len(objects))} '
+            f'ON CONFLICT ({conflict_column}) DO NOTHING RETURNING {conflict_column}',
+            params)
+        return [row[0] for row in cursor.fetchall()]
+
+def filter_patients(patients, params):
+    """
+    method to apply filter and sorting query params of patient list on a queryset.
+    returns (queryset, None) or (None, error message)
+    """
+    gen_val = params.get('gender')
+    min_dob_val = params.get('min_dob')
+    max_dob_val = params.get('max_dob')
+    search_val = params.get('search')
+    sortby_val = params.get('sortby')
+    sortorder_val = params.get('sortorder')
+
+    if gen_val:
+        patients = patients.filter(gender = gen_val)
+    if min_dob_val and max_dob_val:
+        try:
+            min_dob = datetime.strptime(min_dob_val, '%d-%m-%Y')
+            max_dob = datetime.strptime(max_dob_val, '%d-%m-%Y')
+        except ValueError:
+            return None, 'Unable to parse min_dob/max_dob. Please provide the dates in proper format'
+        patients = patients.filter(Q(dob__gte = min_dob) & Q(dob__lte = max_dob))
+    if search_val:
+        patients = patients.filter(
+            Q(user__first_name__icontains = search_val) |
+            Q(user__last_name__icontains = search_val) |
+            Q(user__username__icontains = search_val))
+    if sortby_val and sortorder_val:
+        if not sortby_val in ['first_name', 'last_name', 'dob', 'gender', 'created_at']:
+            return None, 'Invalid sortby value. Please try again.'
+
+        sortby = sortby_val
+        if sortby == 'first_name' or sortby == 'last_name':
+            sortby = f"user__{sortby}"
+        if sortorder_val == 'desc':
+            sortby = f"-{sortby}"
+        patients = patients.order_by(sortby)
+    return patients, None
+
+def filter_appointments(appointments, params):
+    """
+    method to apply filter and sorting query params of appointment list on a queryset.
+    returns (queryset, None) or (None, error message)
+    """
+    spec_val = params.get('specialization')
+    doc_val = params.get('doctor') # doctor username
+    status_val = params.get('status_val')
+    min_date_val = params.get('min_date')
+    max_date_val = params.get('max_date')
+    sortby_val = params.get('sortby')
+    sortorder_val = params.get('sortorder')
+
+    if spec_val:
+        appointments = appointments.filter(doctor__specialization = spec_val)
+    if doc_val:
+        appointments = appointments.filter(doctor__user__username = doc_val)
+    if status_val:
+        appointments = appointments.filter(status = status_val)
+    if min_date_val and max_date_val:
+        try:
+            min_date = datetime.strptime(min_date_val, '%d-%m-%Y')
+            max_date = datetime.strptime(max_date_val, '%d-%m-%Y')
+        except ValueError:
+            return None, 'Unable to parse min_date/max_date. Please provide the dates in proper format'
+        appointments = appointments.filter(Q(date__gte = min_date) & Q(date__lte = max_date))
+    if sortby_val and sortorder_val:
+        if not sortby_val in ['date', 'status', 'doctor_username', 'patient_username', 'created_at']:
+            return None, 'Invalid sortby option. Please try again'
+
+        sortby = sortby_val
+        if sortby_val == 'doctor_username':
+            sortby = 'doctor__user__username'
+        elif sortby_val == 'patient_username':
+            sortby = 'patient__user__username'
+        if sortorder_val == 'desc':
+            sortby = f'-{sortby}'
+        appointments = appointments.order_by(sortby)
+    return appointments, None
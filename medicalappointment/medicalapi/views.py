@@ -1,13 +1,32 @@
 from datetime import datetime, time
-from rest_framework.decorators import api_view, parser_classes, permission_classes
+from rest_framework.decorators import api_view, parser_classes, permission_classes, throttle_classes, throttle_scope
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated, AllowAny
 from . import serializers
+from . import fastserializers
+from django.db import IntegrityError, transaction
 from django.db.models import Q
 from . import models
 from rest_framework.parsers import MultiPartParser
 from rest_framework.pagination import PageNumberPagination
 from . import utils
+from . import timeline
+from . import dbrouter
+from . import throttling
+from . import middleware
+from . import conditional
+from . import exports
+from . import idempotency
+from . import waitlist
+from . import search
+from . import tickets
+from . import changefeed
+from . import analytics
+from . import blackout
+from . import purge
+from . import slotsync
+from . import uploads
+from . import directory
 from drf_yasg.utils import swagger_auto_schema
 from drf_yasg import openapi
 
@@ -27,6 +46,8 @@ paginate.page_size = 10
         })
 @api_view(['POST'])
 @permission_classes([AllowAny])
+@throttle_classes(throttling.SCOPED_BUCKET_THROTTLES)
+@throttle_scope('register')
 def register_user(request):
 
     url = request.get_full_path()
@@ -148,6 +169,8 @@ def create_doctor(request):
             )])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+@conditional.conditional_get('doctor', 'clinic', 'user')
 def get_doctor_list(request):
     
     url = request.get_full_path()
@@ -158,27 +181,39 @@ def get_doctor_list(request):
     sortby = request.query_params.get('sortby')
     sortorder = request.query_params.get('sortorder')
 
+    if sortby and sortorder and not sortby in directory.SORT_LOOKUPS:
+        err = serializers.ResponseSerializer({
+            'message':'please provide a valid sortby option',
+            'status':400,
+            'url':url})
+        return Response(err.data, status=400)
+    start_time = time.fromisoformat(start_val) if start_val else None
+    end_time = time.fromisoformat(end_val) if end_val else None
+
+    ordered = sortby and sortorder
+    doctor_index = None
+    if directory.enabled() and (not ordered or directory.serves(sortby)):
+        doctor_index = directory.get_directory()
+    if doctor_index is not None:
+        # filter, sort and page in process, no query besides the version check
+        pagedate = paginate.paginate_queryset(doctor_index.query(
+            spec_value, start_time, end_time,
+            sortby if ordered else None,
+            sortorder == 'desc'), request)
+        return Response(fastserializers.DoctorListSerializer.render(pagedate), status=200)
+
     doctors = models.Doctor.objects.all()
 
     if spec_value:
         doctors = doctors.filter(specialization = spec_value)
 
-    if start_val:
-        start_time = time.fromisoformat(start_val)
+    if start_time is not None:
         doctors = doctors.filter(start_time__lte = start_time)
 
-    if end_val:
-        end_time = time.fromisoformat(end_val)
+    if end_time is not None:
         doctors = doctors.filter(end_time__gte = end_time)
 
     if sortby and sortorder:
-        if not sortby in ['specialization', 'start_time', 'end_time', 'first_name', 'last_name', "created_at"]:
-            err = serializers.ResponseSerializer({
-                'message':'please provide a valid sortby option',
-                'status':400,
-                'url':url})
-            return Response(err.data, status=400)
-        
         sortby_val = sortby
 
         if sortby == 'first_name' or sortby == 'last_name':
@@ -188,10 +223,10 @@ def get_doctor_list(request):
             sortby_val = f"-{sortby_val}"
         doctors = doctors.order_by(sortby_val)
 
-    pagedate = paginate.paginate_queryset(doctors, request)
+    pagedate = paginate.paginate_queryset(
+        fastserializers.DoctorListSerializer.project(doctors), request)
 
-    res = serializers.DoctorGetSerializer(pagedate, many=True)
-    return Response(res.data, status=200)
+    return Response(fastserializers.DoctorListSerializer.render(pagedate), status=200)
 
 # create patient
 @swagger_auto_schema(
@@ -287,7 +322,7 @@ def update_doctor(request, doctor_id):
 @swagger_auto_schema(
         method='DELETE',
         operation_id='delete doctor',
-        operation_description='delete doctor\'s record using p.k',
+        operation_description='delete doctor\'s record using p.k. the record is hidden right away, its appointments, records and other dependents are purged in the background',
         manual_parameters=[
             openapi.Parameter(name='doctor_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)
         ],
@@ -307,7 +342,7 @@ def delete_doctor(request, doctor_id):
                 'status':404,
                 'url':url})
             return Response(err.data, status=404)
-    doctor.user.delete()
+    purge.soft_delete(doctor)
     res = serializers.ResponseSerializer({
                 'message':'doctor\'s record deleted successfully',
                 'status':200,
@@ -363,7 +398,7 @@ def update_patient(request, patient_id):
 @swagger_auto_schema(
         method='DELETE',
         operation_id='delete patient',
-        operation_description='delete patient\'s record using p.k',
+        operation_description='delete patient\'s record using p.k. the record is hidden right away, its appointments, records and other dependents are purged in the background',
         manual_parameters=[
             openapi.Parameter(name='patient_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)
         ],
@@ -383,7 +418,7 @@ def delete_patient(request, patient_id):
                 'url':url
             })
             return Response(err.data, status=404)
-    patient.user.delete()
+    purge.soft_delete(patient)
     res = serializers.ResponseSerializer({
                 'message':'patient record is deleted successfully',
                 'status':200,
@@ -437,18 +472,33 @@ def create_doctor_availability(request):
 @swagger_auto_schema(
         method='POST',
         operation_id='create doctor availability bulk',
-        operation_description='create doctor availability in bulk using excel template',
-        # manual_parameters=[openapi],
+        operation_description='create doctor availability in bulk using excel template. with mode=sync the availability of the sheet\'s doctors over the sheet\'s date range is made to match the sheet, only changed slots are written and the diff is reported',
+        manual_parameters=[
+            openapi.Parameter(name='mode', in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(slotsync.SYNC_MODES), default='append'),
+            openapi.Parameter(name='dry_run', in_=openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN, default=False, description='validate and diff without writing, mode=sync only')],
         # request_body=serializers.DoctorAvailabilitySerializer,
         responses={
+            200: 'availability synced with the sheet, or dry run diff',
             201: 'created doctor availability record successfully',
             400: 'validation failed on request body'
         })
 @api_view(['POST'])
 @parser_classes([MultiPartParser])
 @permission_classes([IsAdminUser])
+@idempotency.idempotent
+@uploads.deduplicated('upload_file', always_process=('sync',), default_mode='append')
 def create_doctor_availability_bulk(request):
     url = request.get_full_path()
+    mode = request.query_params.get('mode', 'append')
+    dry_run = request.query_params.get('dry_run', 'false').lower() == 'true'
+    if mode not in slotsync.SYNC_MODES or (dry_run and mode != 'sync'):
+        err = serializers.ResponseSerializer({
+            'message':f'mode must be one of {slotsync.SYNC_MODES}, dry_run needs mode=sync',
+            'status':400,
+            'url':url
+        })
+        return Response(err.data, status=400)
+
     file = request.FILES['upload_file']
     is_valid, error_msg = utils.validate_file(file)
     if not is_valid:
@@ -469,12 +519,28 @@ def create_doctor_availability_bulk(request):
             'data': error_list
         })
         return Response(err.data,status=400)
+
+    if mode == 'sync':
+        slots, error_list = slotsync.sheet_slots(data_list)
+        if error_list is None:
+            report, error_list = slotsync.sync_slots(slots, dry_run)
+        if error_list:
+            err = serializers.BulkErrorSerializer({
+                'message': 'Error occurred while syncing doctor availability',
+                'status':400,
+                'url':url,
+                'data': error_list
+            })
+            return Response(err.data,status=400)
+        return Response({
+            'message':'Doctor availability diff computed, nothing written' if dry_run
+                else 'Doctor availability is synced successfully',
+            'status':200,
+            'url':url,
+            'dry_run': dry_run,
+            **report}, status=200)
     
-    error_list = []
-    for data in data_list:
-        is_created = utils.create_individual_slot(data)
-        if not is_created:
-            error_list.append(f'doctor \"{data.get('doc_username')}\" does not exists')
+    doctors, error_list = slotsync.resolve_doctors(data_list)
     if error_list:
         err = serializers.BulkErrorSerializer({
             'message': 'Error occurred while uploading data in bulk',
@@ -484,6 +550,11 @@ def create_doctor_availability_bulk(request):
         })
         return Response(err.data,status=400)
 
+    # a re-sent upload which failed half way continues after its last committed batch
+    uploads.process_in_batches(request.bulk_upload, [
+        (slotsync.slot_key(doctors[data['doc_username']], slotsync.row_date(data), data['start_time']), data['end_time'])
+        for data in data_list], slotsync.create_slots)
+
     res = serializers.ResponseSerializer({
             'message':'Data for doctor availability is uploaded successfully',
             'status':201,
@@ -491,6 +562,54 @@ def create_doctor_availability_bulk(request):
         })
     return Response(res.data,status=201)
 
+# doctor blackout
+@swagger_auto_schema(
+        method='POST',
+        operation_id='create doctor blackout',
+        operation_description='block availability of doctors on leave over a date range, optionally only a time window of each day, and cancel the booked appointments inside it. slots reaching out of the time window are split at its edges',
+        request_body=serializers.BlackoutSerializer,
+        responses={
+            200: 'number of blocked slots and cancelled appointments with patients to notify',
+            400: 'validation failed on request body',
+            404: 'doctor not found by p.k'
+        })
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+@idempotency.idempotent
+def create_doctor_blackout(request):
+    url = request.get_full_path()
+
+    payload = serializers.BlackoutSerializer(data=request.data)
+    if not payload.is_valid():
+        err = serializers.ResponseSerializer({
+            'message':'Validation failed on request body',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    doctor_ids = set(payload.validated_data['doctor_ids'])
+    missing = doctor_ids - set(models.Doctor.objects.filter(doctor_id__in = doctor_ids).values_list('doctor_id', flat=True))
+    if missing:
+        err = serializers.ResponseSerializer({
+            'message':f'Doctor\'s record not found for doctor_ids {sorted(missing)}',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    blocked, cancelled = blackout.apply_blackout(
+        sorted(doctor_ids),
+        payload.validated_data['start_date'],
+        payload.validated_data['end_date'],
+        payload.validated_data.get('start_time'),
+        payload.validated_data.get('end_time'))
+
+    return Response({
+        'message':'Doctor availability is blocked successfully',
+        'status':200,
+        'url':url,
+        'blocked_slots': blocked,
+        'cancelled_appointments': cancelled}, status=200)
+
 # create appointment
 @swagger_auto_schema(
         method='POST',
@@ -504,6 +623,9 @@ def create_doctor_availability_bulk(request):
         })
 @api_view(['POST'])
 @permission_classes([IsAuthenticated])
+@throttle_classes(throttling.SCOPED_BUCKET_THROTTLES)
+@throttle_scope('booking')
+@idempotency.idempotent
 def create_appointment(request):
     url = request.get_full_path()
 
@@ -523,52 +645,436 @@ def create_appointment(request):
     if payload.is_valid():
         date = payload.validated_data['date']
         time = payload.validated_data['time']
-        slot = models.DoctorAvailability.objects.filter(
-            Q(doctor = doctor) &
-            Q(start_time__lte = time) &
-            Q(end_time__gte = time) &
-            Q(is_available = True)).exists()
-        
-        if not slot:
+
+        with transaction.atomic():
+            slot = utils.lock_available_slot(doctor, date, time)
+
+            if slot is None:
+                err = serializers.ResponseSerializer({
+                    'message':'Time slot is not available for the appointment',
+                    'status':404,
+                    'url':url})
+                return Response(err.data,status=404)
+
+            appointment_exists = models.Appointment.objects.filter(
+                Q(doctor = doctor) &
+                Q(patient = patient) &
+                Q(date = date) &
+                Q(status = models.AppointmentStatus.BOOKED)).exists()
+
+            if appointment_exists:
+                err = serializers.ResponseSerializer({
+                    'message':'Appointment is already booked with the selected doctor at given date and time',
+                    'status':400,
+                    'url':url})
+                return Response(err.data,status=400)
+
+            if utils.is_time_booked(doctor, date, time):
+                err = serializers.ResponseSerializer({
+                    'message':'Time slot is already booked by another patient',
+                    'status':400,
+                    'url':url})
+                return Response(err.data,status=400)
+
+            models.Appointment.objects.create(
+                doctor = doctor,
+                patient = patient,
+                date = date,
+                time = time)
+
+        res = serializers.ResponseSerializer({
+            'message':'Appointment with doctor is booked successfully',
+            'status':201,
+            'url':url
+        })
+        return Response(res.data,status=201)
+
+    err = serializers.ResponseSerializer({
+            'message':'Validation failed on request body',
+            'status':400,
+            'url':url
+        })
+    return Response(err.data,status=400)
+
+# cancel appointment
+@swagger_auto_schema(
+        method='PATCH',
+        operation_id='cancel appointment',
+        operation_description='cancel a booked appointment and release its time slot',
+        manual_parameters=[openapi.Parameter(name='appointment_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)],
+        responses={
+            200: 'appointment cancelled successfully',
+            400: 'appointment is not in booked state',
+            404: 'appointment not found by p.k'
+        })
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def cancel_appointment(request, appointment_id):
+    url = request.get_full_path()
+
+    with transaction.atomic():
+        appointment = utils.lock_appointment(appointment_id)
+        if appointment is None or not utils.can_manage_appointment(request.user, appointment):
+            err = serializers.ResponseSerializer({
+                'message':'Appointment not found by provided appointment_id',
+                'status':404,
+                'url':url})
+            return Response(err.data,status=404)
+
+        if appointment.status != models.AppointmentStatus.BOOKED:
+            err = serializers.ResponseSerializer({
+                'message':'Only booked appointments can be cancelled',
+                'status':400,
+                'url':url})
+            return Response(err.data,status=400)
+
+        appointment.status = models.AppointmentStatus.CANCELLED
+        appointment.save(update_fields=['status'])
+
+        waitlist.promote_from_waitlist(
+            appointment.doctor,
+            appointment.date,
+            appointment.time)
+
+    res = serializers.ResponseSerializer({
+        'message':'Appointment is cancelled successfully',
+        'status':200,
+        'url':url})
+    return Response(res.data,status=200)
+
+# reschedule appointment
+@swagger_auto_schema(
+        method='PATCH',
+        operation_id='reschedule appointment',
+        operation_description='move a booked appointment to another date and time with the same doctor',
+        request_body=serializers.AppointmentSerializer,
+        manual_parameters=[openapi.Parameter(name='appointment_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)],
+        responses={
+            201: 'appointment rescheduled successfully',
+            400: 'validation failed on request body or slot already booked',
+            404: 'appointment or time slot not found'
+        })
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def reschedule_appointment(request, appointment_id):
+    url = request.get_full_path()
+
+    payload = serializers.AppointmentSerializer(data=request.data)
+    if not payload.is_valid():
+        err = serializers.ResponseSerializer({
+            'message':'Validation failed on request body',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    date = payload.validated_data['date']
+    time = payload.validated_data['time']
+
+    # old booking is cancelled and new one reserved in the same transaction,
+    # locks are always taken appointment first, then availability slot,
+    # the same order blackout.apply_blackout follows
+    with transaction.atomic():
+        appointment = utils.lock_appointment(appointment_id)
+        if appointment is None or not utils.can_manage_appointment(request.user, appointment):
+            err = serializers.ResponseSerializer({
+                'message':'Appointment not found by provided appointment_id',
+                'status':404,
+                'url':url})
+            return Response(err.data,status=404)
+
+        if appointment.status != models.AppointmentStatus.BOOKED:
+            err = serializers.ResponseSerializer({
+                'message':'Only booked appointments can be rescheduled',
+                'status':400,
+                'url':url})
+            return Response(err.data,status=400)
+
+        slot = utils.lock_available_slot(appointment.doctor, date, time)
+        if slot is None:
             err = serializers.ResponseSerializer({
                 'message':'Time slot is not available for the appointment',
                 'status':404,
                 'url':url})
             return Response(err.data,status=404)
-        
-        appointment_exists = models.Appointment.objects.filter(
-            Q(doctor = doctor) &
-            Q(patient = patient) &
-            Q(date = date) &
-            Q(status = models.AppointmentStatus.BOOKED)).exists()
-        
-        if appointment_exists:
+
+        if utils.is_time_booked(appointment.doctor, date, time, exclude_id=appointment.appointment_id):
             err = serializers.ResponseSerializer({
-                'message':'Appointment is already booked with the selected doctor at given date and time',
+                'message':'Time slot is already booked by another patient',
                 'status':400,
                 'url':url})
             return Response(err.data,status=400)
 
+        appointment.status = models.AppointmentStatus.CANCELLED
+        appointment.save(update_fields=['status'])
+
         models.Appointment.objects.create(
-            doctor = doctor,
-            patient = patient,
+            doctor = appointment.doctor,
+            patient = appointment.patient,
             date = date,
             time = time)
-        
-        res = serializers.ResponseSerializer({
-            'message':'Appointment with doctor is booked successfully',
-            'status':201,
-            'url':url
+
+        waitlist.promote_from_waitlist(
+            appointment.doctor,
+            appointment.date,
+            appointment.time)
+
+    res = serializers.ResponseSerializer({
+        'message':'Appointment is rescheduled successfully',
+        'status':201,
+        'url':url})
+    return Response(res.data,status=201)
+
+# join waitlist
+@swagger_auto_schema(
+        method='POST',
+        operation_id='join waitlist',
+        operation_description='join waitlist of a fully booked doctor for given date, a cancelled slot is booked for the next patient in line',
+        request_body=serializers.WaitlistSerializer,
+        manual_parameters=[openapi.Parameter(name='doctor_id', in_=openapi.IN_QUERY, type=openapi.TYPE_NUMBER, required=True)],
+        responses={
+            201: 'added to waitlist successfully',
+            400: 'validation failed on request body or already waitlisted',
+            404: 'doctor or patient not found'
         })
-        return Response(res.data,status=201)
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def join_waitlist(request):
+    url = request.get_full_path()
 
-    err = serializers.ResponseSerializer({
+    doc_id = int(request.query_params['doctor_id'])
+
+    doctor = utils.check_doctor_exists(doc_id)
+    patient = utils.check_patient_by_username(request.user)
+    if doctor is None or patient is None:
+        err = serializers.ResponseSerializer({
+            'message':'Doctor\'s or patient\'s record not found',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    payload = serializers.WaitlistSerializer(data=request.data)
+    if not payload.is_valid():
+        err = serializers.ResponseSerializer({
             'message':'Validation failed on request body',
             'status':400,
-            'url':url
+            'url':url})
+        return Response(err.data,status=400)
+
+    date = payload.validated_data['date']
+    # only admins may queue someone ahead of the others
+    priority = payload.validated_data['priority'] if request.user.is_staff else 0
+
+    already_waiting = models.WaitlistEntry.objects.filter(
+        Q(doctor = doctor) &
+        Q(patient = patient) &
+        Q(date = date) &
+        Q(status = models.WaitlistStatus.WAITING)).exists()
+    if already_waiting:
+        err = serializers.ResponseSerializer({
+            'message':'You are already on the waitlist of this doctor for given date',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    models.WaitlistEntry.objects.create(
+        doctor = doctor,
+        patient = patient,
+        date = date,
+        priority = priority)
+
+    res = serializers.ResponseSerializer({
+        'message':'You are added to the waitlist successfully',
+        'status':201,
+        'url':url})
+    return Response(res.data,status=201)
+
+# get waitlist entries of patient
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get waitlist of patient',
+        operation_description='get waitlist entries of logged in patient with pagination',
+        manual_parameters=[
+            openapi.Parameter(name='status', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY)
+        ])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+@conditional.conditional_get('waitlistentry', 'doctor', 'clinic', 'user')
+def get_waitlist_of_patient(request):
+    url = request.get_full_path()
+
+    status_val = request.query_params.get('status')
+
+    patient = utils.check_patient_by_username(request.user)
+    if patient is None:
+        err = serializers.ResponseSerializer({
+            'message':'Patient\'s record not found',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    entries = models.WaitlistEntry.objects.filter(patient = patient).order_by('-created_at')
+    if status_val:
+        entries = entries.filter(status = status_val)
+
+    pagedata = paginate.paginate_queryset(entries, request)
+    res = serializers.WaitlistGetSerializer(pagedata, many=True)
+    return Response(res.data, status=200)
+
+# leave waitlist
+@swagger_auto_schema(
+        method='PATCH',
+        operation_id='leave waitlist',
+        operation_description='remove a waiting entry from the waitlist',
+        manual_parameters=[openapi.Parameter(name='waitlist_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)],
+        responses={
+            200: 'removed from waitlist successfully',
+            404: 'waiting entry not found by p.k'
         })
-    return Response(err.data,status=400)
-    
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def leave_waitlist(request, waitlist_id):
+    url = request.get_full_path()
+
+    entries = models.WaitlistEntry.objects.filter(
+        waitlist_id = waitlist_id,
+        status = models.WaitlistStatus.WAITING)
+    if not request.user.is_staff:
+        entries = entries.filter(patient__user = request.user)
+
+    updated = entries.update(status = models.WaitlistStatus.CANCELLED)
+    conditional.bump_versions('waitlistentry')
+    if not updated:
+        err = serializers.ResponseSerializer({
+            'message':'Waiting entry not found by provided waitlist_id',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    res = serializers.ResponseSerializer({
+        'message':'You are removed from the waitlist successfully',
+        'status':200,
+        'url':url})
+    return Response(res.data,status=200)
+
+# create support ticket
+@swagger_auto_schema(
+        method='POST',
+        operation_id='create support ticket',
+        operation_description='raise a support ticket, it waits in the queue until an agent claims it',
+        request_body=serializers.SupportTicketSerializer,
+        responses={
+            201: 'support ticket created successfully',
+            400: 'validation failed on request body'
+        })
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def create_ticket(request):
+    url = request.get_full_path()
+
+    payload = serializers.SupportTicketSerializer(data=request.data)
+    if not payload.is_valid():
+        err = serializers.ResponseSerializer({
+            'message':'Validation failed on request body',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    models.SupportTicket.objects.create(
+        user = request.user,
+        **payload.validated_data)
+
+    res = serializers.ResponseSerializer({
+        'message':'Support ticket is created successfully',
+        'status':201,
+        'url':url})
+    return Response(res.data,status=201)
+
+# get support tickets
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get support tickets',
+        operation_description='get support tickets with pagination, staff see every ticket and others only their own',
+        manual_parameters=[
+            openapi.Parameter(name='status', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='assigned_to', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='agent username')
+        ])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+def get_ticket_list(request):
+    status_val = request.query_params.get('status')
+    assigned_val = request.query_params.get('assigned_to')
+
+    support_tickets = models.SupportTicket.objects.select_related('user', 'assigned_to').order_by('-created_at', '-id')
+    if not request.user.is_staff:
+        support_tickets = support_tickets.filter(user = request.user)
+    if status_val:
+        support_tickets = support_tickets.filter(status = status_val)
+    if assigned_val:
+        support_tickets = support_tickets.filter(assigned_to__username = assigned_val)
+
+    pagedata = paginate.paginate_queryset(support_tickets, request)
+    res = serializers.SupportTicketGetSerializer(pagedata, many=True)
+    return Response(res.data, status=200)
+
+# claim support ticket
+@swagger_auto_schema(
+        method='POST',
+        operation_id='claim support ticket',
+        operation_description='assign the oldest open ticket to the logged in agent. concurrent agents never get the same ticket',
+        responses={
+            200: 'claimed ticket',
+            404: 'no open ticket in the queue'
+        })
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def claim_ticket(request):
+    url = request.get_full_path()
+
+    ticket = tickets.claim_next_ticket(request.user)
+    if ticket is None:
+        err = serializers.ResponseSerializer({
+            'message':'No open support ticket in the queue',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    res = serializers.SupportTicketGetSerializer(ticket)
+    return Response(res.data, status=200)
+
+# close support ticket
+@swagger_auto_schema(
+        method='PATCH',
+        operation_id='close support ticket',
+        operation_description='close an open or claimed support ticket',
+        manual_parameters=[openapi.Parameter(name='ticket_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)],
+        responses={
+            200: 'support ticket closed successfully',
+            404: 'open ticket not found by p.k'
+        })
+@api_view(['PATCH'])
+@permission_classes([IsAuthenticated])
+def close_ticket(request, ticket_id):
+    url = request.get_full_path()
+
+    open_tickets = models.SupportTicket.objects.filter(id = ticket_id).exclude(
+        status = models.TicketStatus.CLOSED)
+    if not request.user.is_staff:
+        open_tickets = open_tickets.filter(user = request.user)
+
+    if not open_tickets.update(status = models.TicketStatus.CLOSED):
+        err = serializers.ResponseSerializer({
+            'message':'Open support ticket not found by provided ticket_id',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    res = serializers.ResponseSerializer({
+        'message':'Support ticket is closed successfully',
+        'status':200,
+        'url':url})
+    return Response(res.data,status=200)
 
 # get list of patients
 @swagger_auto_schema(
@@ -585,55 +1091,24 @@ def create_appointment(request):
         ])
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+@conditional.conditional_get('patient', 'user')
 def get_patient_list(request):
     url = request.get_full_path()
 
-    gen_val = request.query_params.get('gender')
-    min_dob_val = request.query_params.get('min_dob')
-    max_dob_val = request.query_params.get('max_dob')
-    search_val = request.query_params.get('search')
-    sortby_val = request.query_params.get('sortby')
-    sortorder_val = request.query_params.get('sortorder')
-
-    patients = models.Patient.objects.all()
+    patients, error_msg = utils.filter_patients(
+        models.Patient.objects.all(),
+        request.query_params)
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
 
-    if gen_val:
-        patients = patients.filter(gender = gen_val)
-    if min_dob_val and max_dob_val:
-        try:
-            min_dob = datetime.strptime(min_dob_val, '%d-%m-%Y')
-            max_dob = datetime.strptime(max_dob_val, '%d-%m-%Y')
-            patients = patients.filter(Q(dob__gte = min_dob) & Q(dob__lte = max_dob))
-        except ValueError:
-            err = serializers.ResponseSerializer({
-                'message':'Unable to parse min_dob/max_dob. Please provide the dates in proper format',
-                'status':400,
-                'url':url
-            })
-            return Response(err.data,status=400)
-    if search_val:
-        patients = patients.filter(
-            Q(user__first_name__icontains = search_val) |
-            Q(user__last_name__icontains = search_val) |
-            Q(user__username__icontains = search_val))
-    if sortby_val and sortorder_val:
-        if not sortby_val in ['first_name', 'last_name', 'dob', 'gender', 'created_at']:
-            err = serializers.ResponseSerializer({
-                'message':'Invalid sortby value. Please try again.',
-                'status':400,
-                'url':url})
-            return Response(err.data,status=400)
-        
-        sortby = sortby_val
-        if sortby == 'first_name' or sortby == 'last_name':
-            sortby = f"user__{sortby}"
-        if sortorder_val == 'desc':
-            sortby = f"-{sortby}"
-        patients.order_by(sortby)
-    
-    pagedata = paginate.paginate_queryset(patients, request)
-    res = serializers.PatientGetSerializer(pagedata, many=True)
-    return Response(res.data, status=200)
+    pagedata = paginate.paginate_queryset(
+        fastserializers.PatientListSerializer.project(patients), request)
+    return Response(fastserializers.PatientListSerializer.render(pagedata), status=200)
 
 # get list of appointments
 @swagger_auto_schema(
@@ -649,18 +1124,12 @@ def get_patient_list(request):
             openapi.Parameter(name='sortorder', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, default='desc')
         ])
 @api_view(['GET'])
+@dbrouter.replica_reads
+@conditional.conditional_get('appointment', 'doctor', 'patient', 'clinic', 'user')
 def get_appointments_of_patient(request):
 
     url = request.get_full_path()
 
-    spec_val = request.query_params.get('specialization')
-    doc_val = request.query_params.get('doctor') # doctor username
-    status_val = request.query_params.get('status_val')
-    min_date_val = request.query_params.get('min_date')
-    max_date_val = request.query_params.get('max_date')
-    sortby_val = request.query_params.get('sortby')
-    sortorder_val = request.query_params.get('sortorder')
-
     patient = utils.check_patient_by_username(request.user)
     if patient is None:
         err = serializers.ResponseSerializer({
@@ -670,65 +1139,394 @@ def get_appointments_of_patient(request):
         })
         return Response(err.data,status=404)
 
-    appointments = models.Appointment.objects.filter(patient = patient)
+    appointments, error_msg = utils.filter_appointments(
+        purge.exclude_deleted_profiles(models.Appointment.objects.filter(patient = patient)),
+        request.query_params)
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
 
-    if spec_val:
-        appointments = appointments.filter(doctor__specialization = spec_val)
-    if doc_val:
-        appointments = appointments.filter(doctor__user__username = doc_val)
-    if status_val:
-        appointments = appointments.filter(status = status_val)
-    if min_date_val and max_date_val:
-        try:
-            min_date = datetime.strptime(min_date_val, '%d-%m-%Y')
-            max_date = datetime.strptime(max_date_val, '%d-%m-%Y')
-            patients = patients.filter(Q(date__gte = min_date) & Q(date__lte = max_date))
-        except ValueError:
+    pagedata = paginate.paginate_queryset(
+        fastserializers.AppointmentListSerializer.project(appointments), request)
+    return Response(fastserializers.AppointmentListSerializer.render(pagedata), status=200)
+
+# export patients
+@swagger_auto_schema(
+        method='GET',
+        operation_id='export patients',
+        operation_description='download patients as csv or xlsx file, supports the same filters and sorting as patient list',
+        manual_parameters=[
+            openapi.Parameter(name='filetype', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, default='csv', enum=exports.EXPORT_FILE_TYPES),
+            openapi.Parameter(name='gender', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='min_dob', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name= 'max_dob', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='search', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='sortby', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='sortorder', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY)
+        ])
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@dbrouter.replica_reads
+def export_patients(request):
+    url = request.get_full_path()
+
+    file_type = request.query_params.get('filetype', 'csv')
+    patients, error_msg = utils.filter_patients(
+        models.Patient.objects.all(),
+        request.query_params)
+    if file_type not in exports.EXPORT_FILE_TYPES:
+        error_msg = f'filetype must be one of {exports.EXPORT_FILE_TYPES}'
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    return exports.export_queryset(
+        patients,
+        exports.PATIENT_EXPORT_COLUMNS,
+        'patients',
+        file_type)
+
+# export appointments
+@swagger_auto_schema(
+        method='GET',
+        operation_id='export appointments',
+        operation_description='download appointments as csv or xlsx file, supports the same filters and sorting as appointment list. admins get appointments of all patients',
+        manual_parameters=[
+            openapi.Parameter(name='filetype', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, default='csv', enum=exports.EXPORT_FILE_TYPES),
+            openapi.Parameter(name='specialization', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='doctor', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='min_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='max_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='sortby', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='sortorder', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY)
+        ])
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+def export_appointments(request):
+    url = request.get_full_path()
+
+    appointments = purge.exclude_deleted_profiles(models.Appointment.objects.all())
+    if not request.user.is_staff:
+        patient = utils.check_patient_by_username(request.user)
+        if patient is None:
             err = serializers.ResponseSerializer({
-                'message':'Unable to parse min_date/max_date. Please provide the dates in proper format',
-                'status':400,
+                'message':'Patient\'s record not found',
+                'status':404,
                 'url':url})
-            return Response(err.data,status=400)
-    if sortby_val and sortorder_val:
-        if not sortby_val in ['date', 'status', 'doctor_username', 'patient_username', 'created_at']:
+            return Response(err.data,status=404)
+        appointments = appointments.filter(patient = patient)
+
+    file_type = request.query_params.get('filetype', 'csv')
+    appointments, error_msg = utils.filter_appointments(appointments, request.query_params)
+    if file_type not in exports.EXPORT_FILE_TYPES:
+        error_msg = f'filetype must be one of {exports.EXPORT_FILE_TYPES}'
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    return exports.export_queryset(
+        appointments,
+        exports.APPOINTMENT_EXPORT_COLUMNS,
+        'appointments',
+        file_type)
+
+# patient timeline
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get patient timeline',
+        operation_description='clinical history of a patient - appointments, prescriptions and medical records merged newest first, with cursor pagination. doctors only see patients who have an appointment with them',
+        manual_parameters=[
+            openapi.Parameter(name='patient_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER),
+            openapi.Parameter(name='cursor', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='next_cursor of the previous page'),
+            openapi.Parameter(name='limit', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY, default=timeline.DEFAULT_PAGE_SIZE)
+        ],
+        responses={
+            200: 'page of timeline entries with next_cursor',
+            400: 'invalid cursor or limit',
+            404: 'patient not found by p.k'
+        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+def get_patient_timeline(request, patient_id):
+    url = request.get_full_path()
+
+    patient = utils.check_patient_exists(patient_id)
+    doctor = utils.check_doctor_by_username(request.user)
+    # doctors only see patients who have an appointment with them
+    can_view = patient is not None and (
+        request.user.is_staff or
+        patient.user_id == request.user.id or
+        (doctor is not None and models.Patient.objects.filter(
+            utils.treated_by(doctor, 'pk'), pk = patient.pk).exists()))
+    if not can_view:
+        err = serializers.ResponseSerializer({
+            'message':'patient record does\'nt exists by provided p.k',
+            'status':404,
+            'url':url})
+        return Response(err.data,status=404)
+
+    try:
+        cursor_val = request.query_params.get('cursor')
+        cursor = timeline.decode_cursor(cursor_val) if cursor_val else None
+        limit = int(request.query_params.get('limit', timeline.DEFAULT_PAGE_SIZE))
+        if not 1 <= limit <= timeline.MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        err = serializers.ResponseSerializer({
+            'message':f'Invalid cursor or limit. limit must be between 1 and {timeline.MAX_PAGE_SIZE}',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    entries, next_cursor = timeline.get_timeline_page(patient, cursor, limit)
+    return Response({'results': entries, 'next_cursor': next_cursor}, status=200)
+
+# clinical search
+@swagger_auto_schema(
+        method='GET',
+        operation_id='search clinical records',
+        operation_description='ranked full-text search over diagnoses, treatments, medications and prescription notes. doctors only find records of patients who have an appointment with them',
+        manual_parameters=[
+            openapi.Parameter(name='q', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, required=True),
+            openapi.Parameter(name='doctor', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='doctor username'),
+            openapi.Parameter(name='patient', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='patient username'),
+            openapi.Parameter(name='min_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy'),
+            openapi.Parameter(name='max_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy'),
+            openapi.Parameter(name='limit', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY, default=search.DEFAULT_LIMIT)
+        ],
+        responses={
+            200: 'matching records and prescriptions, best match first',
+            400: 'missing query or invalid filters',
+            403: 'user is neither staff, doctor nor patient'
+        })
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@dbrouter.replica_reads
+def search_clinical_records(request):
+    url = request.get_full_path()
+
+    filters, error_msg = search.parse_filters(request.query_params)
+    query = request.query_params.get('q', '').strip()
+    try:
+        limit = int(request.query_params.get('limit', search.DEFAULT_LIMIT))
+    except ValueError:
+        limit = 0
+    if error_msg is None and not query:
+        error_msg = 'q is required'
+    if error_msg is None and not 1 <= limit <= search.MAX_LIMIT:
+        error_msg = f'limit must be between 1 and {search.MAX_LIMIT}'
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    doctor = utils.check_doctor_by_username(request.user)
+    if not request.user.is_staff and doctor is not None:
+        # doctors only search the history of patients who have an appointment with them
+        filters['treating_doctor'] = doctor
+    elif not request.user.is_staff:
+        # patients only search their own history
+        patient = utils.check_patient_by_username(request.user)
+        if patient is None:
             err = serializers.ResponseSerializer({
-                'message':'Invalid sortby option. Please try again',
-                'status':400,
+                'message':'only staff, doctors and patients can search clinical records',
+                'status':403,
                 'url':url})
-            return Response(err.data,status=400)
-        
-        sortby = sortby_val
-        if sortby_val == 'doctor_username':
-            sortby = f'doctor__user__username'
-        elif sortby_val == 'patient_username':
-            sortby = f'patient__user__username'
-        if sortorder_val == 'desc':
-            sortby = f'-{sortby}'
-        appointments = appointments.order_by(sortby)
-
-    pagedata = paginate.paginate_queryset(appointments, request)
-    res = serializers.AppointmentGetSerializer(pagedata, many=True)
-    return Response(res.data, status=200)
+            return Response(err.data,status=403)
+        filters['patient'] = request.user.username
+
+    alias = models.MedicalRecord.objects.all().db
+    results = search.search_clinical_text(query, filters, limit, alias)
+    return Response({'results': results}, status=200)
+
+# change feed
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get changes',
+        operation_description='created, updated, cancelled and deleted events of appointments, availability and prescriptions after the since cursor, in the order they were committed',
+        manual_parameters=[
+            openapi.Parameter(name='since', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY, default=0, description='next_cursor of the previous batch'),
+            openapi.Parameter(name='limit', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY, default=changefeed.DEFAULT_PAGE_SIZE),
+            openapi.Parameter(name='resource', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='comma separated, e.g. appointment,prescription')
+        ],
+        responses={
+            200: 'batch of change events with next_cursor',
+            400: 'invalid cursor, limit or resource'
+        })
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@dbrouter.replica_reads
+def get_changes(request):
+    url = request.get_full_path()
+
+    resource_val = request.query_params.get('resource')
+    resources = resource_val.split(',') if resource_val else None
+    try:
+        since = int(request.query_params.get('since', 0))
+        limit = int(request.query_params.get('limit', changefeed.DEFAULT_PAGE_SIZE))
+        if since < 0 or not 1 <= limit <= changefeed.MAX_PAGE_SIZE:
+            raise ValueError
+    except ValueError:
+        err = serializers.ResponseSerializer({
+            'message':f'Invalid since or limit. limit must be between 1 and {changefeed.MAX_PAGE_SIZE}',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+    if resources and not set(resources) <= set(changefeed.FEED_MODELS):
+        err = serializers.ResponseSerializer({
+            'message':f'resource must be one of {list(changefeed.FEED_MODELS)}',
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    events, next_cursor = changefeed.get_changes(since, limit, resources)
+    return Response({'results': events, 'next_cursor': next_cursor}, status=200)
+
+# utilization analytics
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get utilization analytics',
+        operation_description='booked share of available time and cancellation rate per doctor, clinic or specialization, read from daily rollups',
+        manual_parameters=[
+            openapi.Parameter(name='group_by', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, default='doctor', enum=list(analytics.GROUP_BY_FIELDS)),
+            openapi.Parameter(name='doctor', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='doctor username'),
+            openapi.Parameter(name='clinic_id', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='specialization', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='min_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy'),
+            openapi.Parameter(name='max_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy')
+        ],
+        responses={
+            200: 'utilization per group',
+            400: 'invalid group_by or filters'
+        })
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@dbrouter.replica_reads
+def get_utilization_analytics(request):
+    url = request.get_full_path()
+
+    group_by = request.query_params.get('group_by', 'doctor')
+    stats, error_msg = analytics.filter_stats(models.DoctorDailyStats.objects.all(), request.query_params)
+    if group_by not in analytics.GROUP_BY_FIELDS:
+        error_msg = f'group_by must be one of {list(analytics.GROUP_BY_FIELDS)}'
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    return Response({'results': analytics.utilization(stats, group_by)}, status=200)
+
+# busiest hour analytics
+@swagger_auto_schema(
+        method='GET',
+        operation_id='get busiest hours analytics',
+        operation_description='booked and cancelled appointments per weekday and hour, read from hourly rollups',
+        manual_parameters=[
+            openapi.Parameter(name='doctor', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='doctor username'),
+            openapi.Parameter(name='clinic_id', type=openapi.TYPE_NUMBER, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='specialization', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY),
+            openapi.Parameter(name='min_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy'),
+            openapi.Parameter(name='max_date', type=openapi.TYPE_STRING, in_=openapi.IN_QUERY, description='dd-mm-yyyy')
+        ],
+        responses={
+            200: 'heatmap cells, weekday 1 is monday',
+            400: 'invalid filters'
+        })
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+@dbrouter.replica_reads
+def get_heatmap_analytics(request):
+    url = request.get_full_path()
+
+    stats, error_msg = analytics.filter_stats(models.DoctorHourlyStats.objects.all(), request.query_params)
+    if error_msg is not None:
+        err = serializers.ResponseSerializer({
+            'message':error_msg,
+            'status':400,
+            'url':url})
+        return Response(err.data,status=400)
+
+    return Response({'results': analytics.heatmap(stats)}, status=200)
+
+# throttling metrics
+@swagger_auto_schema(
+        method='GET',
+        operation_id='throttling metrics',
+        operation_description='number of throttled requests per scope, and in-flight and shed requests of this worker process')
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_throttling_metrics(request):
+    return Response({
+        'throttled': throttling.throttled_counts(),
+        'admission': middleware.admission_stats.snapshot()}, status=200)
 
-@swagger_auto_schema
+# create prescription
+@swagger_auto_schema(
+        method='POST',
+        operation_id='create prescription',
+        operation_description='issue the prescription of an appointment, an appointment has at most one prescription',
+        request_body=serializers.PrescriptionSerializer,
+        manual_parameters=[openapi.Parameter(name='appointment_id', in_=openapi.IN_PATH, type=openapi.TYPE_NUMBER)],
+        responses={
+            201: 'prescription added successfully',
+            400: 'validation failed on request body or appointment is cancelled',
+            404: 'appointment not found by provided appointment_id',
+            409: 'appointment already has a prescription'
+        })
 @api_view(['POST'])
+@permission_classes([IsAuthenticated])
 def create_prescription(request, appointment_id):
     url = request.get_full_path()
 
     payload = request.data
     prescription_request = serializers.PrescriptionSerializer(data=payload)
     if prescription_request.is_valid():
-        appointment = models.Appointment.objects.filter(appointment_id = appointment_id).first()
+        appointment = utils.prescribable_appointments(request.user, [appointment_id]).first()
         if appointment is None:
             err = serializers.ResponseSerializer({
                 'message':'Appointment not found by provided appointment_id',
                 'status':404,
                 'url':url})
             return Response(err.data, status=404)
-        
-        models.Prescription.objects.create(
-            appointment = appointment,
-            **prescription_request.validated_data)
+
+        if appointment.status == models.AppointmentStatus.CANCELLED:
+            err = serializers.ResponseSerializer({
+                'message':'Prescription cannot be added to a cancelled appointment',
+                'status':400,
+                'url':url})
+            return Response(err.data, status=400)
+
+        conflict = serializers.ResponseSerializer({
+            'message':'Prescription already exists for the appointment',
+            'status':409,
+            'url':url})
+        if appointment.has_prescription:
+            return Response(conflict.data, status=409)
+        try:
+            # a concurrent request may insert between the check and this insert,
+            # the one-to-one unique constraint then decides the winner
+            with transaction.atomic():
+                models.Prescription.objects.create(
+                    appointment = appointment,
+                    **prescription_request.validated_data)
+        except IntegrityError:
+            return Response(conflict.data, status=409)
+
         res = serializers.ResponseSerializer({
             'message':'prescription added successfully in the appointment',
             'status':201,
@@ -739,4 +1537,82 @@ def create_prescription(request, appointment_id):
             'message':'Validation failed on request body.',
             'status':400,
             'url':url})
-    return Response(err.data, status=400)
\ No newline at end of file
+    return Response(err.data, status=400)
+
+# create prescriptions in bulk
+@swagger_auto_schema(
+        method='POST',
+        operation_id='create prescriptions bulk',
+        operation_description='issue prescriptions for many appointments, e.g. a whole clinic session, in one request. appointments which already have a prescription are skipped',
+        request_body=serializers.PrescriptionBatchSerializer,
+        responses={
+            201: 'prescriptions added successfully',
+            400: 'validation failed on request body, unknown or cancelled appointments'
+        })
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+@idempotency.idempotent
+def create_prescriptions_bulk(request):
+    url = request.get_full_path()
+
+    payload = serializers.PrescriptionBatchSerializer(data=request.data)
+    if not payload.is_valid():
+        err = serializers.ResponseSerializer({
+            'message':'Validation failed on request body.',
+            'status':400,
+            'url':url})
+        return Response(err.data, status=400)
+
+    items = {item['appointment_id']: item for item in payload.validated_data['prescriptions']}
+    if len(items) != len(payload.validated_data['prescriptions']):
+        err = serializers.ResponseSerializer({
+            'message':'An appointment can appear only once in the batch',
+            'status':400,
+            'url':url})
+        return Response(err.data, status=400)
+
+    with transaction.atomic():
+        appointments = {
+            appointment.appointment_id: appointment
+            for appointment in utils.prescribable_appointments(request.user, items.keys())}
+        error_list = []
+        for appointment_id in items:
+            appointment = appointments.get(appointment_id)
+            if appointment is None:
+                error_list.append(f'appointment {appointment_id} not found')
+            elif appointment.status == models.AppointmentStatus.CANCELLED:
+                error_list.append(f'appointment {appointment_id} is cancelled')
+        if error_list:
+            err = serializers.BulkErrorSerializer({
+                'message':'Error occurred while adding prescriptions in bulk',
+                'status':400,
+                'url':url,
+                'data': error_list})
+            return Response(err.data, status=400)
+
+        pending = sorted(pk for pk, appointment in appointments.items() if not appointment.has_prescription)
+        # rows inserted concurrently are left as they are, created only holds
+        # the appointments this insert wrote a prescription for
+        created = sorted(utils.insert_ignoring_conflicts(
+            models.Prescription,
+            [models.Prescription(
+                appointment_id = pk,
+                notes = items[pk]['notes'],
+                medications = items[pk]['medications'])
+            for pk in pending],
+            ['appointment', 'notes', 'medications', 'issued_at'],
+            'appointment'))
+        skipped = sorted(set(appointments) - set(created))
+        # the raw insert skips post_save, so search vectors, change events and versions are kept here
+        if created:
+            inserted = models.Prescription.objects.filter(appointment_id__in = created)
+            search.refresh_search_vectors(inserted)
+            changefeed.record_changes(inserted, models.ChangeAction.CREATED)
+            conditional.bump_versions('prescription')
+
+    return Response({
+        'message':'prescriptions added successfully',
+        'status':201,
+        'url':url,
+        'created': created,
+        'skipped': skipped}, status=201)
@@ -0,0 +1,61 @@
+from datetime import datetime
+from django.utils import timezone
+from . import models
+from . import utils
+
+# how many waiting entries to look at before giving up on a freed slot
+PROMOTION_SCAN_LIMIT = 20
+
+def next_waiting_entries(doctor, date_val):
+    """
+    queryset of waiting entries for doctor on given date, highest priority first
+    and then in joining order. rows locked by another promotion are skipped
+    """
+    return models.WaitlistEntry.objects.select_for_update(skip_locked=True).filter(
+        doctor = doctor,
+        date = date_val,
+        status = models.WaitlistStatus.WAITING).order_by('-priority', 'created_at', 'waitlist_id')
+
+def can_promote(doctor, date_val, time_val):
+    """
+    method to check that a freed time can still be booked: it is not in the past,
+    an available slot covers it and nobody else holds it. the slot stays locked
+    until the caller's transaction ends, like a regular booking
+    """
+    if datetime.combine(date_val, time_val) <= timezone.localtime().replace(tzinfo=None):
+        return False
+    if utils.lock_available_slot(doctor, date_val, time_val) is None:
+        return False
+    return not utils.is_time_booked(doctor, date_val, time_val)
+
+def promote_from_waitlist(doctor, date_val, time_val):
+    """
+    method to hand a freed time slot to the next waitlisted patient.
+    must run inside the transaction that released the slot, returns the
+    new appointment or None when nobody could be promoted. entries stay
+    waiting when the time can no longer be booked
+    """
+    if not can_promote(doctor, date_val, time_val):
+        return None
+    for entry in next_waiting_entries(doctor, date_val)[:PROMOTION_SCAN_LIMIT]:
+        already_booked = models.Appointment.objects.filter(
+            doctor = doctor,
+            patient_id = entry.patient_id,
+            date = date_val,
+            status = models.AppointmentStatus.BOOKED).exists()
+        if already_booked:
+            # patient got a booking some other way, waiting is no longer needed
+            entry.status = models.WaitlistStatus.CANCELLED
+            entry.save(update_fields=['status'])
+            continue
+
+        appointment = models.Appointment.objects.create(
+            doctor = doctor,
+            patient_id = entry.patient_id,
+            date = date_val,
+            time = time_val)
+        entry.status = models.WaitlistStatus.PROMOTED
+        entry.appointment = appointment
+        entry.save(update_fields=['status', 'appointment'])
+        return appointment
+    return None
@@ -37,6 +37,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'medicalapi',
     'rest_framework',
     'rest_framework_simplejwt',
@@ -47,27 +48,114 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'medicalapi.middleware.CompressionMiddleware',
+    'medicalapi.middleware.ConcurrencyLimitMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'medicalapi.middleware.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 CORS_ALLOW_ALL_ORIGINS = True
 
+# responses smaller than this many bytes are sent uncompressed
+COMPRESSION_MIN_SIZE = 1024
+
+# requests handled at once per worker process, keep it below the database
+# connections a worker may open. extra requests wait ADMISSION_QUEUE_TIMEOUT
+# seconds for a seat and are then rejected with 503
+MAX_CONCURRENT_REQUESTS = 32
+ADMISSION_QUEUE_TIMEOUT = 0.5
+
 ROOT_URLCONF = 'medicalappointment.urls'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES':[
-        'rest_framework_simplejwt.authentication.JWTAuthentication'
+        'medicalapi.authentication.CachedJWTAuthentication'
+    ],
+    # orjson backed, fall back to stdlib json when orjson is not installed
+    'DEFAULT_RENDERER_CLASSES':[
+        'medicalapi.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer'
     ],
+    'DEFAULT_PARSER_CLASSES':[
+        'medicalapi.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser'
+    ],
+    # token buckets of medicalapi.throttling, '<scope>_user', '<scope>_ip'
+    # and '<scope>' for the whole endpoint. a missing rate means unlimited
+    'DEFAULT_THROTTLE_RATES':{
+        'register_user': '5/min',
+        'register_ip': '10/min',
+        'register': '100/min',
+        'booking_user': '20/min',
+        'booking_ip': '60/min',
+        'booking': '1000/min'
+    },
     # 'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     # 'PAGE_SIZE': 10
 }
 
+# seconds for which a replayed Idempotency-Key returns the stored response
+IDEMPOTENCY_KEY_TTL = 24 * 60 * 60
+
+# bulk uploads are fingerprinted by uploader and content hash. a completed upload
+# replays its response for BULK_UPLOAD_TTL seconds, sync uploads are never
+# replayed since they diff against the current slots. an upload that failed, or
+# went without progress for BULK_UPLOAD_STALE_SECONDS, resumes after its last
+# committed batch of BULK_UPLOAD_BATCH_SIZE rows
+BULK_UPLOAD_TTL = 24 * 60 * 60
+BULK_UPLOAD_STALE_SECONDS = 300
+BULK_UPLOAD_BATCH_SIZE = 500
+
+# token user ids resolved by CachedJWTAuthentication are kept in-process for
+# AUTH_USER_CACHE_TTL seconds. name a shared cache in CACHES to also share
+# them between workers
+AUTH_USER_CACHE_TTL = 30
+AUTH_USER_CACHE_SIZE = 1024
+AUTH_USER_SHARED_CACHE = None
+
+# appointment reminders, sent by `python manage.py send_reminders` for booked
+# appointments starting within REMINDER_LEAD_HOURS. the console and file
+# backends in medicalapi.reminders are local stand-ins for a real gateway
+REMINDER_BACKEND = 'medicalapi.reminders.ConsoleReminderBackend'
+REMINDER_FILE_PATH = BASE_DIR / 'reminders.jsonl'
+REMINDER_LEAD_HOURS = 24
+
+# change feed served at /medical/changes. events get their feed position once
+# the writing transaction committed, so consumers never page past a late commit.
+# positions are handed out by `python manage.py sequence_change_feed --loop`,
+# the endpoint only reads and serves events up to the last sequenced one.
+# `python manage.py compact_change_feed` drops superseded events after
+# CHANGE_FEED_COMPACT_AFTER_HOURS and every event after CHANGE_FEED_RETENTION_DAYS
+CHANGE_FEED_COMPACT_AFTER_HOURS = 24
+CHANGE_FEED_RETENTION_DAYS = 30
+
+# deleted doctors and patients are hidden at once and removed with their
+# dependents by `python manage.py purge_deleted_profiles`, PURGE_BATCH_SIZE
+# rows per transaction with PURGE_SLEEP_SECONDS between batches
+PURGE_BATCH_SIZE = 500
+PURGE_SLEEP_SECONDS = 0.1
+
+# answer /medical/doctors/list from a per-process snapshot of the doctor table,
+# rebuilt when doctor, clinic or user version counters move. costs memory in
+# every worker, `python manage.py bench_doctor_directory` measures it
+DOCTOR_DIRECTORY_INDEX = False
+
+# text search configuration of the clinical search tsvector columns
+SEARCH_CONFIG = 'english'
+
+# prebuilt api schema served at /swagger.json, build it with
+# `python manage.py generate_swagger --overwrite openapi.json`
+API_SCHEMA_FILE = BASE_DIR / 'openapi.json'
+
 SWAGGER_SETTINGS = {
+    'DEFAULT_INFO': 'medicalapi.docs.api_info',
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
     'SECURITY_DEFINITIONS': {
         'Bearer': {
             'type': 'apiKey',
@@ -78,6 +166,10 @@ SWAGGER_SETTINGS = {
     },
 }
 
+REDOC_SETTINGS = {
+    'SPEC_URL': ('schema-json', {'format': '.json'}),
+}
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -107,9 +199,19 @@ DATABASES = {
         'PASSWORD': 'hH&qeV%y12',
         'HOST': 'localhost',
         'PORT': 5432
-    }
+    },
+    # read replicas of 'default' are added here and listed in DATABASE_REPLICAS, e.g.
+    # 'replica1': {..., 'HOST': 'replica-host', 'TEST': {'MIRROR': 'default'}}
 }
 
+# list, search and export views read from these aliases, everything else
+# uses 'default'. a user is kept on 'default' for REPLICA_PIN_SECONDS after
+# a write, use a shared cache backend when running several workers
+DATABASE_REPLICAS = []
+REPLICA_PIN_SECONDS = 5
+
+DATABASE_ROUTERS = ['medicalapi.dbrouter.PrimaryReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -16,30 +16,15 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path, include, re_path
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
+from medicalapi import docs
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
-from rest_framework.permissions import AllowAny
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title = 'Medical Appointment Booking System',
-        default_version='v1',
-        description = 'API documentation of Medical Appointment Booking System',
-        contact=openapi.Contact(email='guptapiyush238@gmail.com',name='Piyush Gupta'),
-        license=openapi.License(name='BSD License'),
-    ),
-    public=True,
-    permission_classes=[AllowAny],
-    authentication_classes=[]
-)
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('medical/', include('medicalapi.urls')),
     path('api/token/', TokenObtainPairView.as_view(), name='token_obtain_pair'),
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$', schema_view.without_ui(cache_timeout=0), name='schema-json'),
-    path('swagger/', schema_view.with_ui('swagger', cache_timeout=0), name='schema-swagger-ui'),
-    path('redoc/', schema_view.with_ui('redoc', cache_timeout=0), name='schema-redoc')
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', docs.schema_document, name='schema-json'),
+    path('swagger/', docs.swagger_ui, name='schema-swagger-ui'),
+    path('redoc/', docs.redoc_ui, name='schema-redoc')
 ]